@@ -5,8 +5,17 @@ import { supabase } from '@/lib/supabase';
 import MarketStatusTable from '@/components/microapps/market-status/MarketStatusTable';
 import { ArrowLineUpRight, ArrowLineDownRight, Activity, ChartBar, WarningCircle } from "@phosphor-icons/react";
 
+// Default major indices, in display order
+const TARGET_INDICES = [
+    "NIFTY 50",
+    "NIFTY NEXT 50",
+    "NIFTY MIDCAP 150",
+    "NIFTY SMLCAP 250",
+    "NIFTY LARGEMID250"
+];
+
 export default function MarketStatusPage() {
-    const [rawRows, setRawRows] = useState([]);
+    const [summaryRows, setSummaryRows] = useState([]);
     const [isLoading, setIsLoading] = useState(true);
     const [error, setError] = useState(null);
 
@@ -15,23 +24,15 @@ export default function MarketStatusPage() {
             try {
                 if (!supabase) throw new Error('Supabase client not initialized');
 
-                // Fetch data for the default major indices
-                const targetIndices = [
-                    "NIFTY 50",
-                    "NIFTY NEXT 50",
-                    "NIFTY MIDCAP 150",
-                    "NIFTY SMLCAP 250",
-                    "NIFTY LARGEMID250"
-                ];
-
+                // Metrics are precomputed by the backend sync (src/backend/market_summary.py),
+                // so this is one small row per index instead of full daily history
                 const { data, error: fetchError } = await supabase
-                    .from('index_ind')
-                    .select('*')
-                    .in('symbol', targetIndices)
-                    .order('date', { ascending: false });
+                    .from('index_summary')
+                    .select('symbol, as_of, close, pe, change_1d, change_1w, dist_from_ath, median_pe_5y')
+                    .in('symbol', TARGET_INDICES);
 
                 if (fetchError) throw fetchError;
-                setRawRows(data || []);
+                setSummaryRows(data || []);
             } catch (err) {
                 console.error('Error fetching market data:', err);
                 setError(err.message);
@@ -44,63 +45,19 @@ export default function MarketStatusPage() {
     }, []);
 
     const processedData = useMemo(() => {
-        if (!rawRows.length) return [];
-
-        // Group by symbol
-        const grouped = rawRows.reduce((acc, row) => {
-            if (!acc[row.symbol]) acc[row.symbol] = [];
-            acc[row.symbol].push(row);
-            return acc;
-        }, {});
-
-        return Object.entries(grouped).map(([symbol, rows]) => {
-            // Data is ordered by date DESC
-            const latest = rows[0];
-            const prev1d = rows[1];
-
-            // Find row approx 7 days ago (or the closest available before it)
-            // Since data is sorted DESC, we look ahead in the array
-            const targetDate1w = new Date(latest.date);
-            targetDate1w.setDate(targetDate1w.getDate() - 7);
-            const prev1w = rows.find(r => new Date(r.date) <= targetDate1w) || rows[rows.length - 1];
-
-            // Calculations
-            const change1d = prev1d ? ((latest.close - prev1d.close) / prev1d.close) * 100 : 0;
-            const change1w = prev1w ? ((latest.close - prev1w.close) / prev1w.close) * 100 : 0;
-
-            // ATH
-            const ath = Math.max(...rows.map(r => r.high || r.close));
-            const distFromAth = ath ? ((ath - latest.close) / ath) * 100 : 0;
-
-            // 5Y Median PE
-            // Get last 5 years of PE data
-            const fiveYearsAgo = new Date();
-            fiveYearsAgo.setFullYear(fiveYearsAgo.getFullYear() - 5);
-            const peValues = rows
-                .filter(r => new Date(r.date) >= fiveYearsAgo && r.pe !== null)
-                .map(r => r.pe)
-                .sort((a, b) => a - b);
-
-            let medianPe5y = null;
-            if (peValues.length > 0) {
-                const mid = Math.floor(peValues.length / 2);
-                medianPe5y = peValues.length % 2 !== 0
-                    ? peValues[mid]
-                    : (peValues[mid - 1] + peValues[mid]) / 2;
-            }
-
-            return {
-                symbol,
-                close: latest.close,
-                pe: latest.pe,
-                change1d,
-                change1w,
-                distFromAth,
-                medianPe5y,
-                lastUpdated: latest.date
-            };
-        });
-    }, [rawRows]);
+        return [...summaryRows]
+            .sort((a, b) => TARGET_INDICES.indexOf(a.symbol) - TARGET_INDICES.indexOf(b.symbol))
+            .map(row => ({
+                symbol: row.symbol,
+                close: row.close,
+                pe: row.pe,
+                change1d: row.change_1d ?? 0,
+                change1w: row.change_1w ?? 0,
+                distFromAth: row.dist_from_ath ?? 0,
+                medianPe5y: row.median_pe_5y,
+                lastUpdated: row.as_of
+            }));
+    }, [summaryRows]);
 
     return (
         <div className="w-full min-h-screen bg-zinc-900 py-32 px-5">
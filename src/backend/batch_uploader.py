@@ -0,0 +1,182 @@
+"""
+Pipelined batch uploader for PostgREST upserts.
+
+Keeps a few batches in flight at once, sizes each new batch from the payload
+bytes and latency observed so far, and isolates bad rows by recursive
+bisection: a failing batch is split in halves and only the halves that still
+fail are split again, so finding k bad rows in a batch of n costs about
+2k·log2(n) extra requests instead of n. Rows that fail on their own are
+appended to a JSONL rejects file instead of only being printed.
+
+Only data errors (non-retryable 4xx responses) are bisected. A batch whose
+retries run out on a transient error (network, 429, 5xx) is counted as failed
+as a whole, without rejecting any row, and so is any slice that hits a
+transient error while bisecting: an outage says nothing about the rows.
+"""
+
+import json
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime, timezone
+
+import requests
+
+from record_codec import encode_json
+from retry_policy import backoff_delay
+
+
+def is_retryable(exc: Exception) -> bool:
+    """True for failures worth retrying as-is (network errors, 429, 5xx)."""
+    if isinstance(exc, (requests.ConnectionError, requests.Timeout)):
+        return True
+    status = getattr(getattr(exc, 'response', None), 'status_code', None)
+    return status is not None and (status == 429 or status >= 500)
+
+
+class BatchUploader:
+    """
+    Concurrent, adaptive, failure-isolating batch uploader.
+
+    Args:
+        send (callable): Uploads one encoded JSON array (bytes); raises on failure
+        max_in_flight (int): Batches uploaded concurrently
+        batch_size (int): Initial rows per batch
+        min_batch (int): Smallest batch the size adapts down to
+        max_batch (int): Largest batch the size adapts up to
+        target_bytes (int): Preferred payload size per request
+        target_latency (float): Preferred seconds per request
+        retries (int): Retries of a whole batch on transient errors before it is failed
+        retry_delay (float): Base backoff before the first retry (exponential, jittered, capped)
+        rejects_path (str, optional): JSONL file receiving rows that fail on their own
+        encode (callable): Record list -> bytes encoder
+    """
+
+    def __init__(self, send, max_in_flight: int = 3, batch_size: int = 500,
+                 min_batch: int = 50, max_batch: int = 5000,
+                 target_bytes: int = 1_000_000, target_latency: float = 2.0,
+                 retries: int = 2, retry_delay: float = 1.0, rejects_path: str = None,
+                 encode=encode_json):
+        self.send = send
+        self.max_in_flight = max(max_in_flight, 1)
+        self.min_batch = max(min_batch, 1)
+        self.max_batch = max(max_batch, self.min_batch)
+        self.batch_size = min(max(batch_size, self.min_batch), self.max_batch)
+        self.target_bytes = target_bytes
+        self.target_latency = target_latency
+        self.retries = retries
+        self.retry_delay = retry_delay
+        self.rejects_path = rejects_path
+        self.encode = encode
+        self._lock = threading.Lock()
+        self.stats = {'rows_sent': 0, 'rows_rejected': 0, 'rows_failed': 0, 'batches': 0, 'requests': 0,
+                      'bisect_requests': 0, 'retries': 0, 'bytes_sent': 0}
+
+    def _count(self, **amounts) -> None:
+        with self._lock:
+            for name, amount in amounts.items():
+                self.stats[name] += amount
+
+    def _observe(self, rows: int, nbytes: int, latency: float) -> None:
+        """Adapt the batch size towards the byte and latency targets."""
+        with self._lock:
+            by_bytes = self.target_bytes / max(nbytes / rows, 1)
+            by_latency = rows * self.target_latency / max(latency, 1e-3)
+            # Grow at most 2x per observation, shrink straight to the target
+            proposal = min(by_bytes, by_latency, self.batch_size * 2)
+            self.batch_size = int(min(max(proposal, self.min_batch), self.max_batch))
+
+    def _shrink(self) -> None:
+        with self._lock:
+            self.batch_size = max(self.min_batch, self.batch_size // 2)
+
+    def _post(self, records: list, bisecting: bool = False) -> None:
+        body = self.encode(records)
+        started = time.perf_counter()
+        self._count(requests=1, bisect_requests=int(bisecting))
+        self.send(body)
+        self._observe(len(records), len(body), time.perf_counter() - started)
+        self._count(rows_sent=len(records), bytes_sent=len(body))
+
+    def _reject(self, record: dict, error: Exception) -> None:
+        self._count(rows_rejected=1)
+        print(f"    ❌ Rejected {record.get('symbol')} {record.get('date')}: {error}")
+        if not self.rejects_path:
+            return
+        entry = {
+            'rejected_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'error': str(error),
+            'record': record,
+        }
+        with self._lock:
+            os.makedirs(os.path.dirname(os.path.abspath(self.rejects_path)), exist_ok=True)
+            with open(self.rejects_path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(entry, default=str) + '\n')
+
+    def _bisect(self, records: list, error: Exception) -> None:
+        """Split a failing slice until the rows that fail on their own are found."""
+        if is_retryable(error):
+            # Transient failure mid-bisection: the slice is unsent, not bad
+            self._count(rows_failed=len(records))
+            print(f"    ⚠ {len(records)} records not saved (transient error while bisecting): {error}")
+            return
+        if len(records) == 1:
+            self._reject(records[0], error)
+            return
+        mid = len(records) // 2
+        for half in (records[:mid], records[mid:]):
+            try:
+                self._post(half, bisecting=True)
+            except Exception as half_error:
+                self._bisect(half, half_error)
+
+    def _upload_batch(self, batch_no: int, records: list) -> None:
+        for attempt in range(self.retries + 1):
+            try:
+                self._post(records)
+                print(f"  💾 Saved batch {batch_no}: {len(records)} records")
+                return
+            except Exception as e:
+                error = e
+                if not is_retryable(e) or attempt == self.retries:
+                    break
+                self._count(retries=1)
+                # Jittered so batches in flight together do not retry in lockstep
+                time.sleep(backoff_delay(attempt, self.retry_delay))
+
+        self._shrink()
+        print(f"  ❌ Error saving batch {batch_no} ({len(records)} records): {error}")
+        if is_retryable(error):
+            self._count(rows_failed=len(records))
+            print(f"     Transient error persisted after {self.retries} retries, batch left for the next run")
+            return
+        print(f"     Bisecting to isolate failing rows...")
+        self._bisect(records, error)
+
+    def upload(self, records: list) -> dict:
+        """
+        Upload records with up to max_in_flight concurrent batches.
+
+        Args:
+            records (list): JSON-ready row dicts
+
+        Returns:
+            dict: Counters (rows_sent, rows_rejected, rows_failed, batches, requests, ...)
+        """
+        offset = 0
+        batch_no = 0
+        with ThreadPoolExecutor(max_workers=self.max_in_flight) as pool:
+            pending = set()
+            while offset < len(records) or pending:
+                # Keep the pipeline full, sizing each batch from the latest observations
+                while offset < len(records) and len(pending) < self.max_in_flight:
+                    batch = records[offset:offset + self.batch_size]
+                    offset += len(batch)
+                    batch_no += 1
+                    pending.add(pool.submit(self._upload_batch, batch_no, batch))
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    future.result()
+        self._count(batches=batch_no)
+        return dict(self.stats)
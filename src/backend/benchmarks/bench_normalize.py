@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark: normalization of raw nsepython frames.
+
+Compares the original per-frame normalization (astype(str) + str.replace +
+to_numeric per column, full to_datetime per frame) against the columnar kernel
+in normalize.py, called once per frame as the sync does, on synthetic raw price and valuation histories of many indices (replay.py's
+format: string cells with thousands separators and '-' for missing values).
+
+Usage:
+    python src/backend/benchmarks/bench_normalize.py
+    python src/backend/benchmarks/bench_normalize.py --indices 50 --years 30 --repeat 5
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import pandas as pd
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+
+from normalize import HAS_ARROW, normalize_price, normalize_valuation  # noqa: E402
+from replay import synthesize_index  # noqa: E402
+
+
+def make_batch(indices: int, years: int) -> list:
+    """Raw (symbol, price_df, valuation_df) triples covering the last `years` years."""
+    end = pd.Timestamp('2026-06-30')
+    start = end - pd.DateOffset(years=years)
+    batch = []
+    for i in range(indices):
+        symbol = f"NIFTY BENCH {i:03d}"
+        price, valuation = synthesize_index(symbol, end.strftime('%Y-%m-%d'))
+        keep_price = pd.to_datetime(price['HistoricalDate'], format='%d %b %Y') >= start
+        keep_valuation = pd.to_datetime(valuation['DATE'], format='%d %b %Y') >= start
+        batch.append((symbol, price[keep_price.values].reset_index(drop=True),
+                      valuation[keep_valuation.values].reset_index(drop=True)))
+    return batch
+
+
+def legacy_price(index_name: str, hist: pd.DataFrame) -> pd.DataFrame:
+    """The original fetch_price_history normalization."""
+    hist = hist.rename(columns={'HistoricalDate': 'date', 'OPEN': 'open', 'HIGH': 'high',
+                                'LOW': 'low', 'CLOSE': 'close'})
+    hist['date'] = pd.to_datetime(hist['date'], format='%d %b %Y')
+    for col in ['open', 'high', 'low', 'close']:
+        hist[col] = pd.to_numeric(hist[col].astype(str).str.replace(',', '').replace('-', ''), errors='coerce')
+    hist = hist[~hist['close'].isna()].copy()
+    hist['symbol'] = index_name
+    return hist[['date', 'symbol', 'open', 'high', 'low', 'close']]
+
+
+def legacy_valuation(index_name: str, pe_df: pd.DataFrame) -> pd.DataFrame:
+    """The original fetch_valuation_history normalization."""
+    pe_df = pe_df.rename(columns={'DATE': 'date', 'divYield': 'div_yield'})
+    pe_df['date'] = pd.to_datetime(pe_df['date'], format='%d %b %Y')
+    pe_df['symbol'] = index_name
+    for col in ['pe', 'pb', 'div_yield']:
+        pe_df[col] = pd.to_numeric(pe_df[col].astype(str).str.replace(',', '').replace('-', ''), errors='coerce')
+    return pe_df[['date', 'symbol', 'pe', 'pb', 'div_yield']]
+
+
+def run_legacy(batch: list) -> list:
+    return ([legacy_price(symbol, price) for symbol, price, _ in batch]
+            + [legacy_valuation(symbol, valuation) for symbol, _, valuation in batch])
+
+
+def run_kernel(batch: list) -> list:
+    return ([normalize_price(symbol, price) for symbol, price, _ in batch]
+            + [normalize_valuation(symbol, valuation) for symbol, _, valuation in batch])
+
+
+def frames_bytes(frames: list) -> int:
+    return sum(int(df.memory_usage(deep=True).sum()) for df in frames)
+
+
+def check_equal(reference: list, candidate: list) -> None:
+    """Assert the kernel output matches the legacy output value for value."""
+    expected = pd.concat(reference[:len(reference) // 2], ignore_index=True), \
+        pd.concat(reference[len(reference) // 2:], ignore_index=True)
+    for want, got in zip(expected, candidate):
+        got = got.astype({'symbol': object, 'date': want['date'].dtype})
+        pd.testing.assert_frame_equal(want.reset_index(drop=True), got.reset_index(drop=True),
+                                      check_dtype=False)
+
+
+def timed(label: str, fn, batch: list, rows: int, repeat: int, baseline: float = None) -> tuple:
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        frames = fn(batch)
+        best = min(best, time.perf_counter() - started)
+    speedup = f"{baseline / best:6.1f}x" if baseline else '      -'
+    print(f"  {label:<30} {best:8.3f} s   {rows / best:>12,.0f} rows/s   "
+          f"{frames_bytes(frames) / 1e6:8.1f} MB   {speedup}")
+    return best, frames
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Benchmark normalization of raw NSE frames.')
+    parser.add_argument('--indices', type=int, default=20, help='Synthetic indices (default: 20)')
+    parser.add_argument('--years', type=int, default=30, help='Years of history per index (default: 30)')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per variant; the fastest is reported')
+    args = parser.parse_args()
+
+    batch = make_batch(args.indices, args.years)
+    rows = sum(len(price) + len(valuation) for _, price, valuation in batch)
+    print(f"Normalizing {rows:,} raw rows ({args.indices} indices x {args.years} years, "
+          f"price + valuation; string kernels: {'arrow' if HAS_ARROW else 'numpy'})")
+
+    baseline, reference = timed('legacy, per frame', run_legacy, batch, rows, args.repeat)
+    _, kernel = timed('kernel, per frame', run_kernel, batch, rows, args.repeat, baseline)
+
+    half = len(kernel) // 2
+    check_equal(reference, [pd.concat(kernel[:half], ignore_index=True),
+                            pd.concat(kernel[half:], ignore_index=True)])
+    print("  Outputs match the legacy normalization")
+
+
+if __name__ == '__main__':
+    main()
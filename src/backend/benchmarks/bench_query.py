@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark: point-in-time queries over the local history.
+
+Writes synthetic histories of many indices with history_query.write_history,
+then compares as-of point lookups and one-year range slices on the
+memory-mapped HistoryIndex against boolean masks over an in-memory DataFrame
+(the usual research-script approach), checking that both agree.
+
+Usage:
+    python src/backend/benchmarks/bench_query.py
+    python src/backend/benchmarks/bench_query.py --indices 100 --lookups 20000
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+
+from bench_store import VALUE_COLUMNS, make_windows  # noqa: E402
+from history_query import HistoryIndex, to_day, write_history  # noqa: E402
+from series_store import SeriesStore  # noqa: E402
+
+
+def timed(label: str, fn, count: int, baseline: float = None) -> float:
+    started = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - started
+    speedup = f"{baseline / elapsed:8.1f}x" if baseline else '        -'
+    print(f"  {label:<34} {count / elapsed:>12,.0f} queries/s {speedup}")
+    return elapsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Benchmark point-in-time queries over the local history.')
+    parser.add_argument('--indices', type=int, default=50, help='Synthetic indices (default: 50)')
+    parser.add_argument('--years', type=int, default=30, help='Years of history per index (default: 30)')
+    parser.add_argument('--lookups', type=int, default=5000, help='Point lookups per variant (default: 5000)')
+    args = parser.parse_args()
+
+    windows = make_windows(args.indices, args.years)
+    store = SeriesStore(VALUE_COLUMNS)
+    for df in windows:
+        store.add(df)
+    frame = pd.concat(windows, ignore_index=True)
+    path = tempfile.mkdtemp(prefix='bench-history-')
+    write_history(path, store, columns=VALUE_COLUMNS)
+    history = HistoryIndex.open(path)
+    print(f"History of {len(history):,} rows ({args.indices} indices x {args.years} years) in {path}")
+
+    rng = np.random.default_rng(7)
+    symbols = history.symbols
+    first, last = to_day(frame['date'].min()), to_day(frame['date'].max())
+    queries = [(symbols[rng.integers(len(symbols))], int(rng.integers(first, last)))
+               for _ in range(args.lookups)]
+
+    def masked_asof():
+        for symbol, day in queries:
+            rows = frame[(frame['symbol'] == symbol) & (frame['date'] <= np.datetime64(day, 'D'))]
+            rows.iloc[-1][['close', 'pe']] if len(rows) else None
+
+    def indexed_asof():
+        for symbol, day in queries:
+            history.asof(symbol, day, ['close', 'pe'])
+
+    def masked_range():
+        for symbol, day in queries:
+            start, end = np.datetime64(day, 'D'), np.datetime64(day + 365, 'D')
+            frame.loc[(frame['symbol'] == symbol) & (frame['date'] >= start) & (frame['date'] <= end), 'close']
+
+    def indexed_range():
+        for symbol, day in queries:
+            history.range(symbol, day, day + 365, ['close']).column('close')
+
+    baseline = timed('as-of lookup, DataFrame mask', masked_asof, len(queries))
+    timed('as-of lookup, HistoryIndex', indexed_asof, len(queries), baseline)
+    baseline = timed('1y range, DataFrame mask', masked_range, len(queries))
+    timed('1y range (view), HistoryIndex', indexed_range, len(queries), baseline)
+
+    for symbol, day in queries[:200]:
+        rows = frame[(frame['symbol'] == symbol) & (frame['date'] <= np.datetime64(day, 'D'))]
+        row = history.asof(symbol, day, ['close'])
+        assert (row is None) == rows.empty and (row is None or row['close'] == rows['close'].iloc[-1])
+    print("  Results match the DataFrame lookups")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark: record serialization for save_data_to_supabase.
+
+Compares the original per-cell loop (to_dict + pd.isna + strftime per value,
+then json.dumps) against the column-wise serializer and fast JSON encoder in
+record_codec, on a synthetic frame shaped like index_ind.
+
+Usage:
+    python src/backend/benchmarks/bench_serialization.py
+    python src/backend/benchmarks/bench_serialization.py --rows 200000 --batch-size 100
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from record_codec import JSON_ENCODER, encode_json, serialize_records  # noqa: E402
+
+
+def make_frame(rows: int, symbols: int = 50, nan_fraction: float = 0.05, seed: int = 7) -> pd.DataFrame:
+    """Build a synthetic index_ind-shaped frame with a sprinkling of missing values."""
+    rng = np.random.default_rng(seed)
+    per_symbol = -(-rows // symbols)
+    dates = pd.bdate_range('1990-01-01', periods=per_symbol)
+    df = pd.DataFrame({
+        'date': np.tile(dates.values, symbols)[:rows],
+        'symbol': np.repeat([f"NIFTY INDEX {i}" for i in range(symbols)], per_symbol)[:rows],
+    })
+    for col in ['open', 'high', 'low', 'close', 'pe', 'pb', 'div_yield']:
+        values = rng.uniform(1, 30000, rows).round(2)
+        values[rng.random(rows) < nan_fraction] = np.nan
+        df[col] = values
+    return df
+
+
+def legacy_serialize(df: pd.DataFrame) -> list:
+    """The original save_data_to_supabase conversion loop."""
+    records = df.to_dict(orient='records')
+    for record in records:
+        for key, value in record.items():
+            if pd.isna(value):
+                record[key] = None
+            elif key == 'date' and isinstance(value, (pd.Timestamp, datetime)):
+                record[key] = value.strftime('%Y-%m-%d')
+    return records
+
+
+def run(label: str, serialize, encode, df: pd.DataFrame, batch_size: int) -> float:
+    start = time.perf_counter()
+    records = serialize(df)
+    payload_bytes = 0
+    for offset in range(0, len(records), batch_size):
+        payload_bytes += len(encode(records[offset:offset + batch_size]))
+    elapsed = time.perf_counter() - start
+    rate = len(df) / elapsed
+    print(f"  {label:<28} {elapsed:8.2f} s   {rate:>12,.0f} records/s   {payload_bytes / 1e6:8.1f} MB")
+    return rate
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Benchmark record serialization for Supabase uploads.')
+    parser.add_argument('--rows', type=int, default=1_000_000, help='Synthetic rows (default: 1,000,000)')
+    parser.add_argument('--batch-size', type=int, default=100, help='Records per encoded batch (default: 100)')
+    args = parser.parse_args()
+
+    df = make_frame(args.rows)
+    print(f"Serializing {len(df):,} rows in batches of {args.batch_size} (fast encoder: {JSON_ENCODER})")
+    before = run('legacy loop + json.dumps', legacy_serialize, lambda b: json.dumps(b).encode('utf-8'),
+                 df, args.batch_size)
+    after = run(f'vectorized + {JSON_ENCODER}', serialize_records, encode_json, df, args.batch_size)
+    print(f"  Speedup: {after / before:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
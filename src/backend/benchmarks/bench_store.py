@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark: buffering fetched rows for the end-of-run diff.
+
+Compares the original buffer (a list of fetched frames, concatenated when the
+sink closes, with per-index lookups as `df['symbol'] == name` scans) against
+series_store.SeriesStore (per-symbol contiguous blocks, O(1) block and last
+date lookups, frames materialized per batch of symbols). Each index arrives as
+yearly windows, like a backfill. Memory is the peak traced by tracemalloc.
+
+Usage:
+    python src/backend/benchmarks/bench_store.py
+    python src/backend/benchmarks/bench_store.py --indices 100 --years 30
+"""
+
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+import pandas as pd
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+
+from normalize import normalize_price, normalize_valuation  # noqa: E402
+from replay import synthesize_index  # noqa: E402
+from series_store import SeriesStore  # noqa: E402
+
+VALUE_COLUMNS = ['open', 'high', 'low', 'close', 'pe', 'pb', 'div_yield']
+
+# Rows per materialized batch, as BufferedSink uses
+BATCH_ROWS = 100_000
+
+
+def make_windows(indices: int, years: int) -> list:
+    """Normalized yearly windows of `indices` synthetic indices, in fetch order."""
+    end = pd.Timestamp('2026-06-30')
+    start = end - pd.DateOffset(years=years)
+    windows = []
+    for i in range(indices):
+        symbol = f"NIFTY BENCH {i:03d}"
+        price, valuation = synthesize_index(symbol, end.strftime('%Y-%m-%d'))
+        df = normalize_price(symbol, price).merge(normalize_valuation(symbol, valuation),
+                                                  on=['date', 'symbol'], how='left')
+        df = df[df['date'] >= start]
+        df['symbol'] = df['symbol'].astype(str)
+        windows.extend(group for _, group in df.groupby(df['date'].dt.year))
+    return windows
+
+
+def run_frames(windows: list, symbols: list) -> tuple:
+    frames = [df.copy() for df in windows]
+    combined = pd.concat(frames, ignore_index=True)
+    last = {symbol: combined.loc[combined['symbol'] == symbol, 'date'].max() for symbol in symbols}
+    return len(combined), last
+
+
+def run_store(windows: list, symbols: list) -> tuple:
+    store = SeriesStore(VALUE_COLUMNS)
+    for df in windows:
+        store.add(df)
+    last = {symbol: store.last_date(symbol) for symbol in symbols}
+    rows = sum(len(store.frame(batch)) for batch in store.batches(BATCH_ROWS))
+    return rows, last
+
+
+def measure(label: str, fn, windows: list, symbols: list, baseline: tuple = None) -> tuple:
+    tracemalloc.start()
+    started = time.perf_counter()
+    rows, last = fn(windows, symbols)
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    speed = f"{baseline[0] / elapsed:5.1f}x" if baseline else '    -'
+    memory = f"{baseline[1] / peak:5.1f}x" if baseline else '    -'
+    print(f"  {label:<28} {elapsed:7.3f} s {speed}   peak {peak / 1e6:8.1f} MB {memory}   {rows:,} rows")
+    return (elapsed, peak), last
+
+
+def time_lookups(windows: list, symbols: list) -> None:
+    """Per-index last-date lookup cost on the filled buffers."""
+    combined = pd.concat(windows, ignore_index=True)
+    started = time.perf_counter()
+    for symbol in symbols:
+        combined.loc[combined['symbol'] == symbol, 'date'].max()
+    scan = (time.perf_counter() - started) / len(symbols)
+
+    store = SeriesStore(VALUE_COLUMNS)
+    for df in windows:
+        store.add(df)
+    started = time.perf_counter()
+    for symbol in symbols:
+        store.last_date(symbol)
+    lookup = (time.perf_counter() - started) / len(symbols)
+    print(f"  last date per index: column scan {scan * 1e6:,.0f} µs, store {lookup * 1e6:,.1f} µs")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Benchmark the fetched-row buffer of the sync.')
+    parser.add_argument('--indices', type=int, default=50, help='Synthetic indices (default: 50)')
+    parser.add_argument('--years', type=int, default=30, help='Years of history per index (default: 30)')
+    args = parser.parse_args()
+
+    windows = make_windows(args.indices, args.years)
+    symbols = sorted({df['symbol'].iloc[0] for df in windows})
+    rows = sum(len(df) for df in windows)
+    print(f"Buffering {rows:,} rows in {len(windows):,} windows ({args.indices} indices x {args.years} years)")
+
+    baseline, expected = measure('frame list + concat', run_frames, windows, symbols)
+    _, last = measure('series store, batched', run_store, windows, symbols, baseline)
+    assert all(pd.Timestamp(last[s]) == expected[s] for s in symbols), 'last dates differ'
+    time_lookups(windows, symbols)
+
+
+if __name__ == '__main__':
+    main()
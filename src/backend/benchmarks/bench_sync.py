@@ -0,0 +1,269 @@
+#!/usr/bin/env python3
+"""
+Offline end-to-end benchmark of the index-price.py sync path.
+
+Runs update_supabase_table() against the NSE replay layer (replay.py) and the
+in-memory Supabase stand-in (fake_supabase.py), so every optimization can be
+measured without network access and with reproducible latency and failures.
+
+Scenarios:
+    cold_backfill      5 default indices from 1990 into an empty table
+    daily_incremental  5 default indices, table and stats state one session behind
+    universe_100       --universe all over 100 indices (80 synced a session behind, 20 new)
+    failure_storm      3-year backfill with 30% upstream failures and 5% empty responses
+
+Each scenario runs in its own child process so peak RSS is per scenario.
+Reported: wall time of the sync, rows written per second, NSE calls (and
+injected failures), Supabase requests and bytes, and peak RSS.
+
+Usage:
+    python src/backend/benchmarks/bench_sync.py
+    python src/backend/benchmarks/bench_sync.py --scenarios daily_incremental --repeat 3
+    python src/backend/benchmarks/bench_sync.py --fixtures fixtures/nse --output before.json
+"""
+
+import argparse
+import contextlib
+import importlib.util
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, BACKEND_DIR)
+sys.path.insert(0, BENCH_DIR)
+
+from fake_supabase import FakeSupabase  # noqa: E402
+from replay import ReplayNSE  # noqa: E402
+
+DATE_FORMAT = '%d-%b-%Y'
+
+UNIVERSE_SIZE = 100
+
+SCENARIOS = {
+    'cold_backfill': {
+        'start': '01-Jan-1990', 'history_days': None, 'universe': None,
+        'workers': 2, 'latency': 0.05, 'jitter': 0.02, 'failure_rate': 0.0, 'empty_rate': 0.0,
+    },
+    'daily_incremental': {
+        'start': '01-Jan-1990', 'history_days': 6 * 365, 'universe': None,
+        'workers': 2, 'latency': 0.05, 'jitter': 0.02, 'failure_rate': 0.0, 'empty_rate': 0.0,
+    },
+    'universe_100': {
+        'start': None, 'history_days': 365, 'universe': 'all', 'new_indices': 20,
+        'workers': 4, 'latency': 0.05, 'jitter': 0.02, 'failure_rate': 0.0, 'empty_rate': 0.0,
+    },
+    'failure_storm': {
+        'start': None, 'backfill_days': 3 * 365, 'history_days': None, 'universe': None,
+        'workers': 2, 'latency': 0.1, 'jitter': 0.05, 'failure_rate': 0.3, 'empty_rate': 0.05,
+    },
+}
+
+
+def load_fetcher():
+    """Import index-price.py (hyphenated, so not importable by name) as a module."""
+    spec = importlib.util.spec_from_file_location('index_price', os.path.join(BACKEND_DIR, 'index-price.py'))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def universe_names(defaults: list, size: int) -> list:
+    return list(defaults) + [f"NIFTY BENCH {i:03d}" for i in range(size - len(defaults))]
+
+
+def prefill(fetcher, client: FakeSupabase, indices: list, start: str, end: str) -> None:
+    """Seed the fake table and rolling-stats state as if earlier runs synced start..end."""
+    from record_codec import serialize_records
+
+    frames = [fetcher.fetch_data_for_index(name, start, end) for name in indices]
+    frames = [df for df in frames if not df.empty]
+    if not frames:
+        return
+    df = fetcher.pd.concat(frames, ignore_index=True)
+    client.load(fetcher.TABLE_NAME, serialize_records(df))
+    engine = fetcher.RollingStatsEngine(fetcher.STATS_STATE_PATH, window_years=fetcher.STATS_WINDOW_YEARS)
+    engine.update(df)
+    engine.save()
+    rollups = fetcher.RollupBuilder(fetcher.ROLLUP_STATE_PATH)
+    rollups.add(df)
+    fetcher.refresh_history_rollups(rollups, [])
+
+
+def peak_rss_mb() -> float:
+    if resource is None:
+        return float('nan')
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    scale = 1024 * 1024 if sys.platform == 'darwin' else 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale
+
+
+def run_scenario(name: str, fixtures: str = None, latency_scale: float = 1.0, verbose: bool = False) -> dict:
+    """
+    Run one scenario in this process.
+
+    Returns:
+        dict: Measurements for the scenario
+    """
+    config = SCENARIOS[name]
+    fetcher = load_fetcher()
+    state_dir = tempfile.mkdtemp(prefix=f'bench-{name}-')
+
+    today = datetime.now()
+    # Synthetic and recorded histories end on the last business day before today
+    end = today - timedelta(days=1)
+    while end.weekday() >= 5:
+        end -= timedelta(days=1)
+    end_date = end.strftime(DATE_FORMAT)
+    previous = end - timedelta(days=1)
+    while previous.weekday() >= 5:
+        previous -= timedelta(days=1)
+
+    replay = ReplayNSE(fixtures, synthetic_end=end.strftime('%Y-%m-%d'))
+    client = FakeSupabase()
+    listing_calls = []
+
+    indices = fetcher.DEFAULT_INDICES
+    if config['universe'] == 'all':
+        indices = universe_names(fetcher.DEFAULT_INDICES, UNIVERSE_SIZE)
+
+    def get_equity_indices():
+        listing_calls.append(1)
+        return list(indices)
+
+    fetcher.index_history = replay.index_history
+    fetcher.index_pe_pb_div = replay.index_pe_pb_div
+    fetcher.get_supabase_client = lambda: client
+    fetcher.postgrest_upsert = client.postgrest_upsert
+    fetcher.get_equity_indices = get_equity_indices
+    fetcher.UPSTREAM_GATE = fetcher.UpstreamGate(rate=0)
+    fetcher.RESPONSE_CACHE = None
+    fetcher.WINDOW_RETRY_DELAY = 0.1
+    fetcher.CIRCUIT_BREAKERS = fetcher.HostBreakers(threshold=5, cooldown=1.0)
+    fetcher.STATS_STATE_PATH = os.path.join(state_dir, 'rolling-stats.json')
+    fetcher.ROLLUP_STATE_PATH = os.path.join(state_dir, 'history-rollups.json')
+    fetcher.UNIVERSE_CURSOR_PATH = os.path.join(state_dir, 'universe-cursor.json')
+    fetcher.CALENDAR_STATE_PATH = os.path.join(state_dir, 'trading-calendar.json')
+    fetcher.GAP_STATE_PATH = os.path.join(state_dir, 'gap-audit.json')
+    fetcher.REJECTS_PATH = os.path.join(state_dir, 'upload-rejects.jsonl')
+
+    start_date = config['start']
+    if config.get('backfill_days'):
+        start_date = (end - timedelta(days=config['backfill_days'])).strftime(DATE_FORMAT)
+
+    sink = io.StringIO()
+    with contextlib.redirect_stdout(sys.stdout if verbose else sink):
+        if config['history_days']:
+            history_start = (end - timedelta(days=config['history_days'])).strftime(DATE_FORMAT)
+            synced = indices[:len(indices) - config.get('new_indices', 0)]
+            prefill(fetcher, client, synced, history_start, previous.strftime(DATE_FORMAT))
+            start_date = start_date or history_start
+        prefilled_rows = client.row_count()
+        seeded_calls = replay.total_calls
+
+        replay.calls = {'price': 0, 'valuation': 0}
+        replay.latency = config['latency'] * latency_scale
+        replay.jitter = config['jitter'] * latency_scale
+        replay.failure_rate = config['failure_rate']
+        replay.empty_rate = config['empty_rate']
+        client.stats = type(client.stats)()
+
+        started = time.perf_counter()
+        fetcher.update_supabase_table(
+            start_date, end_date,
+            specific_indices=None if config['universe'] else list(indices),
+            workers=config['workers'],
+            universe=config['universe'],
+        )
+        wall = time.perf_counter() - started
+
+    stats = client.stats
+    return {
+        'scenario': name,
+        'indices': len(indices),
+        'wall_s': round(wall, 3),
+        'rows_written': stats.rows_written,
+        'rows_per_s': round(stats.rows_written / wall, 1) if wall else None,
+        'table_rows': client.row_count(),
+        'prefilled_rows': prefilled_rows,
+        'prefill_nse_calls': seeded_calls,
+        'nse_calls': replay.total_calls + len(listing_calls),
+        'nse_failures': replay.failures,
+        'nse_empty': replay.empties,
+        'supabase_calls': stats.total_calls,
+        'supabase_calls_by_kind': dict(stats.calls),
+        'bytes_up': stats.bytes_up,
+        'bytes_down': stats.bytes_down,
+        'peak_rss_mb': round(peak_rss_mb(), 1),
+    }
+
+
+def run_child(name: str, args) -> dict:
+    """Run a scenario in a fresh interpreter and parse its JSON result."""
+    command = [sys.executable, os.path.abspath(__file__), '--child', name,
+               '--latency-scale', str(args.latency_scale)]
+    if args.fixtures:
+        command += ['--fixtures', args.fixtures]
+    if args.verbose:
+        command.append('--verbose')
+    completed = subprocess.run(command, stdout=subprocess.PIPE, text=True, check=True)
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def print_table(results: list) -> None:
+    header = (f"  {'scenario':<18} {'wall s':>8} {'rows':>9} {'rows/s':>10} {'NSE calls':>10} "
+              f"{'failures':>9} {'DB calls':>9} {'MB up':>8} {'MB down':>8} {'peak MB':>8}")
+    print(header)
+    print(f"  {'-' * (len(header) - 2)}")
+    for r in results:
+        print(f"  {r['scenario']:<18} {r['wall_s']:>8.2f} {r['rows_written']:>9,} {r['rows_per_s'] or 0:>10,.0f} "
+              f"{r['nse_calls']:>10,} {r['nse_failures']:>9,} {r['supabase_calls']:>9,} "
+              f"{r['bytes_up'] / 1e6:>8.2f} {r['bytes_down'] / 1e6:>8.2f} {r['peak_rss_mb']:>8.1f}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Offline end-to-end benchmark of the index sync.')
+    parser.add_argument('--scenarios', nargs='+', choices=sorted(SCENARIOS), default=list(SCENARIOS),
+                        help='Scenarios to run (default: all)')
+    parser.add_argument('--fixtures', help='Directory of recorded NSE responses (default: synthetic)')
+    parser.add_argument('--latency-scale', type=float, default=1.0,
+                        help='Multiplier for injected NSE latency (0 = CPU cost only)')
+    parser.add_argument('--repeat', type=int, default=1, help='Runs per scenario; the fastest is reported')
+    parser.add_argument('--output', help='Write all results as JSON to this file')
+    parser.add_argument('--verbose', action='store_true', help='Show the fetcher output')
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        result = run_scenario(args.child, args.fixtures, args.latency_scale, args.verbose)
+        print(json.dumps(result))
+        return
+
+    results = []
+    for name in args.scenarios:
+        print(f"Running {name}...", flush=True)
+        runs = [run_child(name, args) for _ in range(max(args.repeat, 1))]
+        results.append(min(runs, key=lambda r: r['wall_s']))
+
+    print()
+    print_table(results)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'recorded_at': datetime.now().isoformat(timespec='seconds'),
+                       'latency_scale': args.latency_scale, 'results': results}, f, indent=2)
+        print(f"\nResults written to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
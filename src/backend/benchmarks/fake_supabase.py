@@ -0,0 +1,197 @@
+"""
+In-process stand-in for the Supabase project used by index-price.py.
+
+Implements the subset of the supabase-py query builder the fetcher uses
+(select/eq/in_/gte/lte/order/limit/range, upsert, rpc) plus the raw PostgREST
+upsert endpoint, over an in-memory table. Every call is counted together with
+the JSON bytes that would have crossed the wire, so benchmarks can compare
+request counts and transfer volume between versions of the sync path.
+"""
+
+import json
+import threading
+from types import SimpleNamespace
+
+
+def _json_size(payload) -> int:
+    return len(json.dumps(payload, separators=(',', ':'), default=str))
+
+
+class RequestStats:
+    """Thread-safe request and byte counters."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.calls = {}
+        self.bytes_up = 0
+        self.bytes_down = 0
+        self.rows_written = 0
+
+    def record(self, kind: str, up: int = 0, down: int = 0, rows: int = 0) -> None:
+        with self._lock:
+            self.calls[kind] = self.calls.get(kind, 0) + 1
+            self.bytes_up += up
+            self.bytes_down += down
+            self.rows_written += rows
+
+    @property
+    def total_calls(self) -> int:
+        return sum(self.calls.values())
+
+
+class FakeQuery:
+    """Chainable query over one in-memory table; executed lazily by execute()."""
+
+    def __init__(self, client: 'FakeSupabase', table: str):
+        self.client = client
+        self.table = table
+        self.columns = None
+        self.count = None
+        self.filters = []
+        self.orders = []
+        self.offset = 0
+        self.limit_rows = None
+        self.upsert_rows = None
+        self.on_conflict = None
+
+    def select(self, columns: str = '*', count=None):
+        self.columns = None if columns.strip() == '*' else [c.strip() for c in columns.split(',')]
+        self.count = count
+        return self
+
+    def eq(self, column, value):
+        self.filters.append(lambda row: row.get(column) == value)
+        return self
+
+    def in_(self, column, values):
+        values = set(values)
+        self.filters.append(lambda row: row.get(column) in values)
+        return self
+
+    def gte(self, column, value):
+        self.filters.append(lambda row: row.get(column) is not None and row.get(column) >= value)
+        return self
+
+    def lte(self, column, value):
+        self.filters.append(lambda row: row.get(column) is not None and row.get(column) <= value)
+        return self
+
+    def order(self, column, desc: bool = False, nullsfirst=None, **_):
+        self.orders.append((column, desc))
+        return self
+
+    def limit(self, rows: int):
+        self.limit_rows = rows
+        return self
+
+    def range(self, start: int, end: int):
+        self.offset = start
+        self.limit_rows = end - start + 1
+        return self
+
+    def upsert(self, rows, on_conflict: str = None, **_):
+        self.upsert_rows = list(rows)
+        self.on_conflict = on_conflict
+        return self
+
+    def execute(self):
+        if self.upsert_rows is not None:
+            return self.client._upsert(self.table, self.upsert_rows, self.on_conflict)
+        return self.client._select(self)
+
+
+class FakeSupabase:
+    """
+    Minimal Supabase client over in-memory tables.
+
+    Args:
+        max_rows (int): Server-side row cap applied to every select, like PostgREST's max-rows
+        rpc_enabled (bool): Serve the index_watermarks() RPC (otherwise it raises, as when
+                            the function is not installed)
+    """
+
+    def __init__(self, max_rows: int = 1000, rpc_enabled: bool = True):
+        self.max_rows = max_rows
+        self.rpc_enabled = rpc_enabled
+        self.tables = {}
+        self.stats = RequestStats()
+        self._lock = threading.Lock()
+
+    def _rows(self, table: str) -> dict:
+        return self.tables.setdefault(table, {})
+
+    def _key(self, table: str, row: dict, on_conflict: str = None) -> tuple:
+        columns = (on_conflict or ('symbol' if table == 'index_summary' else 'date,symbol')).split(',')
+        return tuple(row.get(col.strip()) for col in columns)
+
+    def load(self, table: str, rows: list) -> None:
+        """Seed a table without counting requests."""
+        store = self._rows(table)
+        for row in rows:
+            store[self._key(table, row)] = dict(row)
+
+    def table(self, name: str) -> FakeQuery:
+        return FakeQuery(self, name)
+
+    def rpc(self, name: str, params: dict):
+        client = self
+
+        class _Rpc:
+            def execute(self_inner):
+                if not client.rpc_enabled or name != 'index_watermarks':
+                    client.stats.record('rpc_error')
+                    raise RuntimeError(f"function {name} does not exist")
+                symbols = set(params.get('symbols', []))
+                summary = {}
+                with client._lock:
+                    for row in client._rows('index_ind').values():
+                        if row['symbol'] in symbols:
+                            entry = summary.setdefault(row['symbol'], [row['date'], row['date'], 0])
+                            entry[0] = min(entry[0], row['date'])
+                            entry[1] = max(entry[1], row['date'])
+                            entry[2] += 1
+                data = [{'symbol': s, 'first_date': v[0], 'last_date': v[1], 'row_count': v[2]}
+                        for s, v in summary.items()]
+                client.stats.record('rpc', up=_json_size(params), down=_json_size(data))
+                return SimpleNamespace(data=data, count=None)
+
+        return _Rpc()
+
+    def _select(self, query: FakeQuery):
+        with self._lock:
+            rows = [row for row in self._rows(query.table).values() if all(f(row) for f in query.filters)]
+        for column, desc in reversed(query.orders):
+            present = [r for r in rows if r.get(column) is not None]
+            missing = [r for r in rows if r.get(column) is None]
+            rows = sorted(present, key=lambda r: r[column], reverse=desc) + missing
+        total = len(rows)
+        limit = min(query.limit_rows or self.max_rows, self.max_rows)
+        rows = rows[query.offset:query.offset + limit]
+        if query.columns:
+            rows = [{col: row.get(col) for col in query.columns} for row in rows]
+        else:
+            rows = [dict(row) for row in rows]
+        self.stats.record('select', down=_json_size(rows))
+        return SimpleNamespace(data=rows, count=total if query.count else None)
+
+    def _upsert(self, table: str, rows: list, on_conflict: str = None):
+        with self._lock:
+            store = self._rows(table)
+            for row in rows:
+                key = self._key(table, row, on_conflict)
+                store[key] = {**store.get(key, {}), **row}
+        self.stats.record('upsert', up=_json_size(rows))
+        return SimpleNamespace(data=[], count=None)
+
+    def postgrest_upsert(self, body: bytes) -> None:
+        """Stand-in for index-price.postgrest_upsert (raw, pre-encoded index_ind upsert)."""
+        rows = json.loads(body)
+        with self._lock:
+            store = self._rows('index_ind')
+            for row in rows:
+                key = (row['date'], row['symbol'])
+                store[key] = {**store.get(key, {}), **row}
+        self.stats.record('rest_upsert', up=len(body), rows=len(rows))
+
+    def row_count(self, table: str = 'index_ind') -> int:
+        return len(self._rows(table))
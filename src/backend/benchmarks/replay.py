@@ -0,0 +1,210 @@
+"""
+Replay layer for NSE responses.
+
+Serves recorded `index_history` / `index_pe_pb_div` frames (raw, exactly as
+nsepython returned them) for any requested date range, with configurable
+latency and failure injection, so the sync path can be benchmarked offline and
+deterministically.
+
+Fixtures are one pickle per index and series under a fixture directory:
+
+    <fixture_dir>/<INDEX NAME>.price.pkl
+    <fixture_dir>/<INDEX NAME>.valuation.pkl
+
+Record them once against the live API with:
+
+    python src/backend/benchmarks/replay.py record --out fixtures/nse --start 01-Jan-1990
+
+Indices without a recording are synthesized as a seeded random walk in the
+same raw format (string cells with thousands separators and '-' for missing
+values), so scenarios with 100+ indices do not require 100 recordings.
+"""
+
+import argparse
+import os
+import random
+import threading
+import time
+import zlib
+
+import numpy as np
+import pandas as pd
+
+RAW_DATE_FORMAT = '%d %b %Y'
+REQUEST_DATE_FORMAT = '%d-%b-%Y'
+
+# Synthetic history starts here; earlier requests return what exists from this date
+SYNTHETIC_START = '1990-07-03'
+
+
+class InjectedFailure(ConnectionError):
+    """Raised by the replay layer to simulate an upstream error."""
+
+
+def _fixture_path(fixture_dir: str, index_name: str, series: str) -> str:
+    return os.path.join(fixture_dir, f"{index_name}.{series}.pkl")
+
+
+def _format_raw(values: np.ndarray, missing: np.ndarray) -> list:
+    return ['-' if gap else f"{value:,.2f}" for value, gap in zip(values, missing)]
+
+
+def synthesize_index(index_name: str, end: str = None) -> tuple:
+    """
+    Build a deterministic raw price and valuation history for one index.
+
+    Args:
+        index_name (str): Seeds the random walk, so each index gets its own series
+        end (str, optional): Last business day to generate (default: today)
+
+    Returns:
+        tuple: (price_df, valuation_df) in nsepython's raw column layout
+    """
+    rng = np.random.default_rng(zlib.crc32(index_name.encode('utf-8')))
+    dates = pd.bdate_range(SYNTHETIC_START, end or pd.Timestamp.today().normalize())
+    n = len(dates)
+    close = 1000 * np.exp(np.cumsum(rng.normal(0.0004, 0.012, n)))
+    spread = np.abs(rng.normal(0, 0.006, n)) * close
+    open_ = close * (1 + rng.normal(0, 0.003, n))
+    high = np.maximum(open_, close) + spread
+    low = np.minimum(open_, close) - spread
+    missing = rng.random(n) < 0.002
+    raw_dates = dates.strftime(RAW_DATE_FORMAT)
+
+    price = pd.DataFrame({
+        'Index Name': index_name,
+        'INDEX_NAME': index_name,
+        'HistoricalDate': raw_dates,
+        'OPEN': _format_raw(open_, missing),
+        'HIGH': _format_raw(high, missing),
+        'LOW': _format_raw(low, missing),
+        'CLOSE': _format_raw(close, np.zeros(n, dtype=bool)),
+    })
+    pe = 12 + 14 / (1 + np.exp(-np.cumsum(rng.normal(0, 0.02, n))))
+    valuation = pd.DataFrame({
+        'Index Name': index_name,
+        'INDEX_NAME': index_name,
+        'DATE': raw_dates,
+        'pe': _format_raw(pe, missing),
+        'pb': _format_raw(pe / 6.5, missing),
+        'divYield': _format_raw(30 / pe, missing),
+    })
+    return price, valuation
+
+
+class ReplayNSE:
+    """
+    Drop-in replacement for nsepython's index_history and index_pe_pb_div.
+
+    Args:
+        fixture_dir (str, optional): Directory of recorded fixtures
+        latency (float): Mean injected seconds per call
+        jitter (float): Uniform +/- seconds added to the latency
+        failure_rate (float): Probability that a call raises InjectedFailure
+        empty_rate (float): Probability that a call returns an empty frame
+        seed (int): Seed for latency and failure draws
+        synthetic_end (str, optional): Last date of synthesized histories
+    """
+
+    def __init__(self, fixture_dir: str = None, latency: float = 0.0, jitter: float = 0.0,
+                 failure_rate: float = 0.0, empty_rate: float = 0.0, seed: int = 11,
+                 synthetic_end: str = None):
+        self.fixture_dir = fixture_dir
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.empty_rate = empty_rate
+        self.synthetic_end = synthetic_end
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._frames = {}
+        self.calls = {'price': 0, 'valuation': 0}
+        self.failures = 0
+        self.empties = 0
+
+    def _load(self, index_name: str) -> dict:
+        with self._lock:
+            if index_name in self._frames:
+                return self._frames[index_name]
+        frames = None
+        if self.fixture_dir:
+            paths = {series: _fixture_path(self.fixture_dir, index_name, series)
+                     for series in ('price', 'valuation')}
+            if all(os.path.exists(path) for path in paths.values()):
+                frames = {series: pd.read_pickle(path) for series, path in paths.items()}
+        if frames is None:
+            price, valuation = synthesize_index(index_name, self.synthetic_end)
+            frames = {'price': price, 'valuation': valuation}
+        # Parse dates once so each request is a cheap slice
+        indexed = {}
+        for series, df in frames.items():
+            date_col = 'HistoricalDate' if series == 'price' else 'DATE'
+            days = pd.to_datetime(df[date_col], format=RAW_DATE_FORMAT).to_numpy()
+            order = np.argsort(days, kind='stable')
+            indexed[series] = (days[order], df.iloc[order].reset_index(drop=True))
+        with self._lock:
+            return self._frames.setdefault(index_name, indexed)
+
+    def _serve(self, series: str, index_name: str, start: str, end: str) -> pd.DataFrame:
+        with self._lock:
+            self.calls[series] += 1
+            delay = max(self.latency + self._rng.uniform(-self.jitter, self.jitter), 0.0)
+            draw = self._rng.random()
+        if delay:
+            time.sleep(delay)
+        if draw < self.failure_rate:
+            with self._lock:
+                self.failures += 1
+            raise InjectedFailure(f"injected {series} failure for {index_name}")
+        if draw < self.failure_rate + self.empty_rate:
+            with self._lock:
+                self.empties += 1
+            return pd.DataFrame()
+
+        days, df = self._load(index_name)[series]
+        lo = np.searchsorted(days, np.datetime64(pd.to_datetime(start, format=REQUEST_DATE_FORMAT)), 'left')
+        hi = np.searchsorted(days, np.datetime64(pd.to_datetime(end, format=REQUEST_DATE_FORMAT)), 'right')
+        return df.iloc[lo:hi].reset_index(drop=True)
+
+    def index_history(self, index_name: str, start: str, end: str) -> pd.DataFrame:
+        return self._serve('price', index_name, start, end)
+
+    def index_pe_pb_div(self, index_name: str, start: str, end: str) -> pd.DataFrame:
+        return self._serve('valuation', index_name, start, end)
+
+    @property
+    def total_calls(self) -> int:
+        return sum(self.calls.values())
+
+
+def record(indices: list, out_dir: str, start: str, end: str) -> None:
+    """Record raw nsepython responses for the given indices into out_dir."""
+    from nsepython import index_history, index_pe_pb_div
+
+    os.makedirs(out_dir, exist_ok=True)
+    for index_name in indices:
+        print(f"Recording {index_name} ({start} → {end})")
+        for series, fetch in (('price', index_history), ('valuation', index_pe_pb_div)):
+            df = fetch(index_name, start, end)
+            df.to_pickle(_fixture_path(out_dir, index_name, series))
+            print(f"  {series}: {len(df)} rows")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Record NSE responses for offline benchmarks.')
+    sub = parser.add_subparsers(dest='command', required=True)
+    rec = sub.add_parser('record', help='Record live responses into a fixture directory')
+    rec.add_argument('--out', required=True, help='Fixture directory')
+    rec.add_argument('--indices', nargs='+',
+                     default=['NIFTY 50', 'NIFTY NEXT 50', 'NIFTY MIDCAP 150',
+                              'NIFTY SMLCAP 250', 'NIFTY LARGEMID250'],
+                     help='Indices to record')
+    rec.add_argument('--start', default='01-Jan-1990', help='Start date (DD-MMM-YYYY)')
+    rec.add_argument('--end', default=pd.Timestamp.today().strftime(REQUEST_DATE_FORMAT),
+                     help='End date (DD-MMM-YYYY, default: today)')
+    args = parser.parse_args()
+    record(args.indices, args.out, args.start, args.end)
+
+
+if __name__ == '__main__':
+    main()
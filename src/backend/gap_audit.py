@@ -0,0 +1,242 @@
+"""
+Gap detection for stored index history.
+
+The incremental sync only looks at each symbol's last stored date, so holes in
+the middle of a history (partial past runs, upstream outages, fallbacks that
+fetched only recent data) are never repaired. The audit here:
+
+    1. builds an interval index of the sessions present per symbol, where an
+       interval is a run of consecutive trading sessions,
+    2. reads the holes between intervals off the trading calendar, and
+    3. coalesces holes separated by only a few present sessions into one
+       request window, since refetching a handful of stored rows is cheaper
+       than an extra round trip.
+
+Windows upstream has already answered with no data are remembered, so the
+same unfillable hole (e.g. before an index's launch) is not requested again.
+The sync shares this record: a window that keeps coming back empty for
+EMPTY_GIVE_UP_RUNS runs (a delisted or renamed index) is given up on too.
+
+Before the first year of the holiday list, the calendar cannot tell exchange
+holidays from weekdays with missing rows, so expected sessions there are the
+sessions observed for any index: a weekday every index lacks is taken as a
+closure learned from stored history, and only days other indices have are
+reported missing.
+"""
+
+import bisect
+import json
+import os
+from datetime import date, datetime
+
+from trading_calendar import TradingCalendar, to_ordinal
+
+# Present sessions between two holes worth refetching to merge them into one window
+GAP_BRIDGE_SESSIONS = 5
+
+# Runs in which the sync got an empty answer for a window before it stops requesting it
+EMPTY_GIVE_UP_RUNS = 3
+
+
+class IntervalIndex:
+    """
+    Sorted, non-overlapping runs of consecutive trading sessions.
+
+    Intervals are stored as parallel start/end ordinal lists, so membership
+    and hole lookups are binary searches.
+    """
+
+    def __init__(self):
+        self.starts = []
+        self.ends = []
+
+    @classmethod
+    def from_days(cls, days, calendar: TradingCalendar) -> 'IntervalIndex':
+        """
+        Build the index from present dates.
+
+        Args:
+            days (iterable): Dates present for one symbol (any type accepted by to_ordinal)
+            calendar (TradingCalendar): Defines which dates are consecutive sessions
+
+        Returns:
+            IntervalIndex: One interval per run of consecutive sessions
+        """
+        index = cls()
+        for day in sorted({to_ordinal(day) for day in days}):
+            if index.ends and calendar.next_session(index.ends[-1]).toordinal() >= day:
+                index.ends[-1] = day
+            else:
+                index.starts.append(day)
+                index.ends.append(day)
+        return index
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def __iter__(self):
+        return iter(zip(self.starts, self.ends))
+
+    def contains(self, day) -> bool:
+        day = to_ordinal(day)
+        i = bisect.bisect_right(self.starts, day) - 1
+        return i >= 0 and day <= self.ends[i]
+
+    @property
+    def first(self):
+        return self.starts[0] if self.starts else None
+
+    @property
+    def last(self):
+        return self.ends[-1] if self.ends else None
+
+
+def expected_sessions(calendar: TradingCalendar, start: int, end: int) -> int:
+    """
+    Sessions expected in [start, end]: observed sessions before the holiday list's
+    first year, calendar sessions from then on.
+    """
+    cutoff = calendar.listed_from
+    if cutoff is None or start >= cutoff:
+        return calendar.sessions_between(start, end)
+    observed = len(calendar.observed_between(start, min(end, cutoff - 1)))
+    return observed + calendar.sessions_between(cutoff, end)
+
+
+def find_gaps(index: IntervalIndex, calendar: TradingCalendar, start=None) -> list:
+    """
+    Missing session ranges of a symbol, up to its last present date.
+
+    Args:
+        index (IntervalIndex): Present sessions of the symbol
+        calendar (TradingCalendar): Expected sessions (observed sessions only before
+                                    calendar.listed_from, see expected_sessions)
+        start (optional): Audit from this date; a hole before the first present
+                          date is reported as a leading gap (default: first present date)
+
+    Returns:
+        list: (first_missing, last_missing, sessions) tuples of ordinals and counts, oldest first
+    """
+    gaps = []
+    if not len(index):
+        return gaps
+
+    cutoff = calendar.listed_from
+
+    def add(lo: int, hi: int) -> None:
+        if cutoff is None or lo < cutoff:
+            # No holiday list this far back: only sessions other indices have count as missing
+            observed = calendar.observed_between(lo, hi if cutoff is None else min(hi, cutoff - 1))
+            if observed:
+                gaps.append((observed[0], observed[-1], len(observed)))
+            if cutoff is None or hi < cutoff:
+                return
+            lo = cutoff
+        first = calendar.next_session(lo - 1).toordinal()
+        last_session = calendar.latest_session(hi)
+        if last_session is None:
+            return
+        last = last_session.toordinal()
+        sessions = calendar.sessions_between(first, last)
+        if first <= last and sessions:
+            gaps.append((first, last, sessions))
+
+    if start is not None and to_ordinal(start) < index.first:
+        add(to_ordinal(start), index.first - 1)
+    for previous_end, next_start in zip(index.ends, index.starts[1:]):
+        add(previous_end + 1, next_start - 1)
+    return gaps
+
+
+def coalesce_gaps(gaps: list, calendar: TradingCalendar, bridge_sessions: int = GAP_BRIDGE_SESSIONS) -> list:
+    """
+    Merge holes separated by at most bridge_sessions present sessions.
+
+    Args:
+        gaps (list): Output of find_gaps()
+        calendar (TradingCalendar): Counts the present sessions between holes
+        bridge_sessions (int): Largest run of present sessions refetched to join two holes
+
+    Returns:
+        list: (start, end, missing_sessions) request windows as ordinals, oldest first
+    """
+    windows = []
+    for first, last, sessions in gaps:
+        if windows:
+            start, end, missing = windows[-1]
+            if expected_sessions(calendar, end + 1, first - 1) <= bridge_sessions:
+                windows[-1] = (start, last, missing + sessions)
+                continue
+        windows.append((first, last, sessions))
+    return windows
+
+
+class KnownEmptyWindows:
+    """
+    Request windows upstream answered with no rows, per symbol, persisted as JSON.
+
+    Windows the sync saw come back empty are counted once per run (`attempts`)
+    until record_empty() gives up on them.
+
+    Args:
+        path (str): JSON state file
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.windows = {}
+        self.attempts = {}
+        self._counted = set()
+
+    def load(self) -> None:
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        self.windows = {symbol: [tuple(w) for w in windows]
+                        for symbol, windows in data.get('empty_windows', {}).items()}
+        self.attempts = {symbol: {(start, end): runs for start, end, runs in windows}
+                         for symbol, windows in data.get('empty_attempts', {}).items()}
+
+    def save(self) -> None:
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'saved_at': datetime.now().isoformat(timespec='seconds'),
+                       'empty_windows': {symbol: sorted(windows) for symbol, windows in self.windows.items()},
+                       'empty_attempts': {symbol: sorted([*window, runs] for window, runs in attempts.items())
+                                          for symbol, attempts in self.attempts.items() if attempts}},
+                      f, indent=2)
+        os.replace(tmp_path, self.path)
+
+    def add(self, symbol: str, start: int, end: int) -> None:
+        self.windows.setdefault(symbol, []).append((start, end))
+
+    def record_empty(self, symbol: str, start: int, end: int, give_up_runs: int = EMPTY_GIVE_UP_RUNS) -> bool:
+        """
+        Count an empty answer for a window (at most once per run) and give up on it
+        once it has come back empty in give_up_runs runs.
+
+        Returns:
+            bool: True if the window is now known empty and should not be requested again
+        """
+        if self.covers(symbol, start, end):
+            return True
+        attempts = self.attempts.setdefault(symbol, {})
+        if (symbol, start, end) not in self._counted:
+            self._counted.add((symbol, start, end))
+            attempts[(start, end)] = attempts.get((start, end), 0) + 1
+        if attempts[(start, end)] < give_up_runs:
+            return False
+        del attempts[(start, end)]
+        self.add(symbol, start, end)
+        return True
+
+    def covers(self, symbol: str, start: int, end: int) -> bool:
+        """True if a remembered empty window contains [start, end]."""
+        return any(lo <= start and end <= hi for lo, hi in self.windows.get(symbol, []))
+
+
+def format_window(start: int, end: int, fmt: str = '%d-%b-%Y') -> tuple:
+    return date.fromordinal(start).strftime(fmt), date.fromordinal(end).strftime(fmt)
@@ -0,0 +1,371 @@
+"""
+Indexed point-in-time queries over a local copy of the index history.
+
+index-price.py --export-history keeps a local copy of `index_ind` in a
+directory of column files that are memory-mapped when queried, so research
+scripts can ask questions like "close and PE of NIFTY MIDCAP 150 on date X"
+without re-querying Supabase or loading everything into a DataFrame:
+
+    from history_query import HistoryIndex
+
+    history = HistoryIndex.open('src/backend/.state/history')
+    history.asof('NIFTY MIDCAP 150', '2024-03-15', ['close', 'pe'])
+    history.range('NIFTY 50', '2020-01-01', '2020-12-31').column('close')
+    history.cross_section('2024-03-15', ['close', 'pe'])
+    history.asof_join(['2020-03-23', '2024-03-15'], column='pe')
+    history.percentile('NIFTY 50', 'pe', '2024-03-15', years=5)
+
+Layout: rows are grouped by symbol and sorted by date within each group.
+
+    meta.json               symbols -> [start, stop) row bounds, columns, generation
+    days-<gen>.npy          int32 day numbers (days since 1970-01-01)
+    <column>-<gen>.npy      float64 values (NaN where missing)
+
+Locating a symbol is a dictionary lookup; a date within it is a binary search
+over its slice of the day index, so a lookup touches a few pages of the files
+rather than the whole history. Range queries return views into the mapped
+files (no copy). A rewrite goes to a new generation of files and switches
+meta.json atomically, so open readers keep a consistent snapshot; it merges
+new, backfilled and revised rows by (symbol, date).
+"""
+
+from __future__ import annotations
+
+import glob
+import json
+import os
+from datetime import date, datetime
+
+from lazy_imports import lazy_import
+
+np = lazy_import('numpy')
+pd = lazy_import('pandas')
+
+FORMAT_VERSION = 1
+
+META_FILE = 'meta.json'
+
+_EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+
+def to_day(value) -> int:
+    """Day number (days since 1970-01-01) of a date, datetime, Timestamp or 'YYYY-MM-DD' string."""
+    if isinstance(value, (int, np.integer)):
+        return int(value)
+    if isinstance(value, datetime):
+        return value.date().toordinal() - _EPOCH_ORDINAL
+    if isinstance(value, date):
+        return value.toordinal() - _EPOCH_ORDINAL
+    if isinstance(value, np.datetime64):
+        return int(value.astype('datetime64[D]').astype(np.int64))
+    return datetime.strptime(str(value)[:10], '%Y-%m-%d').date().toordinal() - _EPOCH_ORDINAL
+
+
+def to_date(day: int) -> date:
+    """Inverse of to_day."""
+    return date.fromordinal(int(day) + _EPOCH_ORDINAL)
+
+
+def _column_path(path: str, name: str, generation: int) -> str:
+    return os.path.join(path, f"{name}-{generation:06d}.npy")
+
+
+class SeriesSlice:
+    """
+    Consecutive rows of one symbol; days and columns are views into the mapped files.
+
+    Args:
+        symbol (str): Index symbol
+        days (np.ndarray): int32 day numbers, ascending
+        columns (dict): column -> float64 values aligned with days
+    """
+
+    def __init__(self, symbol: str, days, columns: dict):
+        self.symbol = symbol
+        self.days = days
+        self.columns = columns
+
+    def __len__(self) -> int:
+        return len(self.days)
+
+    def column(self, name: str):
+        """Values of one column (a view, not a copy)."""
+        return self.columns[name]
+
+    def dates(self):
+        """Dates as datetime64[D] (a copy)."""
+        return self.days.astype('datetime64[D]')
+
+    def to_frame(self) -> pd.DataFrame:
+        """Copy of the rows as [date, symbol, *columns]."""
+        data = {'date': self.dates().astype('datetime64[ns]'), 'symbol': self.symbol}
+        data.update({name: np.array(values) for name, values in self.columns.items()})
+        return pd.DataFrame(data)
+
+
+class HistoryIndex:
+    """
+    Read-only, memory-mapped history with a sorted per-symbol date index.
+
+    Args:
+        path (str): History directory
+        meta (dict): Parsed meta.json
+        days (np.ndarray): Mapped day index
+        values (dict): column -> mapped values
+    """
+
+    def __init__(self, path: str, meta: dict, days, values: dict):
+        self.path = path
+        self.generation = meta['generation']
+        self.bounds = {symbol: (start, stop) for symbol, (start, stop) in meta['symbols'].items()}
+        self.days = days
+        self.values = values
+
+    @staticmethod
+    def exists(path: str) -> bool:
+        return os.path.exists(os.path.join(path, META_FILE))
+
+    @classmethod
+    def open(cls, path: str) -> 'HistoryIndex':
+        """
+        Map a history directory written by write_history().
+
+        Raises:
+            FileNotFoundError: If the directory holds no history
+            ValueError: If it was written in another format version
+        """
+        with open(os.path.join(path, META_FILE), encoding='utf-8') as f:
+            meta = json.load(f)
+        if meta.get('version') != FORMAT_VERSION:
+            raise ValueError(f"{path}: unsupported history format {meta.get('version')}")
+        generation = meta['generation']
+
+        def load(name: str):
+            if not meta['rows']:
+                return np.empty(0, dtype=np.int32 if name == 'days' else np.float64)
+            return np.load(_column_path(path, name, generation), mmap_mode='r')
+
+        return cls(path, meta, load('days'), {col: load(col) for col in meta['columns']})
+
+    def __len__(self) -> int:
+        return len(self.days)
+
+    def __contains__(self, symbol: str) -> bool:
+        return symbol in self.bounds
+
+    @property
+    def symbols(self) -> list:
+        return sorted(self.bounds)
+
+    @property
+    def columns(self) -> list:
+        return list(self.values)
+
+    def first_date(self, symbol: str):
+        start, stop = self.bounds.get(symbol, (0, 0))
+        return to_date(self.days[start]) if stop > start else None
+
+    def last_date(self, symbol: str):
+        start, stop = self.bounds.get(symbol, (0, 0))
+        return to_date(self.days[stop - 1]) if stop > start else None
+
+    def _slice(self, symbol: str, start=None, end=None) -> tuple:
+        """Row bounds [lo, hi) of a symbol's rows with start <= date <= end."""
+        first, last = self.bounds.get(symbol, (0, 0))
+        days = self.days[first:last]
+        lo = first + (int(np.searchsorted(days, to_day(start), 'left')) if start is not None else 0)
+        hi = first + (int(np.searchsorted(days, to_day(end), 'right')) if end is not None else len(days))
+        return lo, max(lo, hi)
+
+    def range(self, symbol: str, start=None, end=None, columns: list = None) -> SeriesSlice:
+        """
+        Rows of a symbol with start <= date <= end (open ends when None), as views.
+
+        Returns:
+            SeriesSlice: Possibly empty (also for unknown symbols)
+        """
+        lo, hi = self._slice(symbol, start, end)
+        names = columns if columns is not None else self.columns
+        return SeriesSlice(symbol, self.days[lo:hi], {name: self.values[name][lo:hi] for name in names})
+
+    def between(self, start, end, symbols: list = None, columns: list = None) -> dict:
+        """Rows of every symbol (or the given ones) between two dates: symbol -> SeriesSlice."""
+        return {symbol: self.range(symbol, start, end, columns)
+                for symbol in (symbols if symbols is not None else self.symbols)}
+
+    def asof(self, symbol: str, when, columns: list = None, exact: bool = False):
+        """
+        The row of a symbol on `when`, or the last one before it.
+
+        Args:
+            symbol (str): Index symbol
+            when: Date (date, datetime, Timestamp or 'YYYY-MM-DD')
+            columns (list, optional): Columns to return (default: all)
+            exact (bool): Only accept a row dated exactly `when`
+
+        Returns:
+            dict or None: {'date': date, column: value, ...}, None if there is no such row
+        """
+        first, last = self.bounds.get(symbol, (0, 0))
+        day = to_day(when)
+        position = first + int(np.searchsorted(self.days[first:last], day, 'right')) - 1
+        if position < first or (exact and self.days[position] != day):
+            return None
+        row = {'date': to_date(self.days[position])}
+        for name in (columns if columns is not None else self.columns):
+            value = float(self.values[name][position])
+            row[name] = None if np.isnan(value) else value
+        return row
+
+    def cross_section(self, when, columns: list = None, symbols: list = None) -> dict:
+        """As-of rows of several symbols on one date: symbol -> asof() row (symbols without one are left out)."""
+        result = {}
+        for symbol in (symbols if symbols is not None else self.symbols):
+            row = self.asof(symbol, when, columns)
+            if row is not None:
+                result[symbol] = row
+        return result
+
+    def asof_join(self, dates: list, symbols: list = None, column: str = 'close') -> pd.DataFrame:
+        """
+        As-of join of one column across symbols: for each date and symbol the last
+        value on or before that date (NaN before a symbol's first row).
+
+        Returns:
+            pd.DataFrame: Indexed by the requested dates, one column per symbol
+        """
+        symbols = symbols if symbols is not None else self.symbols
+        days = np.array([to_day(value) for value in dates], dtype=np.int64)
+        values = self.values[column]
+        out = np.full((len(days), len(symbols)), np.nan)
+        for j, symbol in enumerate(symbols):
+            first, last = self.bounds.get(symbol, (0, 0))
+            positions = first + np.searchsorted(self.days[first:last], days, 'right') - 1
+            found = positions >= first
+            out[found, j] = values[positions[found]]
+        index = pd.DatetimeIndex(days.astype('datetime64[D]'), name='date')
+        return pd.DataFrame(out, index=index, columns=list(symbols))
+
+    def percentile(self, symbol: str, column: str, when, years: float = 5):
+        """
+        Percentile rank of a symbol's as-of value within its trailing window, like
+        the market summary's valuation percentiles: percent of the values of the
+        last `years` years (up to the as-of row) at or below it.
+
+        Returns:
+            float or None: None without an as-of value
+        """
+        row = self.asof(symbol, when, [column])
+        if row is None or row[column] is None:
+            return None
+        latest = to_day(row['date'])
+        window = self.range(symbol, to_date(latest - int(round(365.25 * years))), to_date(latest),
+                            [column]).column(column)
+        window = window[~np.isnan(window)]
+        return float(np.count_nonzero(window <= row[column]) / len(window) * 100)
+
+
+def write_history(path: str, updates, base: HistoryIndex = None, columns: list = None) -> dict:
+    """
+    Write a new generation of the history: the base rows merged with the rows of
+    `updates` by (symbol, date), an update replacing the base row of its day.
+
+    The output arrays are written through memory maps, symbol by symbol, so
+    neither the base nor the result has to fit in memory at once. A symbol whose
+    updates all come after its last base row is copied and appended to; one
+    with updates on or before it (backfills, revisions) has its slice merged.
+
+    Args:
+        path (str): History directory (created if needed)
+        updates (SeriesStore): New and revised rows per symbol
+        base (HistoryIndex, optional): Current history of the directory
+        columns (list, optional): Value columns to keep (default: the base's, else the store's)
+
+    Returns:
+        dict: 'rows' total, 'appended' new rows, 'revised' replaced rows, 'symbols' count
+    """
+    columns = columns or (base.columns if base is not None else updates.columns)
+    symbols = sorted(set(base.symbols if base is not None else []) | set(updates.symbols))
+    generation = base.generation + 1 if base is not None else 1
+
+    plan = []
+    for symbol in symbols:
+        lo, hi = base.bounds.get(symbol, (0, 0)) if base is not None else (0, 0)
+        block = updates.block(symbol) if symbol in updates else None
+        new = np.zeros(0, dtype=bool)
+        if block is not None and block.size:
+            new = ~np.isin(block.days[:block.size], base.days[lo:hi]) if hi > lo else np.ones(block.size, bool)
+        plan.append((symbol, lo, hi, block, new))
+    appended = sum(int(new.sum()) for *_, new in plan)
+    revised = sum(len(new) - int(new.sum()) for *_, new in plan)
+    total = sum(hi - lo for _, lo, hi, _, _ in plan) + appended
+
+    os.makedirs(path, exist_ok=True)
+    if total:
+        out_days = np.lib.format.open_memmap(_column_path(path, 'days', generation), mode='w+',
+                                             dtype=np.int32, shape=(total,))
+        out_values = {col: np.lib.format.open_memmap(_column_path(path, col, generation), mode='w+',
+                                                     dtype=np.float64, shape=(total,))
+                      for col in columns}
+    bounds = {}
+    offset = 0
+    for symbol, lo, hi, block, new in plan:
+        start = offset
+        if hi > lo and len(new) and block.days[0] <= base.days[hi - 1]:
+            # Updates inside the base slice: place both on the merged days, updates last
+            days = np.union1d(base.days[lo:hi], block.days[:block.size])
+            count = len(days)
+            out_days[offset:offset + count] = days
+            base_positions = np.searchsorted(days, base.days[lo:hi])
+            block_positions = np.searchsorted(days, block.days[:block.size])
+            for col in columns:
+                merged = np.full(count, np.nan)
+                if col in base.values:
+                    merged[base_positions] = base.values[col][lo:hi]
+                values = block.column(col)
+                if values is not None:
+                    merged[block_positions] = values
+                out_values[col][offset:offset + count] = merged
+            offset += count
+            bounds[symbol] = [start, offset]
+            continue
+        if hi > lo:
+            out_days[offset:offset + hi - lo] = base.days[lo:hi]
+            for col in columns:
+                out_values[col][offset:offset + hi - lo] = base.values[col][lo:hi] if col in base.values else np.nan
+            offset += hi - lo
+        count = int(new.sum())
+        if count:
+            out_days[offset:offset + count] = block.days[:block.size][new]
+            for col in columns:
+                values = block.column(col)
+                out_values[col][offset:offset + count] = values[new] if values is not None else np.nan
+            offset += count
+        if offset > start:
+            bounds[symbol] = [start, offset]
+    if total:
+        for array in (out_days, *out_values.values()):
+            array.flush()
+        del out_days, out_values
+
+    meta = {
+        'version': FORMAT_VERSION,
+        'generation': generation,
+        'written_at': datetime.now().isoformat(timespec='seconds'),
+        'rows': total,
+        'columns': list(columns),
+        'symbols': bounds,
+    }
+    tmp_path = os.path.join(path, f"{META_FILE}.tmp")
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(meta, f, separators=(',', ':'))
+    os.replace(tmp_path, os.path.join(path, META_FILE))
+
+    # Older generations are unreachable now (readers that mapped them keep their pages)
+    for stale in glob.glob(os.path.join(path, '*-[0-9][0-9][0-9][0-9][0-9][0-9].npy')):
+        if not stale.endswith(f"-{generation:06d}.npy"):
+            try:
+                os.remove(stale)
+            except OSError:
+                pass
+    return {'rows': total, 'appended': appended, 'revised': revised, 'symbols': len(bounds)}
@@ -0,0 +1,376 @@
+"""
+Multi-resolution history rollups for charting.
+
+A long-range chart of an index does not need thousands of daily rows. After
+each sync the fetched daily rows are folded into pre-aggregated rollups that
+clients can pick from by viewport:
+
+    create table index_rollup (
+        symbol      text not null,
+        resolution  text not null,      -- 'week' (Monday-based) or 'month'
+        period      date not null,      -- first calendar day of the period
+        as_of       date not null,      -- last session in the period
+        open        double precision,
+        high        double precision,
+        low         double precision,
+        close       double precision,
+        pe          double precision,   -- last PE reported in the period
+        pb          double precision,   -- last PB reported in the period
+        sessions    integer not null,
+        updated_at  timestamptz not null default now(),
+        primary key (symbol, resolution, period)
+    );
+
+    create table index_rollup_lttb (
+        symbol      text primary key,
+        as_of       date not null,
+        points      integer not null,
+        dates       date[] not null,
+        close       double precision[] not null,
+        updated_at  timestamptz not null default now()
+    );
+
+    alter table index_rollup enable row level security;
+    alter table index_rollup_lttb enable row level security;
+    create policy "public read" on index_rollup for select using (true);
+    create policy "public read" on index_rollup_lttb for select using (true);
+
+Only periods that received rows in this run are recomputed. The sessions of
+such a period that were not fetched in the run (e.g. Monday to Thursday when
+Friday is new, or stored sessions between two backfilled holes) are read back,
+and nothing else: a daily run touches one week and one month per index, and a
+backfill does not reread what it fetched.
+
+The shape-preserving series (Largest-Triangle-Three-Buckets, LTTB_POINTS
+points) is drawn from the weekly closes, which are kept per symbol in a JSON
+state file between runs, and is replaced as a single row per index.
+"""
+
+from __future__ import annotations
+
+import json
+import math
+import os
+from datetime import date, datetime
+
+from lazy_imports import lazy_import
+
+np = lazy_import('numpy')
+pd = lazy_import('pandas')
+
+ROLLUP_TABLE = 'index_rollup'
+LTTB_TABLE = 'index_rollup_lttb'
+
+ROLLUP_COLUMNS = ['symbol', 'resolution', 'period', 'as_of', 'open', 'high', 'low', 'close',
+                  'pe', 'pb', 'sessions']
+
+RESOLUTIONS = ('week', 'month')
+
+# Points of the downsampled long-range series
+LTTB_POINTS = 500
+
+# Unfetched sessions closer than this (calendar days) are read back in one range,
+# rereading the few fetched rows between them instead of issuing another request
+CONTEXT_MERGE_DAYS = 10
+
+STATE_VERSION = 1
+
+_EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+# Positions in a period aggregate
+_FIRST, _OPEN, _HIGH, _LOW, _LAST, _CLOSE, _PE_DAY, _PE, _PB_DAY, _PB, _SESSIONS = range(11)
+
+
+def _is_missing(value) -> bool:
+    return value is None or (isinstance(value, float) and math.isnan(value))
+
+
+def _is_weekday(day: int) -> bool:
+    # Ordinal 1 (0001-01-01) is a Monday
+    return (day - 1) % 7 < 5
+
+
+def _day_ordinals(dates) -> np.ndarray:
+    return pd.DatetimeIndex(dates).values.astype('datetime64[D]').astype(np.int64) + _EPOCH_ORDINAL
+
+
+def period_start(day: int, resolution: str) -> int:
+    """First day (ordinal) of the week or month containing `day`."""
+    if resolution == 'week':
+        return day - (day - 1) % 7
+    d = date.fromordinal(day)
+    return date(d.year, d.month, 1).toordinal()
+
+
+def period_end(day: int, resolution: str) -> int:
+    """Last day (ordinal) of the week or month containing `day`."""
+    if resolution == 'week':
+        return period_start(day, 'week') + 6
+    d = date.fromordinal(day)
+    following = date(d.year + d.month // 12, d.month % 12 + 1, 1)
+    return following.toordinal() - 1
+
+
+def lttb(x, y, threshold: int) -> np.ndarray:
+    """
+    Largest-Triangle-Three-Buckets downsampling.
+
+    Keeps the first and last point and, from each of threshold - 2 equal buckets
+    in between, the point forming the largest triangle with the previously kept
+    point and the average of the next bucket, so peaks and troughs survive.
+
+    Args:
+        x (array-like): Ascending x values (e.g. day ordinals)
+        y (array-like): Values at x
+        threshold (int): Points to keep
+
+    Returns:
+        np.ndarray: Positions of the kept points (all positions when there are
+                    no more than threshold points)
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    every = (n - 2) / (threshold - 2)
+    kept = np.empty(threshold, dtype=np.int64)
+    kept[0] = a = 0
+    for i in range(threshold - 2):
+        start = int(i * every) + 1
+        end = int((i + 1) * every) + 1
+        following = slice(end, min(int((i + 2) * every) + 1, n))
+        avg_x, avg_y = x[following].mean(), y[following].mean()
+        area = np.abs((x[a] - avg_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (avg_y - y[a]))
+        a = start + int(area.argmax())
+        kept[i + 1] = a
+    kept[-1] = n - 1
+    return kept
+
+
+class RollupBuilder:
+    """
+    Incremental weekly/monthly rollups and the downsampled series, per symbol.
+
+    Rows fetched in this run are passed to add(); they mark their periods as
+    affected. The stored rows around them (context_ranges()) are passed to
+    add_context(), which only completes already affected periods.
+
+    Args:
+        path (str): JSON file the weekly close series are loaded from and saved to
+        lttb_points (int): Points of the downsampled series
+    """
+
+    def __init__(self, path: str, lttb_points: int = LTTB_POINTS):
+        self.path = path
+        self.lttb_points = lttb_points
+        self.weeks = {}
+        self.partials = {}
+        self.fetched = {}
+        self.complete = set()
+        self.seen = {}
+
+    def load(self) -> bool:
+        """
+        Load the persisted weekly close series (an unreadable or incompatible
+        file leaves the builder empty, so every symbol is rebuilt).
+
+        Returns:
+            bool: True if state was loaded
+        """
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return False
+        if data.get('version') != STATE_VERSION:
+            return False
+        self.weeks = {symbol: {int(period): (int(as_of), float(close)) for period, as_of, close in weeks}
+                      for symbol, weeks in data.get('symbols', {}).items()}
+        return True
+
+    def save(self) -> None:
+        """Atomically write the state to disk."""
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        data = {
+            'version': STATE_VERSION,
+            'saved_at': datetime.now().isoformat(timespec='seconds'),
+            'symbols': {symbol: [[period, as_of, close] for period, (as_of, close) in sorted(weeks.items())]
+                        for symbol, weeks in self.weeks.items()},
+        }
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, separators=(',', ':'))
+        os.replace(tmp_path, self.path)
+
+    def reset(self, symbols: list = None) -> None:
+        """Drop state for the given symbols (all when None) so they are rebuilt."""
+        if symbols is None:
+            self.weeks = {}
+        for symbol in symbols or []:
+            self.weeks.pop(symbol, None)
+
+    def has_state(self, symbol: str) -> bool:
+        return symbol in self.weeks
+
+    @property
+    def touched(self) -> list:
+        """Symbols with rows added in this run."""
+        return sorted(self.fetched)
+
+    def _fold(self, df, fetched: bool) -> int:
+        if df is None or df.empty:
+            return 0
+        frame = df[df['close'].notna().to_numpy()]
+        days = _day_ordinals(frame['date'])
+        columns = {col: (frame[col].to_numpy(dtype=float) if col in frame else np.full(len(frame), np.nan))
+                   for col in ('open', 'high', 'low', 'close', 'pe', 'pb')}
+        folded = 0
+        for i, symbol in enumerate(frame['symbol'].astype(str).tolist()):
+            day = int(days[i])
+            seen = self.seen.setdefault(symbol, set())
+            if day in seen:
+                continue
+            partials = self.partials.setdefault(symbol, {})
+            keys = [(resolution, period_start(day, resolution)) for resolution in RESOLUTIONS]
+            if not fetched:
+                keys = [key for key in keys if key in partials]
+                if not keys:
+                    continue
+            seen.add(day)
+            if fetched:
+                self.fetched.setdefault(symbol, set()).add(day)
+            values = [columns[col][i] for col in ('open', 'high', 'low', 'close', 'pe', 'pb')]
+            for key in keys:
+                partials[key] = _fold_row(partials.get(key), day, *values)
+            folded += 1
+        return folded
+
+    def add(self, df, complete: bool = False) -> int:
+        """
+        Fold rows fetched in this run (date, symbol, open, high, low, close and
+        optionally pe, pb); their weeks and months are recomputed.
+
+        Args:
+            df (pd.DataFrame): Daily rows
+            complete (bool): The rows are the full stored history of their symbols,
+                             so nothing is read back for them
+
+        Returns:
+            int: Rows folded (rows without a close and repeated days are skipped)
+        """
+        if complete and df is not None and not df.empty:
+            self.complete.update(df['symbol'].astype(str).unique())
+        return self._fold(df, fetched=True)
+
+    def add_context(self, df) -> int:
+        """Fold stored rows that complete periods affected by add(); other rows are ignored."""
+        return self._fold(df, fetched=False)
+
+    def context_ranges(self, latest: date = None, is_session=None) -> dict:
+        """
+        Stored date ranges needed to complete the affected periods.
+
+        These cover every session of an affected week or month that was not
+        fetched in this run: before and after the fetched rows, and between
+        them (e.g. stored sessions separating two backfilled holes). Sessions
+        less than CONTEXT_MERGE_DAYS apart share one range.
+
+        Args:
+            latest (date, optional): Nothing is stored after this day (end of the sync)
+            is_session (callable, optional): Day ordinal -> True if it is a trading
+                                             session (default: weekdays)
+
+        Returns:
+            dict: (since, until) dates -> symbols needing that range
+        """
+        limit = latest.toordinal() if latest is not None else None
+        is_session = is_session or _is_weekday
+        ranges = {}
+        for symbol, fetched in self.fetched.items():
+            if symbol in self.complete:
+                continue
+            # Affected weeks and months, merged into contiguous spans
+            spans = []
+            for day in sorted(fetched):
+                lo = min(period_start(day, r) for r in RESOLUTIONS)
+                hi = max(period_end(day, r) for r in RESOLUTIONS)
+                if spans and lo <= spans[-1][1] + 1:
+                    spans[-1][1] = max(spans[-1][1], hi)
+                else:
+                    spans.append([lo, hi])
+            reads = []
+            for lo, hi in spans:
+                for day in range(lo, (hi if limit is None else min(hi, limit)) + 1):
+                    if day in fetched or not is_session(day):
+                        continue
+                    if reads and day - reads[-1][1] <= CONTEXT_MERGE_DAYS:
+                        reads[-1][1] = day
+                    else:
+                        reads.append([day, day])
+            for since, until in reads:
+                key = (date.fromordinal(since), date.fromordinal(until))
+                ranges.setdefault(key, []).append(symbol)
+        return ranges
+
+    def build(self) -> tuple:
+        """
+        Rollup rows of the affected periods and the downsampled series of the
+        touched symbols. The weekly close series are updated in memory; save()
+        persists them once the rows are written.
+
+        Returns:
+            tuple: (pd.DataFrame with ROLLUP_COLUMNS, list of LTTB_TABLE records)
+        """
+        rows = []
+        for symbol in self.touched:
+            weeks = self.weeks.setdefault(symbol, {})
+            for (resolution, period), agg in sorted(self.partials[symbol].items()):
+                rows.append({
+                    'symbol': symbol, 'resolution': resolution,
+                    'period': date.fromordinal(period).isoformat(),
+                    'as_of': date.fromordinal(agg[_LAST]).isoformat(),
+                    'open': agg[_OPEN], 'high': agg[_HIGH], 'low': agg[_LOW], 'close': agg[_CLOSE],
+                    'pe': agg[_PE], 'pb': agg[_PB], 'sessions': agg[_SESSIONS],
+                })
+                if resolution == 'week':
+                    weeks[period] = (agg[_LAST], agg[_CLOSE])
+        frame = pd.DataFrame(rows, columns=ROLLUP_COLUMNS)
+        return frame, [self.downsample(symbol) for symbol in self.touched]
+
+    def downsample(self, symbol: str) -> dict:
+        """LTTB_TABLE record of a symbol: its weekly closes reduced to lttb_points."""
+        series = sorted(self.weeks.get(symbol, {}).values())
+        days = np.array([day for day, _ in series], dtype=np.int64)
+        closes = np.array([close for _, close in series], dtype=np.float64)
+        kept = lttb(days, closes, self.lttb_points)
+        return {
+            'symbol': symbol,
+            'as_of': date.fromordinal(int(days[-1])).isoformat() if len(days) else None,
+            'points': len(kept),
+            'dates': [date.fromordinal(int(day)).isoformat() for day in days[kept]],
+            'close': [float(close) for close in closes[kept]],
+        }
+
+
+def _fold_row(agg: list, day: int, open_, high, low, close, pe, pb) -> list:
+    """Fold one session into a period aggregate (missing OHLC fall back to the close)."""
+    open_ = close if _is_missing(open_) else open_
+    high = max(open_, close) if _is_missing(high) else high
+    low = min(open_, close) if _is_missing(low) else low
+    if agg is None:
+        agg = [day, open_, high, low, day, close, None, None, None, None, 0]
+    else:
+        if day < agg[_FIRST]:
+            agg[_FIRST], agg[_OPEN] = day, open_
+        agg[_HIGH] = max(agg[_HIGH], high)
+        agg[_LOW] = min(agg[_LOW], low)
+        if day > agg[_LAST]:
+            agg[_LAST], agg[_CLOSE] = day, close
+    if not _is_missing(pe) and (agg[_PE_DAY] is None or day > agg[_PE_DAY]):
+        agg[_PE_DAY], agg[_PE] = day, pe
+    if not _is_missing(pb) and (agg[_PB_DAY] is None or day > agg[_PB_DAY]):
+        agg[_PB_DAY], agg[_PB] = day, pb
+    agg[_SESSIONS] += 1
+    return agg
@@ -0,0 +1,303 @@
+"""
+Process-wide pooled HTTP clients.
+
+Every stage of a sync talks to the same few hosts (niftyindices.com for NSE
+data, the Supabase project for reads and writes). Opening a fresh connection
+per call pays a TCP + TLS handshake each time, so clients are created once
+per process, keyed by name, and reused everywhere:
+
+    session = HTTP_POOL.session('nse', maxsize=3)   # same object on every call
+
+Sessions are requests.Session objects whose adapters keep sized keep-alive
+pools per host. With `http2=True` (and httpx + h2 installed) a session is
+instead backed by an httpx client speaking HTTP/2, which multiplexes
+concurrent requests over one connection; it offers the subset of the
+requests API the fetcher uses and raises requests' exception types.
+
+Both kinds count requests and newly opened connections per client and host,
+so the run output shows how much reuse the pools achieved.
+"""
+
+import importlib.util
+import threading
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# Probe without importing (httpx pulls in a fair amount)
+HTTP2_AVAILABLE = all(importlib.util.find_spec(module) for module in ('httpx', 'h2'))
+
+# Host pools kept per session (one per distinct host the session talks to)
+POOL_HOSTS = 4
+
+
+class PoolStats:
+    """Thread-safe request and connection counters per (client, host)."""
+
+    def __init__(self):
+        self._counts = {}
+        self._lock = threading.Lock()
+
+    def _bump(self, client: str, host: str, field: str) -> None:
+        with self._lock:
+            counts = self._counts.setdefault((client, host), {'requests': 0, 'opened': 0})
+            counts[field] += 1
+
+    def request(self, client: str, host: str) -> None:
+        self._bump(client, host, 'requests')
+
+    def opened(self, client: str, host: str) -> None:
+        self._bump(client, host, 'opened')
+
+    def snapshot(self, by_host: bool = False) -> dict:
+        """
+        Counters per client (or per (client, host) when by_host).
+
+        Returns:
+            dict: key -> {'requests', 'opened', 'reused'} where reused is the number of
+                  requests served on an already open connection
+        """
+        result = {}
+        with self._lock:
+            for (client, host), counts in self._counts.items():
+                key = (client, host) if by_host else client
+                entry = result.setdefault(key, {'requests': 0, 'opened': 0})
+                entry['requests'] += counts['requests']
+                entry['opened'] += counts['opened']
+        for entry in result.values():
+            entry['reused'] = max(entry['requests'] - entry['opened'], 0)
+        return result
+
+
+def _counting_pool_class(base: type, stats: PoolStats, client: str) -> type:
+    """Subclass of a urllib3 connection pool class that counts new connections."""
+
+    class CountingPool(base):
+        def _new_conn(self):
+            stats.opened(client, self.host)
+            return super()._new_conn()
+
+    CountingPool.__name__ = f"Counting{base.__name__}"
+    return CountingPool
+
+
+class CountingAdapter(HTTPAdapter):
+    """
+    HTTPAdapter with sized keep-alive pools that reports requests and new connections.
+
+    Args:
+        stats (PoolStats): Receives the counts
+        client (str): Client name the counts are filed under
+        maxsize (int): Connections kept alive per host
+    """
+
+    def __init__(self, stats: PoolStats, client: str, maxsize: int):
+        self.stats = stats
+        self.client = client
+        super().__init__(pool_connections=POOL_HOSTS, pool_maxsize=max(maxsize, 1))
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        manager = self.poolmanager
+        manager.pool_classes_by_scheme = {
+            scheme: _counting_pool_class(cls, self.stats, self.client)
+            for scheme, cls in manager.pool_classes_by_scheme.items()
+        }
+
+    def send(self, request, *args, **kwargs):
+        self.stats.request(self.client, urlparse(request.url).hostname or '')
+        return super().send(request, *args, **kwargs)
+
+
+class _HttpxResponse:
+    """requests.Response-like view of an httpx response."""
+
+    def __init__(self, response):
+        self._response = response
+        self.status_code = response.status_code
+        self.reason = response.reason_phrase
+        self.headers = response.headers
+        self.http_version = response.http_version
+
+    @property
+    def ok(self) -> bool:
+        return self.status_code < 400
+
+    @property
+    def text(self) -> str:
+        return self._response.text
+
+    @property
+    def content(self) -> bytes:
+        return self._response.content
+
+    def json(self):
+        return self._response.json()
+
+    def raise_for_status(self) -> None:
+        if not self.ok:
+            raise requests.HTTPError(f"{self.status_code} {self.reason}", response=self)
+
+
+class HttpxSession:
+    """
+    The part of the requests.Session API used by the fetcher, over an HTTP/2 httpx client.
+
+    A header passed as None drops the session's default for that request, as in requests.
+
+    Args:
+        stats (PoolStats): Receives the counts
+        client (str): Client name the counts are filed under
+        maxsize (int): Connections kept alive per host
+    """
+
+    def __init__(self, stats: PoolStats, client: str, maxsize: int):
+        import httpx
+
+        self._httpx = httpx
+        self.stats = stats
+        self.client = client
+        limits = httpx.Limits(max_connections=max(maxsize, 1), max_keepalive_connections=max(maxsize, 1))
+        self._client = httpx.Client(http2=True, limits=limits, follow_redirects=True)
+        self.headers = self._client.headers
+
+    def _trace(self, host: str):
+        def trace(event: str, info: dict) -> None:
+            if event == 'connection.connect_tcp.complete':
+                self.stats.opened(self.client, host)
+        return trace
+
+    def request(self, method: str, url: str, params=None, data=None, json=None,
+                headers: dict = None, timeout: float = None) -> _HttpxResponse:
+        host = urlparse(url).hostname or ''
+        request = self._client.build_request(
+            method, url, params=params, content=data, json=json,
+            headers={k: v for k, v in (headers or {}).items() if v is not None},
+            timeout=timeout, extensions={'trace': self._trace(host)},
+        )
+        for name, value in (headers or {}).items():
+            if value is None and name in request.headers:
+                del request.headers[name]
+        self.stats.request(self.client, host)
+        try:
+            return _HttpxResponse(self._client.send(request))
+        except self._httpx.TimeoutException as exc:
+            raise requests.Timeout(str(exc)) from exc
+        except self._httpx.TransportError as exc:
+            raise requests.ConnectionError(str(exc)) from exc
+
+    def get(self, url: str, **kwargs) -> _HttpxResponse:
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> _HttpxResponse:
+        return self.request('POST', url, **kwargs)
+
+    def close(self) -> None:
+        self._client.close()
+
+
+class SessionBoundRequests:
+    """
+    Stand-in for the `requests` module whose request helpers (get, post, ...)
+    go through a pooled session; everything else resolves to `requests` itself.
+
+    Used for third-party modules that call requests.get()/post() directly.
+    """
+
+    def __init__(self, session):
+        self._session = session
+
+    def request(self, method: str, url: str, **kwargs):
+        return self._session.request(method, url, **kwargs)
+
+    def get(self, url: str, params=None, **kwargs):
+        return self._session.get(url, params=params, **kwargs)
+
+    def post(self, url: str, data=None, json=None, **kwargs):
+        return self._session.post(url, data=data, json=json, **kwargs)
+
+    def __getattr__(self, name: str):
+        return getattr(requests, name)
+
+
+class HttpPool:
+    """Named, lazily created pooled sessions sharing one set of counters."""
+
+    def __init__(self):
+        self.stats = PoolStats()
+        self.protocols = {}
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+    def session(self, name: str, maxsize: int = 10, headers: dict = None, http2: bool = False):
+        """
+        Return the session registered under `name`, creating it on first use.
+
+        Args:
+            name (str): Client name (also the label of its counters)
+            maxsize (int): Connections kept alive per host
+            headers (dict, optional): Default headers of a newly created session
+            http2 (bool): Back a new session with HTTP/2 (ignored unless HTTP2_AVAILABLE)
+
+        Returns:
+            requests.Session or HttpxSession
+        """
+        with self._lock:
+            session = self._sessions.get(name)
+            if session is None:
+                if http2 and HTTP2_AVAILABLE:
+                    session = HttpxSession(self.stats, name, maxsize)
+                    self.protocols[name] = 'HTTP/2'
+                else:
+                    self.protocols[name] = 'HTTP/1.1'
+                    session = requests.Session()
+                    adapter = CountingAdapter(self.stats, name, maxsize)
+                    session.mount('https://', adapter)
+                    session.mount('http://', adapter)
+                session.headers.update(headers or {})
+                self._sessions[name] = session
+            return session
+
+    def instrument_httpx(self, name: str, client, protocol: str = 'httpx') -> bool:
+        """
+        Count requests and new connections of an httpx client created elsewhere
+        (e.g. inside the Supabase SDK).
+
+        Returns:
+            bool: False if the client does not support event hooks
+        """
+        hooks = getattr(client, 'event_hooks', None)
+        if hooks is None:
+            return False
+
+        def on_request(request) -> None:
+            host = request.url.host
+
+            def trace(event: str, info: dict) -> None:
+                if event == 'connection.connect_tcp.complete':
+                    self.stats.opened(name, host)
+
+            request.extensions['trace'] = trace
+            self.stats.request(name, host)
+
+        hooks.setdefault('request', []).append(on_request)
+        client.event_hooks = hooks
+        self.protocols[name] = protocol
+        return True
+
+    def close(self) -> None:
+        with self._lock:
+            for session in self._sessions.values():
+                session.close()
+            self._sessions.clear()
+
+    def print_stats(self) -> None:
+        snapshot = self.stats.snapshot()
+        if not snapshot:
+            return
+        print(f"\n🔌 CONNECTION POOLS:")
+        for name, counts in sorted(snapshot.items()):
+            share = counts['reused'] / counts['requests'] if counts['requests'] else 0.0
+            print(f"  {name:<14} {counts['requests']:>6} requests, {counts['opened']:>4} connections opened, "
+                  f"{counts['reused']:>6} reused ({share:.0%}, {self.protocols.get(name, 'HTTP/1.1')})")
@@ -13,17 +13,48 @@ Usage:
     
     # Fetch specific indices only
     python index-price.py --indices "NIFTY 50,NIFTY NEXT 50,NIFTY MIDCAP 150,NIFTY SMLCAP 250,NIFTY LARGEMID250"
+    
+    # Fetch indices in parallel (rate limited across workers)
+    python index-price.py --workers 4 --rate 3
 """
 
+from __future__ import annotations
+
 import argparse
 import os
+import queue
+import sys
+import threading
+import time
 import requests
-import pandas as pd
-import numpy as np
-from datetime import datetime, timedelta
-from nsepython import index_history, index_pe_pb_div
-from supabase import create_client, Client
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import date, datetime, timedelta
+from typing import TYPE_CHECKING
 from dotenv import load_dotenv
+from lazy_imports import lazy_import
+from rate_limit import UpstreamGate
+from response_cache import ResponseCache
+from http_pool import HTTP2_AVAILABLE, HttpPool, SessionBoundRequests
+from record_codec import serialize_records, encode_json
+from normalize import normalize_price, normalize_valuation
+from series_store import SeriesStore
+from history_query import HistoryIndex, write_history
+from sync_journal import SyncJournal, write_set_id
+from batch_uploader import BatchUploader
+from market_summary import SUMMARY_TABLE, build_summary_frame
+from history_rollups import LTTB_POINTS, LTTB_TABLE, ROLLUP_TABLE, RollupBuilder
+from rolling_stats import RollingStatsEngine
+from universe_scheduler import UniverseScheduler
+from run_metrics import Profiler, RunMetrics
+from retry_policy import RETRY_POLICY, TRANSIENT_KINDS, HostBreakers, RetryScheduler, backoff_delay, classify_error
+from trading_calendar import HOLIDAYS_PATH, TradingCalendar, to_ordinal
+from gap_audit import (EMPTY_GIVE_UP_RUNS, GAP_BRIDGE_SESSIONS, IntervalIndex, KnownEmptyWindows,
+                       coalesce_gaps, find_gaps, format_window)
+
+# Heavy libraries load on first use, so a run with nothing to do exits quickly
+pd = lazy_import('pandas')
+if TYPE_CHECKING:
+    from supabase import Client
 
 # Load environment variables from .env.local
 env_path = os.path.join(os.path.dirname(__file__), '../../.env.local')
@@ -43,237 +74,1674 @@ DEFAULT_INDICES = [
     "NIFTY LARGEMID250"
 ]
 
+# Columns that make up a row's content (everything except the (date, symbol) key)
+VALUE_COLUMNS = ['open', 'high', 'low', 'close', 'pe', 'pb', 'div_yield']
+
+# Precision used when fingerprinting rows, absorbs float noise from the JSON round-trip
+FINGERPRINT_DECIMALS = 4
+
+# Rows per page for PostgREST selects (must not exceed the project's max-rows setting)
+PAGE_SIZE = 1000
+
+# Optional aggregated watermark function (see get_symbol_watermarks)
+WATERMARK_RPC = 'index_watermarks'
+
+# Process-wide keep-alive HTTP clients (see http_pool.py), sized from the concurrency settings
+HTTP_POOL = HttpPool()
+NSE_POOL_SIZE = 3
+SUPABASE_POOL_SIZE = 4
+USE_HTTP2 = False
+
+# Shared Supabase client (created on first use)
+_SUPABASE_CLIENT = None
+_SUPABASE_CLIENT_LOCK = threading.Lock()
+_NSEPYTHON_ROUTED = False
+_NSEPYTHON_LOCK = threading.Lock()
+
+# Local state written by the sync (rejected rows, ...), kept out of the cache directory
+STATE_DIR = os.getenv("INDEX_STATE_DIR") or os.path.join(os.path.dirname(os.path.abspath(__file__)), '.state')
+
+# Upload pipeline settings (reconfigured from the CLI in main)
+UPLOAD_IN_FLIGHT = 3
+UPLOAD_BATCH_SIZE = 500
+REJECTS_PATH = os.path.join(STATE_DIR, 'upload-rejects.jsonl')
+
+# Write sets allowed to wait for the background uploader in --stream mode
+STREAM_QUEUE_SIZE = 2
+
+# Buffered rows materialized, diffed and uploaded together when the sink closes
+SINK_BATCH_ROWS = 100_000
+
+# Persisted rolling statistics behind the market summary
+STATS_STATE_PATH = os.path.join(STATE_DIR, 'rolling-stats.json')
+STATS_WINDOW_YEARS = 5
+
+# Weekly close series behind the downsampled chart history
+ROLLUP_STATE_PATH = os.path.join(STATE_DIR, 'history-rollups.json')
+
+# Memory-mapped local copy of the history for history_query (--export-history)
+HISTORY_DIR = os.path.join(STATE_DIR, 'history')
+
+# Checkpoint journal of fetched windows and uploaded write sets (set in main)
+JOURNAL_DIR = os.path.join(STATE_DIR, 'journal')
+JOURNAL = None
+
+# Indices a universe run did not finish, picked up first by the next run
+UNIVERSE_CURSOR_PATH = os.path.join(STATE_DIR, 'universe-cursor.json')
+
+# Trading sessions observed in synced data, used to skip fetches that cannot return rows
+CALENDAR_STATE_PATH = os.path.join(STATE_DIR, 'trading-calendar.json')
+_HOLIDAY_WARNINGS = set()
+
+# Expected sessions an incremental fetch may cover and still legitimately come back
+# empty (today's data not published yet, or a holiday missing from the calendar)
+EMPTY_GRACE_SESSIONS = 1
+
+# Gap audit state: windows upstream answered with no rows are not requested again
+GAP_STATE_PATH = os.path.join(STATE_DIR, 'gap-audit.json')
+GAP_AUDIT_PASSES = 2
+
+# Run instrumentation: stage timers, counters and latency histograms for this process
+METRICS = RunMetrics()
+METRICS_PATH = os.path.join(STATE_DIR, 'run-metrics.json')
+PROFILER = Profiler()
+
+# Host serving nsepython's index_history / index_pe_pb_div endpoints
+NSE_HOST = 'niftyindices.com'
+
+# Throttling shared by all fetch workers (reconfigured from the CLI in main)
+UPSTREAM_GATE = UpstreamGate(rate=2.0, burst=2, host_cap=2)
+
+# Local cache of normalized upstream frames (configured from the CLI in main, None disables)
+DEFAULT_CACHE_DIR = os.getenv("INDEX_CACHE_DIR") or os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache', 'nse')
+RESPONSE_CACHE = None
+
+# Large date ranges are split into calendar-aligned windows fetched independently
+FETCH_CHUNK = 'year'
+WINDOW_WORKERS = 2
+WINDOW_RETRIES = 2
+WINDOW_RETRY_DELAY = 2.0
+CHUNK_MONTHS = {'year': 12, 'quarter': 3, 'month': 1}
+
+# Per-host circuit breaker in front of NSE: consecutive failures that open it and its cooldown
+CIRCUIT_BREAKERS = HostBreakers(threshold=5, cooldown=60.0)
+
+# Seconds the end-of-run retry pass may spend on failed windows before deferring them
+RETRY_BUDGET = 180.0
+
+
+class UpstreamFetchError(Exception):
+    """
+    Raised when an nsepython call fails (as opposed to returning no rows).
+
+    Args:
+        message (str): Description of the failed call
+        kind (str): Error kind from retry_policy.classify_error()
+        retry_after (float, optional): Seconds before the host accepts requests again
+    """
+
+    def __init__(self, message: str, kind: str = 'other', retry_after: float = None):
+        super().__init__(message)
+        self.kind = kind
+        self.retry_after = retry_after
+
+
+def _get_nse_session() -> requests.Session:
+    """Return the pooled keep-alive session for NSE / niftyindices.com requests."""
+    return HTTP_POOL.session('nse', maxsize=NSE_POOL_SIZE)
+
+
+def _nsepython():
+    """
+    Import nsepython on first use and route its niftyindices.com calls through
+    the pooled NSE session.
+    
+    Recent nsepython versions keep one module-level session for niftyindices.com,
+    which is pre-set to ours. Older versions call requests.post() directly, so
+    their module-level `requests` is bound to the pooled session instead.
+    """
+    global _NSEPYTHON_ROUTED
+    import nsepython
+    if not _NSEPYTHON_ROUTED:
+        with _NSEPYTHON_LOCK:
+            if not _NSEPYTHON_ROUTED:
+                module = sys.modules.get('nsepython.rahu', nsepython)
+                session = _get_nse_session()
+                if hasattr(module, '_niftyindices_session'):
+                    if module._niftyindices_session is None:
+                        module._niftyindices_session = session
+                elif getattr(module, 'requests', None) is requests:
+                    module.requests = SessionBoundRequests(session)
+                _NSEPYTHON_ROUTED = True
+    return nsepython
+
+
+def index_history(index_name: str, start_date: str, end_date: str):
+    """nsepython.index_history, imported on first use."""
+    return _nsepython().index_history(index_name, start_date, end_date)
+
+
+def index_pe_pb_div(index_name: str, start_date: str, end_date: str):
+    """nsepython.index_pe_pb_div, imported on first use."""
+    return _nsepython().index_pe_pb_div(index_name, start_date, end_date)
+
+
+def get_supabase_client() -> Client:
+    """
+    Return the process-wide authenticated Supabase client.
+    
+    The client is created once and shared by every stage, so its HTTP
+    connections are kept alive across calls instead of being re-established.
+    
+    Returns:
+        Client: Configured Supabase client with service role authentication
+    """
+    global _SUPABASE_CLIENT
+    if _SUPABASE_CLIENT is None:
+        with _SUPABASE_CLIENT_LOCK:
+            if _SUPABASE_CLIENT is None:
+                from supabase import create_client
+                client = create_client(SUPABASE_URL, SUPABASE_KEY)
+                # Count the SDK's connection reuse alongside our own sessions
+                HTTP_POOL.instrument_httpx('supabase_sdk', getattr(getattr(client, 'postgrest', None), 'session', None))
+                _SUPABASE_CLIENT = client
+    return _SUPABASE_CLIENT
+
+
+def report_connection_pools() -> None:
+    """Print how many requests reused a pooled connection and record it in the run metrics."""
+    for client, counts in HTTP_POOL.stats.snapshot().items():
+        METRICS.inc('http_connections_total', counts['opened'], client=client, state='opened')
+        METRICS.inc('http_connections_total', counts['reused'], client=client, state='reused')
+    HTTP_POOL.print_stats()
+
+
+def _select_all_pages(build_query, page_size: int = PAGE_SIZE) -> list:
+    """
+    Run a PostgREST select page by page until the result set is exhausted.
+    
+    PostgREST silently caps a single response at its max-rows setting, so large
+    selects must be paged explicitly with range() to avoid truncated results.
+    
+    Args:
+        build_query (callable): Returns a fresh filtered/ordered query builder
+        page_size (int): Rows requested per page
+        
+    Returns:
+        list: All rows as dicts
+    """
+    rows = []
+    offset = 0
+    while True:
+        with METRICS.time('http_request_seconds', service='supabase', call='select'):
+            response = build_query().range(offset, offset + page_size - 1).execute()
+        page = response.data or []
+        METRICS.inc('http_requests_total', service='supabase', call='select')
+        METRICS.inc('rows_total', len(page), kind='loaded')
+        rows.extend(page)
+        if len(page) < page_size:
+            return rows
+        offset += page_size
+
+
+def get_existing_data_from_supabase(symbols: list = None, since=None, until=None) -> pd.DataFrame:
+    """
+    Load existing index data from Supabase table.
+    
+    Retrieves records from the 'index_ind' table and converts them to a pandas
+    DataFrame with proper date parsing. Results are paged so the PostgREST row cap
+    cannot truncate them. Filters keep the transfer limited to the rows actually
+    needed, e.g. the overlap with freshly fetched data when diffing.
+    
+    Args:
+        symbols (list, optional): Restrict to these index symbols
+        since (date/str, optional): Restrict to rows on or after this date
+        until (date/str, optional): Restrict to rows on or before this date
+    
+    Returns:
+        pd.DataFrame: Existing data with columns [date, symbol, open, high, low, close, pe, pb, div_yield]
+                     Returns empty DataFrame if no data exists or on error
+    """
+    empty = pd.DataFrame(columns=['date', 'symbol'] + VALUE_COLUMNS)
+    try:
+        supabase = get_supabase_client()
+
+        def build_query():
+            query = supabase.table(TABLE_NAME).select("*")
+            if symbols:
+                query = query.in_('symbol', list(symbols))
+            if since is not None:
+                query = query.gte('date', pd.Timestamp(since).strftime('%Y-%m-%d'))
+            if until is not None:
+                query = query.lte('date', pd.Timestamp(until).strftime('%Y-%m-%d'))
+            return query.order('symbol').order('date')
+
+        with METRICS.time('stage_seconds', stage='load_existing'):
+            rows = _select_all_pages(build_query)
+        
+        if rows:
+            df = pd.DataFrame(rows)
+            df['date'] = pd.to_datetime(df['date'])
+            print(f"Loaded {len(df)} existing records from Supabase")
+            return df
+        else:
+            print("No existing data found in Supabase table")
+            return empty
+    except Exception as e:
+        print(f"Error loading data from Supabase: {e}")
+        return empty
+
+
+def get_stored_dates(symbol: str) -> list:
+    """
+    Load every stored date of one symbol (date column only, paged).
+    
+    Args:
+        symbol (str): Index symbol
+        
+    Returns:
+        list: ISO date strings in ascending order
+    """
+    supabase = get_supabase_client()
+
+    def build_query():
+        return supabase.table(TABLE_NAME).select('date').eq('symbol', symbol).order('date')
+
+    with METRICS.time('stage_seconds', stage='load_dates'):
+        return [row['date'] for row in _select_all_pages(build_query)]
+
+
+def get_symbol_watermarks(symbols: list, include_first_date: bool = False) -> dict:
+    """
+    Fetch per-symbol sync watermarks without downloading table rows.
+    
+    Planning only needs the last stored date per index, so this issues a constant
+    number of tiny requests per symbol instead of scanning the whole table. The
+    aggregated RPC below is used when it is installed; otherwise each symbol is
+    probed with a single-row ordered select that also returns the exact row count.
+    
+        create or replace function index_watermarks(symbols text[])
+        returns table(symbol text, first_date date, last_date date, row_count bigint)
+        language sql stable as $$
+            select symbol, min(date), max(date), count(*)
+            from index_ind where symbol = any(symbols) group by symbol
+        $$;
+    
+    Args:
+        symbols (list): Index symbols to plan for
+        include_first_date (bool): Also probe the earliest stored date when the
+                                   RPC is unavailable (one extra request per symbol)
+    
+    Returns:
+        dict: symbol -> {'last_date': date, 'first_date': date or None, 'row_count': int}
+              Symbols with no stored rows are omitted. Returns {} on error.
+    """
+    watermarks = {}
+    try:
+        supabase = get_supabase_client()
+    except Exception as e:
+        print(f"Error connecting to Supabase: {e}")
+        return watermarks
+
+    try:
+        METRICS.inc('http_requests_total', service='supabase', call='watermark_rpc')
+        response = supabase.rpc(WATERMARK_RPC, {'symbols': list(symbols)}).execute()
+        for row in response.data or []:
+            watermarks[row['symbol']] = {
+                'last_date': pd.Timestamp(row['last_date']).date(),
+                'first_date': pd.Timestamp(row['first_date']).date() if row.get('first_date') else None,
+                'row_count': int(row['row_count']),
+            }
+        print(f"Loaded watermarks for {len(watermarks)} indices via {WATERMARK_RPC}()")
+        return watermarks
+    except Exception:
+        # RPC not installed, fall back to per-symbol probes
+        pass
+
+    for symbol in symbols:
+        try:
+            METRICS.inc('http_requests_total', service='supabase', call='watermark_probe')
+            response = (supabase.table(TABLE_NAME)
+                        .select('date', count='exact')
+                        .eq('symbol', symbol)
+                        .order('date', desc=True)
+                        .limit(1)
+                        .execute())
+            if not response.data:
+                continue
+            first_date = None
+            if include_first_date:
+                METRICS.inc('http_requests_total', service='supabase', call='watermark_probe')
+                first = (supabase.table(TABLE_NAME)
+                         .select('date')
+                         .eq('symbol', symbol)
+                         .order('date')
+                         .limit(1)
+                         .execute())
+                first_date = pd.Timestamp(first.data[0]['date']).date() if first.data else None
+            watermarks[symbol] = {
+                'last_date': pd.Timestamp(response.data[0]['date']).date(),
+                'first_date': first_date,
+                'row_count': int(response.count or 0),
+            }
+        except Exception as e:
+            print(f"Error loading watermark for {symbol}: {e}")
+
+    print(f"Loaded watermarks for {len(watermarks)} indices "
+          f"({sum(w['row_count'] for w in watermarks.values())} stored rows)")
+    return watermarks
+
+
+def get_overlapping_rows(df_fetched: pd.DataFrame) -> pd.DataFrame:
+    """
+    Load the stored rows that overlap freshly fetched data, for diffing.
+    
+    For each fetched symbol only rows on or after its earliest fetched date are
+    loaded, so a normal incremental run transfers little or nothing.
+    
+    Args:
+        df_fetched (pd.DataFrame): Rows fetched during this run
+        
+    Returns:
+        pd.DataFrame: Stored rows in the fetched windows (may be empty)
+    """
+    frames = []
+    for symbol, first_date in df_fetched.groupby('symbol', observed=True)['date'].min().items():
+        df = get_existing_data_from_supabase([symbol], since=first_date)
+        if not df.empty:
+            frames.append(df)
+    if not frames:
+        return pd.DataFrame(columns=['date', 'symbol'] + VALUE_COLUMNS)
+    return pd.concat(frames, ignore_index=True)
+
+
+def _get_rest_session() -> requests.Session:
+    """
+    Return the process-wide pooled HTTP session used for raw PostgREST calls.
+    
+    Returns:
+        requests.Session: Keep-alive session carrying the service role auth headers
+                          (an HTTP/2 HttpxSession with --http2)
+    """
+    return HTTP_POOL.session('supabase', maxsize=SUPABASE_POOL_SIZE, http2=USE_HTTP2, headers={
+        'apikey': SUPABASE_KEY,
+        'Authorization': f'Bearer {SUPABASE_KEY}',
+        'Content-Type': 'application/json',
+        'Prefer': 'resolution=merge-duplicates,return=minimal',
+    })
+
+
+def postgrest_upsert(body: bytes) -> None:
+    """
+    Upsert pre-encoded JSON rows into TABLE_NAME through the PostgREST endpoint.
+    
+    Sending bytes directly lets the payload be produced by the fast encoder in
+    record_codec instead of being re-serialized by the Supabase client.
+    
+    Args:
+        body (bytes): JSON array of row objects
+        
+    Raises:
+        requests.HTTPError: If PostgREST rejects the request
+    """
+    METRICS.inc('http_requests_total', service='supabase', call='upsert')
+    with METRICS.time('http_request_seconds', service='supabase', call='upsert'):
+        response = _get_rest_session().post(
+            f"{SUPABASE_URL.rstrip('/')}/rest/v1/{TABLE_NAME}",
+            params={'on_conflict': 'date,symbol'},
+            data=body,
+            timeout=60,
+        )
+    if not response.ok:
+        METRICS.inc('http_errors_total', service='supabase', call='upsert')
+        raise requests.HTTPError(f"{response.status_code} {response.reason}: {response.text[:300]}",
+                                 response=response)
+
+
+def probe_watermarks(symbols: list) -> dict:
+    """
+    Fetch the last stored date per symbol over raw PostgREST HTTP.
+    
+    Unlike get_symbol_watermarks() this needs neither pandas nor the Supabase
+    client, so it can run before any heavy library is imported. It uses the
+    index_watermarks() RPC when installed, else one single-row select per symbol.
+    
+    Args:
+        symbols (list): Index symbols to probe
+        
+    Returns:
+        dict: symbol -> last stored date (symbols without rows are omitted)
+        
+    Raises:
+        requests.RequestException: If PostgREST cannot be reached or rejects a probe
+    """
+    session = _get_rest_session()
+    base_url = f"{SUPABASE_URL.rstrip('/')}/rest/v1"
+    # Reads must not carry the upsert preferences set on the shared session
+    headers = {'Prefer': None}
+
+    METRICS.inc('http_requests_total', service='supabase', call='watermark_rpc')
+    response = session.post(f"{base_url}/rpc/{WATERMARK_RPC}", json={'symbols': list(symbols)},
+                            headers=headers, timeout=15)
+    if response.ok:
+        return {row['symbol']: date.fromisoformat(str(row['last_date'])[:10])
+                for row in response.json() if row.get('last_date')}
+
+    watermarks = {}
+    for symbol in symbols:
+        METRICS.inc('http_requests_total', service='supabase', call='watermark_probe')
+        response = session.get(f"{base_url}/{TABLE_NAME}",
+                               params={'select': 'date', 'symbol': f'eq.{symbol}',
+                                       'order': 'date.desc', 'limit': 1},
+                               headers=headers, timeout=15)
+        response.raise_for_status()
+        rows = response.json()
+        if rows:
+            watermarks[symbol] = date.fromisoformat(str(rows[0]['date'])[:10])
+    return watermarks
+
+
+def load_trading_calendar() -> TradingCalendar:
+    """
+    Load the trading calendar persisted by earlier runs.
+    
+    Warns when the holiday list does not cover the current year: its holidays are
+    then expected sessions until upstream confirms them, one fetch each.
+    
+    Returns:
+        TradingCalendar: Calendar over CALENDAR_STATE_PATH (weekday/holiday rules only
+                         when no state exists yet)
+    """
+    calendar = TradingCalendar(CALENDAR_STATE_PATH)
+    calendar.load()
+    year = date.today().year
+    if not calendar.covers(year) and year not in _HOLIDAY_WARNINGS:
+        _HOLIDAY_WARNINGS.add(year)
+        print(f"⚠️  NSE HOLIDAY LIST DOES NOT COVER {year} ({HOLIDAYS_PATH}): holidays will be fetched "
+              f"as expected sessions. Add {year} to the file or list the dates in $NSE_HOLIDAYS.")
+    return calendar
+
+
+def nothing_to_do(indices: list, end_date: str) -> bool:
+    """
+    Fast-path check run before any heavy import: is every index already synced?
+    
+    The redundant second cron run of the day usually finds everything up to
+    date; this answers that with one small request instead of loading pandas,
+    nsepython and the Supabase client. Any doubt (probe error, carried-over
+    indices from the universe cursor) means there may be work, so it returns False.
+    
+    Args:
+        indices (list): Index symbols the run would sync
+        end_date (str): End date in DD-MMM-YYYY format
+        
+    Returns:
+        bool: True if every index already has data for the latest trading session
+              on or before end_date
+    """
+    if not indices or not SUPABASE_URL or not SUPABASE_KEY:
+        return False
+    if UniverseScheduler(UNIVERSE_CURSOR_PATH).carried_over:
+        return False
+
+    target = load_trading_calendar().latest_session(end_date)
+    with METRICS.time('stage_seconds', stage='fast_path_probe'):
+        try:
+            watermarks = probe_watermarks(indices)
+        except (requests.RequestException, ValueError, KeyError) as e:
+            print(f"⚡ Fast-path probe failed ({e}), running the full sync")
+            return False
+
+    behind = [symbol for symbol in indices if watermarks.get(symbol, date.min) < target]
+    if behind:
+        print(f"⚡ {len(behind)}/{len(indices)} indices need data up to {target}, running the full sync")
+        return False
+    METRICS.inc('indices_total', len(indices), outcome='skipped')
+    print(f"⚡ All {len(indices)} indices already have data for {target}, nothing to do")
+    return True
+
+
+def save_data_to_supabase(df: pd.DataFrame) -> bool:
+    """
+    Save DataFrame to Supabase using pipelined batch upsert operations.
+    
+    Uses upsert operations with (date, symbol) composite key to prevent duplicates.
+    Rows are serialized column-wise (NaN masking and date formatting happen once per
+    column) and uploaded by BatchUploader, which keeps several batches in flight,
+    adapts the batch size to payload bytes and latency, and isolates bad rows by
+    bisecting failing batches.
+    
+    Args:
+        df (pd.DataFrame): DataFrame with index data to upload
+        
+    Returns:
+        bool: True if all data saved successfully, False if any rows were rejected
+              or the upload failed
+        
+    Features:
+        - UPLOAD_IN_FLIGHT concurrent batches, adaptive batch size
+        - Retry of whole batches on transient (network/429/5xx) errors
+        - Bisection fallback on data (4xx) errors, O(log n) extra requests per bad row
+        - Rejected rows appended to REJECTS_PATH (JSONL)
+        - Vectorized NaN to None conversion and date formatting
+        - orjson encoding when installed
+    """
+    if df.empty:
+        print("No data to save to Supabase")
+        return True
+    
+    try:
+        with METRICS.time('stage_seconds', stage='serialize'):
+            records = serialize_records(df)
+        uploader = BatchUploader(postgrest_upsert,
+                                 max_in_flight=UPLOAD_IN_FLIGHT,
+                                 batch_size=UPLOAD_BATCH_SIZE,
+                                 rejects_path=REJECTS_PATH,
+                                 encode=encode_json)
+        with METRICS.time('stage_seconds', stage='upload'):
+            stats = uploader.upload(records)
+        METRICS.inc('rows_total', stats['rows_sent'], kind='written')
+        METRICS.inc('rows_total', stats['rows_rejected'], kind='rejected')
+        METRICS.inc('rows_total', stats['rows_failed'], kind='failed')
+        METRICS.inc('bytes_total', stats['bytes_sent'], service='supabase', direction='up')
+        METRICS.inc('retries_total', stats['retries'], kind='upload_batch')
+        METRICS.inc('retries_total', stats['bisect_requests'], kind='upload_bisect')
+        
+        print(f"✅ Successfully saved {stats['rows_sent']} records to Supabase "
+              f"({stats['requests']} requests, {stats['bytes_sent'] / 1024:.0f} KB)")
+        if stats['rows_rejected']:
+            print(f"❌ {stats['rows_rejected']} records rejected "
+                  f"(found with {stats['bisect_requests']} bisection requests), see {REJECTS_PATH}")
+        if stats['rows_failed']:
+            print(f"❌ {stats['rows_failed']} records not saved because Supabase kept failing transiently")
+        return not stats['rows_rejected'] and not stats['rows_failed']
+        
+    except Exception as e:
+        print(f"❌ Error saving to Supabase: {e}")
+        return False
+
+
+def upload_write_set(df_write: pd.DataFrame) -> bool:
+    """
+    Upload a write set through save_data_to_supabase, at most once across resumes.
+    
+    With a checkpoint journal, a write set the interrupted run already uploaded
+    is skipped, and one that uploads cleanly is journaled.
+    
+    Args:
+        df_write (pd.DataFrame): New and revised rows to upsert
+        
+    Returns:
+        bool: True if the rows are stored (now or by the interrupted run)
+    """
+    batch_id = write_set_id(df_write) if JOURNAL is not None else None
+    if batch_id is not None and JOURNAL.uploaded(batch_id):
+        print(f"↺ {len(df_write)} rows already uploaded by the interrupted run, skipped")
+        METRICS.inc('journal_batches_total', kind='skipped')
+        return True
+    saved = save_data_to_supabase(df_write)
+    if saved and batch_id is not None:
+        JOURNAL.record_uploaded(batch_id, sorted(map(str, df_write['symbol'].unique())), len(df_write))
+    return saved
+
+
+def get_all_time_highs(symbols: list) -> dict:
+    """
+    Probe each symbol's all-time high without downloading its history.
+    
+    Two single-row ordered selects per symbol (highest high, highest close) cover
+    rows where the high is missing, matching the page's `high || close` rule.
+    
+    Args:
+        symbols (list): Index symbols
+        
+    Returns:
+        dict: symbol -> (all-time high, date it was set) (symbols without data are omitted)
+    """
+    highs = {}
+    supabase = get_supabase_client()
+    for symbol in symbols:
+        best = None
+        for column in ('high', 'close'):
+            try:
+                response = (supabase.table(TABLE_NAME)
+                            .select(f'{column},date')
+                            .eq('symbol', symbol)
+                            .order(column, desc=True, nullsfirst=False)
+                            .limit(1)
+                            .execute())
+            except Exception as e:
+                print(f"Error probing all-time high for {symbol}: {e}")
+                continue
+            if response.data and response.data[0][column] is not None:
+                value = float(response.data[0][column])
+                if best is None or value > best[0]:
+                    best = (value, response.data[0]['date'])
+        if best is not None:
+            highs[symbol] = best
+    return highs
+
+
+def prepare_rolling_stats(engine: RollingStatsEngine, symbols: list, watermarks: dict) -> None:
+    """
+    Bring the persisted rolling statistics level with Supabase before new rows arrive.
+    
+    Symbols without state are bootstrapped once from the last STATS_WINDOW_YEARS of
+    rows plus an all-time-high probe. Symbols whose state lags the stored watermark
+    (e.g. the state file came from an older run) replay only the missing days.
+    Symbols already in step touch no stored rows at all.
+    
+    Args:
+        engine (RollingStatsEngine): Loaded statistics engine
+        symbols (list): Index symbols being synced
+        watermarks (dict): Per-symbol watermarks from get_symbol_watermarks()
+    """
+    bootstrap = [symbol for symbol in symbols
+                 if symbol in watermarks and engine.last_date(symbol) is None]
+    if bootstrap:
+        print(f"📊 Bootstrapping rolling statistics for {len(bootstrap)} indices...")
+        since = max(w['last_date'] for s, w in watermarks.items() if s in bootstrap) \
+            - timedelta(days=int(366 * STATS_WINDOW_YEARS) + 14)
+        engine.update(get_existing_data_from_supabase(bootstrap, since=since))
+        for symbol, (ath, ath_date) in get_all_time_highs(bootstrap).items():
+            engine.seed_ath(symbol, ath, ath_date)
+
+    for symbol in symbols:
+        state_date = engine.last_date(symbol)
+        if symbol in watermarks and state_date is not None and state_date < watermarks[symbol]['last_date']:
+            print(f"📊 Catching up rolling statistics for {symbol} from {state_date + timedelta(days=1)}")
+            engine.update(get_existing_data_from_supabase([symbol], since=state_date + timedelta(days=1)))
+
+
+def rebuild_stale_stats(engine: RollingStatsEngine, watermarks: dict) -> None:
+    """
+    Bootstrap again the symbols whose rolling statistics a revision invalidated
+    (a lowered high on the all-time-high day). Call it after the upload, so the
+    bootstrap reads the revised rows back from Supabase.
+    
+    Args:
+        engine (RollingStatsEngine): Statistics engine that folded this run's rows
+        watermarks (dict): Per-symbol watermarks from get_symbol_watermarks()
+    """
+    stale = engine.stale_symbols()
+    if not stale:
+        return
+    print(f"📊 Rebuilding rolling statistics for {len(stale)} indices with a revised all-time-high day")
+    engine.reset(stale)
+    prepare_rolling_stats(engine, stale, watermarks)
+
+
+def refresh_market_summary(engine: RollingStatsEngine, symbols: list) -> bool:
+    """
+    Upsert the per-symbol market summary from the rolling statistics engine.
+    
+    The engine has already folded in this run's new rows, so the summary costs one
+    small upsert regardless of history length. The engine state is saved afterwards
+    so the next run continues from here.
+    
+    Args:
+        engine (RollingStatsEngine): Up-to-date statistics engine
+        symbols (list): Index symbols to summarize
+        
+    Returns:
+        bool: True if the summary was written
+    """
+    print(f"\n📊 REFRESHING MARKET SUMMARY ({SUMMARY_TABLE})...")
+    try:
+        summary = build_summary_frame(engine.snapshots(symbols))
+        if summary.empty:
+            print(f"  ⚠ No data to summarize")
+            return False
+        get_supabase_client().table(SUMMARY_TABLE).upsert(
+            serialize_records(summary), on_conflict='symbol'
+        ).execute()
+        engine.save()
+        print(f"  ✓ Summary updated for {len(summary)} indices (as of {summary['as_of'].max()})")
+        return True
+    except Exception as e:
+        print(f"  ❌ Error refreshing market summary: {e}")
+        return False
+
+
+def refresh_history_rollups(builder: RollupBuilder, stored_symbols: list, latest: date = None,
+                            calendar: TradingCalendar = None) -> bool:
+    """
+    Recompute the chart rollups of the periods that received rows in this run.
+    
+    Symbols with stored history but no rollup state yet are rebuilt from their
+    full daily history once. Otherwise only the stored sessions of the affected
+    weeks and months that were not fetched are read back, so a daily run costs one
+    small read and one small upsert per table.
+    
+    Args:
+        builder (RollupBuilder): Builder fed with this run's fetched rows
+        stored_symbols (list): Symbols that had stored rows before this run
+        latest (date, optional): Last day of the sync (nothing is stored after it)
+        calendar (TradingCalendar, optional): Tells which unfetched days can hold stored
+                                              sessions (default: weekdays)
+        
+    Returns:
+        bool: True if the rollups were written (or nothing had changed)
+    """
+    print(f"\n📈 REFRESHING CHART ROLLUPS ({ROLLUP_TABLE}, {LTTB_TABLE})...")
+    touched = []
+    try:
+        bootstrap = [symbol for symbol in stored_symbols if not builder.has_state(symbol)]
+        if bootstrap:
+            print(f"📈 Building rollups from the full history of {len(bootstrap)} indices...")
+            builder.add(get_existing_data_from_supabase(bootstrap), complete=True)
+        touched = builder.touched
+        if not touched:
+            print(f"  ✓ No new rows, rollups unchanged")
+            return True
+
+        is_session = calendar.is_session if calendar is not None else None
+        for (since, until), symbols in builder.context_ranges(latest, is_session).items():
+            builder.add_context(get_existing_data_from_supabase(symbols, since=since, until=until))
+        rollups, series = builder.build()
+
+        supabase = get_supabase_client()
+        records = serialize_records(rollups)
+        for i in range(0, len(records), UPLOAD_BATCH_SIZE):
+            supabase.table(ROLLUP_TABLE).upsert(
+                records[i:i + UPLOAD_BATCH_SIZE], on_conflict='symbol,resolution,period'
+            ).execute()
+        supabase.table(LTTB_TABLE).upsert(series, on_conflict='symbol').execute()
+        builder.save()
+        METRICS.inc('rollup_rows_total', len(records))
+        periods = rollups['resolution'].value_counts()
+        print(f"  ✓ {periods.get('week', 0)} weekly and {periods.get('month', 0)} monthly periods "
+              f"for {len(touched)} indices, {len(series)} downsampled series "
+              f"(≤{builder.lttb_points} points)")
+        return True
+    except Exception as e:
+        print(f"  ❌ Error refreshing chart rollups: {e}")
+        # Periods of this run were not written: rebuild these symbols on the next run
+        builder.reset(touched)
+        builder.save()
+        return False
+
+
+def export_local_history(path: str, symbols: list, written: SeriesStore = None) -> bool:
+    """
+    Bring the local memory-mapped history (see history_query) up to date.
+    
+    Each symbol only loads the stored rows after its last local date, so a daily
+    run reads one row per index; the first export loads the full history once.
+    Rows this run upserted (`written`) are merged in by (symbol, date) as well,
+    so backfilled holes and upstream revisions dated on or before the last local
+    date reach the local copy without rereading it.
+    
+    Args:
+        path (str): History directory
+        symbols (list): Index symbols to export
+        written (SeriesStore, optional): Rows upserted by this run (inserts and revisions)
+        
+    Returns:
+        bool: True if the history is up to date
+    """
+    print(f"\n🗃  UPDATING LOCAL HISTORY ({path})...")
+    try:
+        base = HistoryIndex.open(path) if HistoryIndex.exists(path) else None
+        groups = {}
+        for symbol in symbols:
+            last = base.last_date(symbol) if base is not None else None
+            groups.setdefault(last + timedelta(days=1) if last else None, []).append(symbol)
+
+        updates = SeriesStore(VALUE_COLUMNS)
+        # Written rows go first so the rows read back (what is stored now) win on shared days
+        if written is not None and base is not None:
+            updates.add(written.frame())
+        for since, group in groups.items():
+            updates.add(get_existing_data_from_supabase(group, since=since))
+        if not len(updates):
+            print(f"  ✓ Already up to date ({len(base) if base is not None else 0} rows)")
+            return True
+        stats = write_history(path, updates, base=base, columns=VALUE_COLUMNS)
+        print(f"  ✓ {stats['appended']} rows appended, {stats['revised']} revised, "
+              f"{stats['rows']} rows for {stats['symbols']} indices")
+        return True
+    except Exception as e:
+        print(f"  ❌ Error updating local history: {e}")
+        return False
+
+
+def compute_row_fingerprints(df: pd.DataFrame, columns: list = None) -> pd.Series:
+    """
+    Compute a content fingerprint for every row of an index data frame.
+    
+    The fingerprint covers the value columns only, so two rows with the same
+    (date, symbol) key hash equal when their prices and valuation metrics match.
+    Values are coerced to numeric and rounded before hashing so that rows read
+    back from Supabase compare equal to freshly parsed NSE rows.
+    
+    Args:
+        df (pd.DataFrame): Frame containing some or all of VALUE_COLUMNS
+        columns (list, optional): Value columns to hash (defaults to VALUE_COLUMNS)
+        
+    Returns:
+        pd.Series: uint64 fingerprint per row, aligned with df's index
+    """
+    values = df.reindex(columns=columns or VALUE_COLUMNS).apply(pd.to_numeric, errors='coerce')
+    return pd.util.hash_pandas_object(values.round(FINGERPRINT_DECIMALS), index=False)
+
+
+def build_write_set(df_fetched: pd.DataFrame, df_existing: pd.DataFrame) -> tuple:
+    """
+    Diff freshly fetched rows against stored rows and keep only what must be written.
+    
+    Rows are matched on the (date, symbol) key. A fetched row is written when its key
+    is not stored yet (insert) or when its fingerprint differs from the stored row
+    (upstream revision). Rows whose content is unchanged are dropped from the write set.
+    
+    Args:
+        df_fetched (pd.DataFrame): Rows fetched during this run
+        df_existing (pd.DataFrame): Rows already stored in Supabase
+        
+    Returns:
+        tuple: (write_df, counts) where write_df holds the rows to upsert, sorted by
+               (symbol, date), and counts is a dict with 'inserted', 'revised' and
+               'unchanged' row counts
+    """
+    counts = {'inserted': 0, 'revised': 0, 'unchanged': 0}
+    if df_fetched.empty:
+        return df_fetched, counts
+
+    # Only compare the columns this run actually fetched (price-only runs omit valuation)
+    columns = [col for col in VALUE_COLUMNS if col in df_fetched.columns]
+
+    # Later fetches (e.g. retries) supersede earlier ones for the same key
+    fetched = df_fetched.drop_duplicates(subset=['date', 'symbol'], keep='last').copy()
+    fetched['_fingerprint'] = compute_row_fingerprints(fetched, columns).astype('UInt64').values
+
+    if df_existing.empty:
+        is_new = pd.Series(True, index=fetched.index)
+        is_revised = pd.Series(False, index=fetched.index)
+    else:
+        stored = df_existing[['date', 'symbol']].copy()
+        stored['_stored_fingerprint'] = compute_row_fingerprints(df_existing, columns).astype('UInt64').values
+        stored = stored.drop_duplicates(subset=['date', 'symbol'], keep='last')
+        fetched = fetched.merge(stored, on=['date', 'symbol'], how='left')
+        is_new = fetched['_stored_fingerprint'].isna()
+        is_revised = ~is_new & (fetched['_fingerprint'] != fetched['_stored_fingerprint']).fillna(False)
+
+    counts['inserted'] = int(is_new.sum())
+    counts['revised'] = int(is_revised.sum())
+    counts['unchanged'] = len(fetched) - counts['inserted'] - counts['revised']
+
+    write_df = fetched[(is_new | is_revised).values]
+    write_df = write_df.drop(columns=['_fingerprint', '_stored_fingerprint'], errors='ignore')
+    write_df = write_df.sort_values(['symbol', 'date']).reset_index(drop=True)
+    return write_df, counts
+
+
+def get_equity_indices() -> list:
+    """
+    Fetch list of all NSE equity indices from live NSE data feed.
+    
+    Retrieves the current list of equity indices from NSE's official JSON API.
+    Filters for equity type indices only, excluding debt and other index types.
+    
+    Returns:
+        list: List of equity index names (e.g., ['NIFTY 50', 'NIFTY BANK', ...])
+              Returns empty list on API failure
+              
+    Data Source:
+        https://iislliveblob.niftyindices.com/jsonfiles/LiveIndicesWatch.json
+    """
+    url = 'https://iislliveblob.niftyindices.com/jsonfiles/LiveIndicesWatch.json'
+    try:
+        resp = _get_nse_session().get(url, timeout=30)
+        resp.raise_for_status()
+        data = resp.json()
+    except Exception as e:
+        print(f"Failed to fetch index list: {e}")
+        return []
+    indices = [item['indexName'] for item in data.get('data', [])
+               if item.get('indexType', '').lower() == 'eq']
+    return indices
+
+
+def fetch_price_history(index_name: str, start_date: str, end_date: str,
+                        raise_errors: bool = False) -> pd.DataFrame:
+    """
+    Fetch and normalize OHLC price history for a single NSE index.
+    
+    Args:
+        index_name (str): NSE index name (e.g., 'NIFTY 50')
+        start_date (str): Start date in DD-MMM-YYYY format
+        end_date (str): End date in DD-MMM-YYYY format
+        raise_errors (bool): Raise UpstreamFetchError on API failure instead of
+                             returning an empty frame
+        
+    Returns:
+        pd.DataFrame: Columns [date, symbol, open, high, low, close]
+                     Returns empty DataFrame on API failure or no data
+    """
+    if RESPONSE_CACHE is not None:
+        cached = RESPONSE_CACHE.get(index_name, 'price', start_date, end_date)
+        METRICS.inc('cache_lookups_total', series='price', result='hit' if cached is not None else 'miss')
+        if cached is not None:
+            return cached
+
+    try:
+        with METRICS.time('stage_seconds', stage='nse_price'), CIRCUIT_BREAKERS.guard(NSE_HOST), \
+                UPSTREAM_GATE.request(NSE_HOST):
+            METRICS.inc('http_requests_total', service='nse', call='price')
+            with METRICS.time('http_request_seconds', service='nse', call='price'):
+                hist = index_history(index_name, start_date, end_date)
+    except Exception as exc:
+        kind = classify_error(exc)
+        METRICS.inc('http_errors_total', service='nse', call='price', kind=kind)
+        if raise_errors:
+            raise UpstreamFetchError(f"price data for {index_name} ({start_date} → {end_date}): {exc}",
+                                     kind, getattr(exc, 'retry_after', None)) from exc
+        print(f"Error fetching price data for {index_name}: {exc}")
+        return pd.DataFrame()
+
+    if hist is None or hist.empty:
+        return pd.DataFrame()
+
+    normalize_started = time.perf_counter()
+    hist = normalize_price(index_name, hist)
+    METRICS.observe('stage_seconds', time.perf_counter() - normalize_started, stage='normalize_price')
+    METRICS.inc('rows_total', len(hist), kind='fetched_price')
+    if RESPONSE_CACHE is not None:
+        RESPONSE_CACHE.put(index_name, 'price', start_date, end_date, hist)
+    return hist
+
+
+def fetch_valuation_history(index_name: str, start_date: str, end_date: str,
+                            raise_errors: bool = False) -> pd.DataFrame:
+    """
+    Fetch and normalize PE/PB/dividend yield history for a single NSE index.
+    
+    Args:
+        index_name (str): NSE index name (e.g., 'NIFTY 50')
+        start_date (str): Start date in DD-MMM-YYYY format
+        end_date (str): End date in DD-MMM-YYYY format
+        raise_errors (bool): Raise UpstreamFetchError on API failure instead of
+                             returning an empty frame
+        
+    Returns:
+        pd.DataFrame: Columns [date, symbol, pe, pb, div_yield]
+                     Returns empty DataFrame (with those columns) on API failure or no data
+    """
+    if RESPONSE_CACHE is not None:
+        cached = RESPONSE_CACHE.get(index_name, 'valuation', start_date, end_date)
+        METRICS.inc('cache_lookups_total', series='valuation', result='hit' if cached is not None else 'miss')
+        if cached is not None:
+            return cached
+
+    try:
+        with METRICS.time('stage_seconds', stage='nse_valuation'), CIRCUIT_BREAKERS.guard(NSE_HOST), \
+                UPSTREAM_GATE.request(NSE_HOST):
+            METRICS.inc('http_requests_total', service='nse', call='valuation')
+            with METRICS.time('http_request_seconds', service='nse', call='valuation'):
+                pe_df = index_pe_pb_div(index_name, start_date, end_date)
+    except Exception as exc:
+        kind = classify_error(exc)
+        METRICS.inc('http_errors_total', service='nse', call='valuation', kind=kind)
+        if raise_errors:
+            raise UpstreamFetchError(f"PE data for {index_name} ({start_date} → {end_date}): {exc}",
+                                     kind, getattr(exc, 'retry_after', None)) from exc
+        print(f"Error fetching PE data for {index_name}: {exc}")
+        pe_df = None
+
+    if pe_df is None or pe_df.empty:
+        return pd.DataFrame(columns=['date', 'symbol', 'pe', 'pb', 'div_yield'])
+
+    normalize_started = time.perf_counter()
+    pe_df = normalize_valuation(index_name, pe_df)
+    METRICS.observe('stage_seconds', time.perf_counter() - normalize_started, stage='normalize_valuation')
+    METRICS.inc('rows_total', len(pe_df), kind='fetched_valuation')
+    if RESPONSE_CACHE is not None:
+        RESPONSE_CACHE.put(index_name, 'valuation', start_date, end_date, pe_df)
+    return pe_df
+
+
+def fetch_data_for_index(index_name: str, start_date: str, end_date: str,
+                         price_only: bool = False, raise_errors: bool = False) -> pd.DataFrame:
+    """
+    Fetch comprehensive historical data for a single NSE index.
+    
+    Retrieves both price data (OHLC) and valuation metrics (PE, PB, dividend yield)
+    for the specified index and date range. Combines data from two nsepython API calls:
+    - index_history() for price data
+    - index_pe_pb_div() for valuation metrics
+    
+    The two calls are independent until the final merge, so the valuation request
+    is issued on a helper thread while the price request runs, and the results are
+    joined once both arrive.
+    
+    Args:
+        index_name (str): NSE index name (e.g., 'NIFTY 50', 'NIFTY BANK')
+        start_date (str): Start date in DD-MMM-YYYY format (e.g., '01-Jan-2024')
+        end_date (str): End date in DD-MMM-YYYY format (e.g., '31-Dec-2024')
+        price_only (bool): Skip the valuation call and return OHLC columns only
+        raise_errors (bool): Raise UpstreamFetchError when either call fails
+        
+    Returns:
+        pd.DataFrame: Combined data with columns [date, symbol, open, high, low, close, pe, pb, div_yield]
+                     ([date, symbol, open, high, low, close] when price_only)
+                     Returns empty DataFrame on API failure or no data
+                     
+    Data Processing:
+        - Standardizes column names and formats
+        - Converts string prices to numeric values
+        - Handles missing data with NaN values  
+        - Merges price and valuation data on date
+        - Filters out rows with invalid close prices
+    """
+    if price_only:
+        hist = fetch_price_history(index_name, start_date, end_date, raise_errors)
+        return hist.sort_values('date') if not hist.empty else hist
+
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        pe_future = pool.submit(PROFILER.wrap(fetch_valuation_history), index_name, start_date, end_date, raise_errors)
+        hist = fetch_price_history(index_name, start_date, end_date, raise_errors)
+        pe_df = pe_future.result()
+
+    if hist.empty:
+        return pd.DataFrame()
+
+    with METRICS.time('stage_seconds', stage='merge'):
+        merged = pd.merge(hist, pe_df, on=['date', 'symbol'], how='left')
+        merged = merged.sort_values('date')
+    return merged
+
+
+def plan_date_windows(start_date: str, end_date: str, chunk: str = 'year') -> list:
+    """
+    Split a date range into calendar-aligned fetch windows.
+    
+    Windows end on year/quarter/month boundaries so the same closed windows recur
+    across runs (and hit the response cache). The first and last windows are
+    clipped to the requested range.
+    
+    Args:
+        start_date (str): Start date in DD-MMM-YYYY format
+        end_date (str): End date in DD-MMM-YYYY format
+        chunk (str): 'year', 'quarter', 'month' or 'none' for a single window
+        
+    Returns:
+        list: (window_start, window_end) tuples in DD-MMM-YYYY format, oldest first
+        
+    Examples:
+        plan_date_windows('15-Nov-2023', '10-Feb-2024', 'year')
+            -> [('15-Nov-2023', '31-Dec-2023'), ('01-Jan-2024', '10-Feb-2024')]
+    """
+    start = datetime.strptime(start_date, '%d-%b-%Y')
+    end = datetime.strptime(end_date, '%d-%b-%Y')
+    if chunk not in CHUNK_MONTHS or start > end:
+        return [(start_date, end_date)]
+
+    months = CHUNK_MONTHS[chunk]
+    windows = []
+    cursor = start
+    while cursor <= end:
+        # First day of the period following the one containing cursor
+        next_month = ((cursor.month - 1) // months + 1) * months
+        boundary = datetime(cursor.year + next_month // 12, next_month % 12 + 1, 1)
+        window_end = min(end, boundary - timedelta(days=1))
+        windows.append((cursor.strftime('%d-%b-%Y'), window_end.strftime('%d-%b-%Y')))
+        cursor = boundary
+    return windows
 
-def get_supabase_client() -> Client:
+
+def fetch_window_with_retry(index_name: str, start_date: str, end_date: str,
+                            price_only: bool = False) -> pd.DataFrame:
     """
-    Initialize and return authenticated Supabase client.
+    Fetch one date window, retrying only that window on transient upstream errors.
+    
+    With a checkpoint journal, a window the interrupted run already fetched is
+    read back from it, and every newly fetched window is journaled.
     
+    Throttling and network errors are retried with exponential backoff and jitter.
+    Other kinds (parse errors, an open circuit breaker) are raised right away and
+    left to the retry pass at the end of the run.
+    
+    Args:
+        index_name (str): NSE index name
+        start_date (str): Window start in DD-MMM-YYYY format
+        end_date (str): Window end in DD-MMM-YYYY format
+        price_only (bool): Skip the valuation call
+        
     Returns:
-        Client: Configured Supabase client with service role authentication
+        pd.DataFrame: Window data (empty if the window legitimately has no rows)
+        
+    Raises:
+        UpstreamFetchError: If the window fails with a non-transient error or still
+                            fails after WINDOW_RETRIES retries
     """
-    return create_client(SUPABASE_URL, SUPABASE_KEY)
+    replayed = replay_window(index_name, start_date, end_date, price_only)
+    if replayed is not None:
+        return replayed
+    for attempt in range(WINDOW_RETRIES + 1):
+        try:
+            df = fetch_data_for_index(index_name, start_date, end_date, price_only, raise_errors=True)
+        except UpstreamFetchError as exc:
+            if attempt == WINDOW_RETRIES or exc.kind not in TRANSIENT_KINDS:
+                raise
+            METRICS.inc('retries_total', kind='window', error=exc.kind)
+            time.sleep(backoff_delay(attempt, WINDOW_RETRY_DELAY * RETRY_POLICY[exc.kind][1]))
+            continue
+        if JOURNAL is not None:
+            JOURNAL.record_fetched(index_name, start_date, end_date, price_only, df)
+        return df
 
 
-def get_existing_data_from_supabase() -> pd.DataFrame:
+def replay_window(index_name: str, start_date: str, end_date: str, price_only: bool = False):
     """
-    Load all existing index data from Supabase table.
-    
-    Retrieves all records from the 'index-price' table and converts them to a pandas
-    DataFrame with proper date parsing. Used to determine incremental update requirements.
+    Return a window the interrupted run already fetched, read back from the journal.
     
+    Args:
+        index_name (str): NSE index name
+        start_date (str): Window start in DD-MMM-YYYY format
+        end_date (str): Window end in DD-MMM-YYYY format
+        price_only (bool): Whether the window was fetched without the valuation call
+        
     Returns:
-        pd.DataFrame: Existing data with columns [date, symbol, open, high, low, close, pe, pb, div_yield]
-                     Returns empty DataFrame if no data exists or on error
+        pd.DataFrame: The journaled frame, or None if the window has to be fetched
     """
-    try:
-        supabase = get_supabase_client()
-        response = supabase.table(TABLE_NAME).select("*").execute()
-        
-        if response.data:
-            df = pd.DataFrame(response.data)
-            df['date'] = pd.to_datetime(df['date'])
-            print(f"Loaded {len(df)} existing records from Supabase")
-            return df
-        else:
-            print("No existing data found in Supabase table")
-            return pd.DataFrame(columns=[
-                'date', 'symbol', 'open', 'high', 'low', 'close', 'pe', 'pb', 'div_yield'
-            ])
-    except Exception as e:
-        print(f"Error loading data from Supabase: {e}")
-        return pd.DataFrame(columns=[
-            'date', 'symbol', 'open', 'high', 'low', 'close', 'pe', 'pb', 'div_yield'
-        ])
+    if JOURNAL is None:
+        return None
+    df = JOURNAL.fetched(index_name, start_date, end_date, price_only)
+    if df is not None:
+        METRICS.inc('journal_windows_total', kind='replayed')
+    return df
 
 
-def save_data_to_supabase(df: pd.DataFrame) -> bool:
+def fetch_index_range(index_name: str, start_date: str, end_date: str,
+                      price_only: bool = False, retry_queue: RetryScheduler = None,
+                      known_empty: KnownEmptyWindows = None, empty_windows: dict = None) -> pd.DataFrame:
     """
-    Save DataFrame to Supabase using batch upsert operations.
+    Fetch an arbitrary date range for one index as independently fetched windows.
     
-    Performs batch uploads with intelligent error handling. Uses upsert operations
-    with (date, symbol) composite key to prevent duplicates. Handles NaN values
-    and data type conversions for JSON serialization.
+    The range is split with plan_date_windows(FETCH_CHUNK). Windows are fetched on
+    up to WINDOW_WORKERS threads, each retried on its own (or replayed from the
+    checkpoint journal), and stitched back into a single frame. A window that keeps
+    failing is reported and skipped, so one bad year does not throw away the rest
+    of a full-history backfill.
     
     Args:
-        df (pd.DataFrame): DataFrame with index data to upload
+        index_name (str): NSE index name
+        start_date (str): Start date in DD-MMM-YYYY format
+        end_date (str): End date in DD-MMM-YYYY format
+        price_only (bool): Skip the valuation call
+        retry_queue (RetryScheduler, optional): Receives every window that still failed,
+                                                with its error kind, for a later retry
+        known_empty (KnownEmptyWindows, optional): Windows given up on as empty upstream,
+                                                   which are not requested
+        empty_windows (dict, optional): Receives index name -> [(start, end), ...] of the
+                                        windows upstream answered with no rows
         
     Returns:
-        bool: True if all data saved successfully, False otherwise
+        pd.DataFrame: Stitched data sorted by date (empty if nothing was returned)
         
-    Features:
-        - Batch processing (100 records per batch)
-        - Individual record fallback on batch failures
-        - Automatic NaN to None conversion
-        - Date formatting for database storage
-        - Comprehensive error logging
+    Raises:
+        UpstreamFetchError: If every window failed
     """
-    if df.empty:
-        print("No data to save to Supabase")
-        return True
+    windows = plan_date_windows(start_date, end_date, FETCH_CHUNK)
+    if known_empty is not None:
+        windows = [w for w in windows if not known_empty.covers(index_name, to_ordinal(w[0]), to_ordinal(w[1]))]
+        if not windows:
+            return pd.DataFrame()
+    frames = {}
+    failed_windows = []
+
+    def record_failure(window: tuple, exc: UpstreamFetchError) -> None:
+        failed_windows.append((*window, exc.kind))
+        print(f"  ✗ {exc} [{exc.kind}]")
+        if retry_queue is not None:
+            retry_queue.add(index_name, window[0], window[1], exc.kind)
+
+    def record_empty() -> None:
+        if empty_windows is not None:
+            empty = [window for window, df in frames.items() if df.empty]
+            if empty:
+                empty_windows.setdefault(index_name, []).extend(empty)
+
+    if len(windows) == 1:
+        try:
+            frames[windows[0]] = fetch_window_with_retry(index_name, *windows[0], price_only)
+        except UpstreamFetchError as exc:
+            record_failure(windows[0], exc)
+            raise
+        record_empty()
+        return frames[windows[0]]
+
+    print(f"  ↳ {index_name}: fetching {len(windows)} {FETCH_CHUNK} windows ({start_date} → {end_date})")
+    with ThreadPoolExecutor(max_workers=max(WINDOW_WORKERS, 1)) as pool:
+        futures = {
+            window: pool.submit(PROFILER.wrap(fetch_window_with_retry), index_name, window[0], window[1], price_only)
+            for window in windows
+        }
+        for window, future in futures.items():
+            try:
+                frames[window] = future.result()
+            except UpstreamFetchError as exc:
+                record_failure(window, exc)
+    record_empty()
+
+    if failed_windows:
+        print(f"  ⚠ {index_name}: {len(failed_windows)}/{len(windows)} windows failed after retries")
+        if len(failed_windows) == len(windows):
+            raise UpstreamFetchError(f"all {len(windows)} windows failed for {index_name}", failed_windows[-1][2])
+
+    non_empty = [df for df in frames.values() if not df.empty]
+    if not non_empty:
+        return pd.DataFrame()
+    stitched = pd.concat(non_empty, ignore_index=True)
+    stitched = stitched.drop_duplicates(subset=['date', 'symbol'], keep='last')
+    return stitched.sort_values('date', ignore_index=True)
+
+
+def fetch_indices(fetch_plan: dict, end_date: str, workers: int = 1, price_only: bool = False,
+                  on_result=None, deadline: float = None, retry_queue: RetryScheduler = None,
+                  known_empty: KnownEmptyWindows = None, empty_windows: dict = None) -> dict:
+    """
+    Fetch several indices, optionally on a worker pool.
     
-    try:
-        supabase = get_supabase_client()
+    Every upstream call still passes through the shared UPSTREAM_GATE, so the
+    global rate limit and per-host caps hold no matter how many workers run.
+    At most 2 × workers indices are submitted at a time, so completed frames
+    waiting to be consumed stay bounded.
+    
+    Args:
+        fetch_plan (dict): index name -> start date (DD-MMM-YYYY)
+        end_date (str): End date in DD-MMM-YYYY format
+        workers (int): Number of indices fetched concurrently
+        price_only (bool): Skip the valuation call for every index
+        on_result (callable, optional): Called as on_result(index_name, df) in the
+            calling thread as soon as each frame is ready. Its return value is
+            stored instead of the frame, so frames need not be retained.
+        deadline (float, optional): time.monotonic() value after which no further
+            index is started. Indices not started are left out of the result.
+        retry_queue (RetryScheduler, optional): Collects windows that failed after retries
+        known_empty (KnownEmptyWindows, optional): Windows not requested (see fetch_index_range)
+        empty_windows (dict, optional): Collects windows that came back empty, per index
         
-        # Convert DataFrame to records and handle NaN values
-        records = df.to_dict(orient='records')
-        for record in records:
-            # Convert NaN to None for JSON serialization
-            for key, value in record.items():
-                if pd.isna(value):
-                    record[key] = None
-                # Convert date to string
-                elif key == 'date' and isinstance(value, (pd.Timestamp, datetime)):
-                    record[key] = value.strftime('%Y-%m-%d')
-        
-        # Insert data in batches
-        batch_size = 100
-        total_inserted = 0
-        
-        for start in range(0, len(records), batch_size):
-            batch = records[start:start + batch_size]
-            
+    Returns:
+        dict: index name -> DataFrame (or on_result's return value), or the Exception
+              raised while fetching it. Keys follow fetch_plan's order regardless of
+              completion order.
+    """
+    def out_of_time() -> bool:
+        return deadline is not None and time.monotonic() >= deadline
+
+    results = {}
+
+    def deliver(idx_name, value):
+        if on_result is not None and not isinstance(value, Exception):
             try:
-                # Use upsert to handle duplicates
-                response = supabase.table(TABLE_NAME).upsert(
-                    batch, 
-                    on_conflict='date,symbol'
-                ).execute()
-                
-                batch_count = len(batch)
-                total_inserted += batch_count
-                print(f"  💾 Saved batch {(start//batch_size)+1}: {batch_count} records")
-                
+                value = on_result(idx_name, value)
             except Exception as e:
-                print(f"  ❌ Error saving batch {(start//batch_size)+1}: {e}")
-                # Try individual records in this batch
-                for i, record in enumerate(batch):
-                    try:
-                        supabase.table(TABLE_NAME).upsert([record], on_conflict='date,symbol').execute()
-                        total_inserted += 1
-                    except Exception as record_error:
-                        print(f"    ❌ Failed to save individual record {start + i}: {record_error}")
-        
-        print(f"✅ Successfully saved {total_inserted} records to Supabase")
-        return True
-        
-    except Exception as e:
-        print(f"❌ Error saving to Supabase: {e}")
-        return False
+                value = e
+        results[idx_name] = value
+
+    if workers <= 1 or len(fetch_plan) <= 1:
+        for idx_name, fetch_start_date in fetch_plan.items():
+            if out_of_time():
+                break
+            try:
+                value = fetch_index_range(idx_name, fetch_start_date, end_date, price_only, retry_queue,
+                                          known_empty, empty_windows)
+            except Exception as e:
+                value = e
+            deliver(idx_name, value)
+        return results
 
+    print(f"Fetching {len(fetch_plan)} indices with {workers} workers")
+    plan_items = iter(fetch_plan.items())
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        pending = {}
 
-def get_equity_indices() -> list:
+        def submit_next():
+            if out_of_time():
+                return
+            for idx_name, fetch_start_date in plan_items:
+                pending[pool.submit(PROFILER.wrap(fetch_index_range), idx_name, fetch_start_date, end_date,
+                                    price_only, retry_queue, known_empty, empty_windows)] = idx_name
+                return
+
+        for _ in range(workers * 2):
+            submit_next()
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                idx_name = pending.pop(future)
+                try:
+                    value = future.result()
+                except Exception as e:
+                    value = e
+                deliver(idx_name, value)
+                submit_next()
+    return {idx_name: results[idx_name] for idx_name in fetch_plan if idx_name in results}
+
+
+def print_write_summary(write_counts: dict, rows_written: int, success: bool,
+                        duplicates_removed: int = 0) -> None:
     """
-    Fetch list of all NSE equity indices from live NSE data feed.
+    Print the outcome of the write stage.
     
-    Retrieves the current list of equity indices from NSE's official JSON API.
-    Filters for equity type indices only, excluding debt and other index types.
+    Args:
+        write_counts (dict): 'inserted', 'revised' and 'unchanged' row counts
+        rows_written (int): Rows sent to Supabase
+        success (bool): Whether every upload succeeded
+        duplicates_removed (int): Duplicate (date, symbol) rows dropped before diffing
+    """
+    print(f"   Inserted: {write_counts['inserted']}")
+    print(f"   Revised: {write_counts['revised']}")
+    print(f"   Unchanged (skipped): {write_counts['unchanged']}")
+
+    if rows_written == 0 and success:
+        print(f"✓ Supabase table '{TABLE_NAME}' already matches upstream, nothing to write")
+    elif success:
+        print(f"✅ Data successfully saved to Supabase table '{TABLE_NAME}'")
+        print(f"   Records written: {rows_written}")
+        if duplicates_removed > 0:
+            print(f"   Duplicates removed: {duplicates_removed}")
+    else:
+        print(f"❌ Failed to save data to Supabase")
+
+
+class BufferedSink:
+    """
+    Collects every fetched row in a compact per-symbol store and writes the diff
+    at the end of the run, SINK_BATCH_ROWS rows at a time.
+    
+    Args:
+        keep_written (bool): Keep the rows that were upserted in `written` (for the local history)
+    """
+
+    def __init__(self, keep_written: bool = False):
+        self.store = SeriesStore(VALUE_COLUMNS)
+        self.written = SeriesStore(VALUE_COLUMNS) if keep_written else None
+        self.rows_fetched = 0
+        self.success = True
+
+    def add(self, df: pd.DataFrame) -> int:
+        """Store a fetched frame (a later row replaces an earlier one for the same day); returns its row count."""
+        if not df.empty:
+            self.store.add(df)
+            self.rows_fetched += len(df)
+        return len(df)
+
+    def close(self) -> None:
+        """Diff all collected rows against Supabase and upload the write set."""
+        if not self.rows_fetched:
+            print(f"\n⚠ No data to save")
+            return
+
+        print(f"\n💾 SAVING DATA TO SUPABASE...")
+        write_counts = {'inserted': 0, 'revised': 0, 'unchanged': 0}
+        rows_written = 0
+        success = True
+        for symbols in self.store.batches(SINK_BATCH_ROWS):
+            df_fetched = self.store.frame(symbols)
+            df_stored = get_overlapping_rows(df_fetched)
+            with METRICS.time('stage_seconds', stage='diff'):
+                df_write, counts = build_write_set(df_fetched, df_stored)
+            for key, count in counts.items():
+                write_counts[key] += count
+
+            # Save to Supabase (dates are formatted during serialization)
+            if not df_write.empty:
+                uploaded = upload_write_set(df_write)
+                success = uploaded and success
+                rows_written += len(df_write)
+                if uploaded and self.written is not None:
+                    self.written.add(df_write)
+        self.store = SeriesStore(VALUE_COLUMNS)
+        self.success = success
+        duplicates_removed = self.rows_fetched - sum(write_counts.values())
+        print_write_summary(write_counts, rows_written, success, duplicates_removed)
+
+
+class StreamingSink:
+    """
+    Diffs each fetched frame as soon as it arrives and hands the write set to a
+    background uploader through a bounded queue.
+    
+    Uploads overlap with the remaining fetches, and add() blocks while the queue
+    is full, so at most queue_size write sets wait in memory at any time.
     
+    Args:
+        queue_size (int): Write sets allowed to wait for the uploader
+        keep_written (bool): Keep the rows that were upserted in `written` (for the local history)
+    """
+
+    def __init__(self, queue_size: int = 2, keep_written: bool = False):
+        self.queue = queue.Queue(maxsize=max(queue_size, 1))
+        self.written = SeriesStore(VALUE_COLUMNS) if keep_written else None
+        self.write_counts = {'inserted': 0, 'revised': 0, 'unchanged': 0}
+        self.rows_fetched = 0
+        self.rows_written = 0
+        self.success = True
+        self.uploader = threading.Thread(target=PROFILER.wrap(self._drain), name='supabase-uploader', daemon=True)
+        self.uploader.start()
+
+    def add(self, df: pd.DataFrame) -> int:
+        """Diff a fetched frame and enqueue its write set; returns its row count."""
+        if df.empty:
+            return 0
+        df_stored = get_overlapping_rows(df)
+        with METRICS.time('stage_seconds', stage='diff'):
+            df_write, write_counts = build_write_set(df, df_stored)
+        self.rows_fetched += len(df)
+        for key, count in write_counts.items():
+            self.write_counts[key] += count
+        if not df_write.empty:
+            self.queue.put(df_write)
+        return len(df)
+
+    def _drain(self) -> None:
+        while True:
+            df_write = self.queue.get()
+            if df_write is None:
+                return
+            symbol = df_write['symbol'].iloc[0]
+            print(f"\n💾 Streaming {len(df_write)} rows for {symbol} to Supabase...")
+            if upload_write_set(df_write):
+                self.rows_written += len(df_write)
+                if self.written is not None:
+                    self.written.add(df_write)
+            else:
+                self.success = False
+
+    def close(self) -> None:
+        """Wait for queued uploads to finish and print the write summary."""
+        self.queue.put(None)
+        self.uploader.join()
+        if not self.rows_fetched:
+            print(f"\n⚠ No data to save")
+            return
+        print(f"\n💾 STREAMED DATA TO SUPABASE:")
+        duplicates_removed = self.rows_fetched - sum(self.write_counts.values())
+        print_write_summary(self.write_counts, self.rows_written, self.success, duplicates_removed)
+
+
+def resolve_indices(specific_indices: list = None, universe: str = None) -> list:
+    """
+    Resolve which indices a run works on.
+    
+    Args:
+        specific_indices (list, optional): Explicit index names (take precedence)
+        universe (str, optional): 'all' for every NSE equity index
+        
     Returns:
-        list: List of equity index names (e.g., ['NIFTY 50', 'NIFTY BANK', ...])
-              Returns empty list on API failure
-              
-    Data Source:
-        https://iislliveblob.niftyindices.com/jsonfiles/LiveIndicesWatch.json
+        list: Index names (DEFAULT_INDICES when nothing else applies or the
+              equity index list is unavailable)
     """
-    url = 'https://iislliveblob.niftyindices.com/jsonfiles/LiveIndicesWatch.json'
-    try:
-        resp = requests.get(url, timeout=30)
-        resp.raise_for_status()
-        data = resp.json()
-    except Exception as e:
-        print(f"Failed to fetch index list: {e}")
-        return []
-    indices = [item['indexName'] for item in data.get('data', [])
-               if item.get('indexType', '').lower() == 'eq']
-    return indices
+    if specific_indices:
+        print(f"Fetching data for specified indices: {', '.join(specific_indices)}")
+        return list(specific_indices)
+    if universe == 'all':
+        indices = get_equity_indices()
+        print(f"Fetching data for the full equity universe: {len(indices)} indices")
+        if indices:
+            return indices
+        print(f"Index list unavailable, falling back to default indices: {', '.join(DEFAULT_INDICES)}")
+        return list(DEFAULT_INDICES)
+    print(f"Fetching data for default indices: {', '.join(DEFAULT_INDICES)}")
+    return list(DEFAULT_INDICES)
 
 
-def fetch_data_for_index(index_name: str, start_date: str, end_date: str) -> pd.DataFrame:
+def audit_gaps(start_date: str, specific_indices: list = None, universe: str = None,
+               price_only: bool = False, repair: bool = True,
+               bridge_sessions: int = GAP_BRIDGE_SESSIONS, refresh_rollups: bool = True,
+               refresh_summary: bool = True, history_dir: str = None) -> dict:
     """
-    Fetch comprehensive historical data for a single NSE index.
+    Find and backfill holes in the stored history of each index.
     
-    Retrieves both price data (OHLC) and valuation metrics (PE, PB, dividend yield)
-    for the specified index and date range. Combines data from two nsepython API calls:
-    - index_history() for price data
-    - index_pe_pb_div() for valuation metrics
+    Builds an interval index of the stored sessions per symbol, compares it with
+    the trading calendar from start_date to the symbol's last stored date, and
+    fetches only the missing ranges. Holes separated by at most bridge_sessions
+    stored sessions share one request window; the few stored rows refetched with
+    it are dropped again by the diff. Windows that come back empty are remembered
+    in GAP_STATE_PATH (e.g. dates before an index's launch) and skipped later.
     
     Args:
-        index_name (str): NSE index name (e.g., 'NIFTY 50', 'NIFTY BANK')
-        start_date (str): Start date in DD-MMM-YYYY format (e.g., '01-Jan-2024')
-        end_date (str): End date in DD-MMM-YYYY format (e.g., '31-Dec-2024')
+        start_date (str): Earliest date audited, in DD-MMM-YYYY format
+        specific_indices (list, optional): Index names to audit
+        universe (str, optional): 'all' to audit every NSE equity index
+        price_only (bool): Backfill OHLC only
+        repair (bool): Fetch the missing windows (False only reports them)
+        bridge_sessions (int): Stored sessions worth refetching to merge two holes
+        refresh_rollups (bool): Recompute the chart rollups of the backfilled periods
+        refresh_summary (bool): Fold the backfilled rows into the rolling statistics and
+                                republish the market summary
+        history_dir (str, optional): Merge the backfilled rows into this local history
+                                     directory (see history_query)
         
     Returns:
-        pd.DataFrame: Combined data with columns [date, symbol, open, high, low, close, pe, pb, div_yield]
-                     Returns empty DataFrame on API failure or no data
-                     
-    Data Processing:
-        - Standardizes column names and formats
-        - Converts string prices to numeric values
-        - Handles missing data with NaN values  
-        - Merges price and valuation data on date
-        - Filters out rows with invalid close prices
+        dict: symbol -> list of (window_start, window_end, missing_sessions) in DD-MMM-YYYY
     """
-    try:
-        hist = index_history(index_name, start_date, end_date)
-    except Exception as exc:
-        print(f"Error fetching price data for {index_name}: {exc}")
-        return pd.DataFrame()
+    indices = resolve_indices(specific_indices, universe)
+    print(f"\n🔎 AUDITING STORED HISTORY FOR GAPS (from {start_date})")
 
-    if hist is None or hist.empty:
-        return pd.DataFrame()
+    stored = {}
+    for idx_name in indices:
+        try:
+            stored[idx_name] = get_stored_dates(idx_name)
+        except Exception as e:
+            print(f"  ✗ Could not load stored dates for {idx_name}: {e}")
 
-    hist = hist.rename(columns={
-        'HistoricalDate': 'date',
-        'OPEN': 'open',
-        'HIGH': 'high',
-        'LOW': 'low',
-        'CLOSE': 'close'
-    })
-    hist['date'] = pd.to_datetime(hist['date'], format='%d %b %Y')
-    for col in ['open', 'high', 'low', 'close']:
-        hist[col] = pd.to_numeric(hist[col].astype(str)
-                                  .str.replace(',', '')
-                                  .replace('-', ''),
-                                 errors='coerce')
-    hist = hist[~hist['close'].isna()].copy()
-    hist['symbol'] = index_name
-    hist = hist[['date', 'symbol', 'open', 'high', 'low', 'close']]
-
-    # Fetch PE/PB/dividend yield data
-    try:
-        pe_df = index_pe_pb_div(index_name, start_date, end_date)
-    except Exception as exc:
-        print(f"Error fetching PE data for {index_name}: {exc}")
-        pe_df = None
-    if pe_df is not None and not pe_df.empty:
-        pe_df = pe_df.rename(columns={
-            'DATE': 'date',
-            'pe': 'pe',
-            'pb': 'pb',
-            'divYield': 'div_yield'
-        })
-        pe_df['date'] = pd.to_datetime(pe_df['date'], format='%d %b %Y')
-        pe_df['symbol'] = index_name
-        for col in ['pe', 'pb', 'div_yield']:
-            pe_df[col] = pd.to_numeric(pe_df[col].astype(str)
-                                        .str.replace(',', '')
-                                        .replace('-', ''),
-                                       errors='coerce')
-        pe_df = pe_df[['date', 'symbol', 'pe', 'pb', 'div_yield']]
-    else:
-        pe_df = pd.DataFrame(columns=['date', 'symbol', 'pe', 'pb', 'div_yield'])
+    # Sessions present for any index define the calendar the holes are measured against
+    calendar = load_trading_calendar()
+    for days in stored.values():
+        calendar.observe(days)
+    known_empty = KnownEmptyWindows(GAP_STATE_PATH)
+    known_empty.load()
 
-    merged = pd.merge(hist, pe_df, on=['date', 'symbol'], how='left')
-    merged = merged.sort_values('date')
-    return merged
+    def plan_windows() -> dict:
+        plan = {}
+        for idx_name, days in stored.items():
+            index = IntervalIndex.from_days(days, calendar)
+            if not len(index):
+                print(f"  – {idx_name}: no stored rows (the incremental sync backfills it)")
+                continue
+            gaps = find_gaps(index, calendar, start=start_date)
+            windows = [w for w in coalesce_gaps(gaps, calendar, bridge_sessions)
+                       if not known_empty.covers(idx_name, w[0], w[1])]
+            missing = sum(sessions for _, _, sessions in windows)
+            METRICS.inc('gap_sessions_total', missing)
+            METRICS.inc('gap_windows_total', len(windows))
+            if not windows:
+                print(f"  ✓ {idx_name}: {len(days)} rows in {len(index)} interval(s), no gaps")
+                continue
+            print(f"  ⚠ {idx_name}: {len(gaps)} gap(s), {missing} missing sessions → "
+                  f"{len(windows)} request window(s)")
+            for start, end, sessions in windows:
+                print(f"      {' → '.join(format_window(start, end))} ({sessions} sessions)")
+            plan[idx_name] = windows
+        return plan
+
+    report = {}
+    sink = BufferedSink(keep_written=bool(history_dir))
+    rollups = None
+    if refresh_rollups and repair:
+        rollups = RollupBuilder(ROLLUP_STATE_PATH)
+        rollups.load()
+    # Without saved statistics the next sync bootstraps them from the repaired table anyway
+    stats_engine = None
+    if refresh_summary and repair:
+        stats_engine = RollingStatsEngine(STATS_STATE_PATH, window_years=STATS_WINDOW_YEARS)
+        if not stats_engine.load():
+            stats_engine = None
+    for pass_no in range(1, GAP_AUDIT_PASSES + 1):
+        plan = plan_windows()
+        for idx_name, windows in plan.items():
+            report.setdefault(idx_name, []).extend(
+                (*format_window(start, end), sessions) for start, end, sessions in windows)
+        if not repair or not plan:
+            break
 
+        print(f"\n🩹 BACKFILLING {sum(len(w) for w in plan.values())} windows (pass {pass_no})...")
+        new_sessions = 0
+        for idx_name, windows in plan.items():
+            present = {to_ordinal(day) for day in stored[idx_name]}
+            for start, end, sessions in windows:
+                window_start, window_end = format_window(start, end)
+                # Closures confirmed by an earlier window (a holiday every index lacks) need no request
+                if all(day.toordinal() in present for day in calendar.sessions(start, end)):
+                    print(f"  ✓ {idx_name} {window_start} → {window_end}: confirmed exchange closure, skipped")
+                    continue
+                try:
+                    df = fetch_index_range(idx_name, window_start, window_end, price_only)
+                except UpstreamFetchError as e:
+                    print(f"  ✗ {idx_name} {window_start} → {window_end}: {e}")
+                    continue
+                if df.empty:
+                    print(f"  – {idx_name} {window_start} → {window_end}: no data upstream, not requested again")
+                    known_empty.add(idx_name, start, end)
+                    # A short window upstream answers with nothing is a closure for every index
+                    calendar.confirm_closed(start, end)
+                    continue
+                fetched_days = pd.DatetimeIndex(df['date'].unique())
+                new_sessions += calendar.observe(fetched_days, fetched=True)
+                stored[idx_name] = list(stored[idx_name]) + list(fetched_days)
+                present.update(day.toordinal() for day in fetched_days)
+                print(f"  ✓ {idx_name} {window_start} → {window_end}: {len(df)} rows fetched")
+                sink.add(df)
+                if rollups is not None:
+                    rollups.add(df)
+                if stats_engine is not None:
+                    stats_engine.update(df)
+        # Sessions learned from the backfill can expose holes the first pass read as closures
+        if not new_sessions:
+            break
+        print(f"\n🔎 {new_sessions} newly observed sessions, re-auditing...")
 
-def update_supabase_table(start_date: str, end_date: str, specific_indices: list = None) -> None:
+    sink.close()
+    known_empty.save()
+    calendar.save()
+    if rollups is not None and rollups.touched:
+        with METRICS.time('stage_seconds', stage='rollups'):
+            refresh_history_rollups(rollups, [s for s, days in stored.items() if len(days)], calendar=calendar)
+    repaired = [idx_name for idx_name in report if idx_name in stored]
+    if stats_engine is not None and repaired:
+        with METRICS.time('stage_seconds', stage='summary'):
+            rebuild_stale_stats(stats_engine, get_symbol_watermarks(repaired))
+            refresh_market_summary(stats_engine, [s for s in indices if s in stats_engine.symbols])
+    if history_dir and repair:
+        with METRICS.time('stage_seconds', stage='export_history'):
+            export_local_history(history_dir, list(stored), written=sink.written)
+    return report
+
+
+def update_supabase_table(start_date: str, end_date: str, specific_indices: list = None,
+                          workers: int = 1, price_only: bool = False, stream: bool = False,
+                          refresh_summary: bool = True, rebuild_stats: bool = False,
+                          universe: str = None, time_budget: float = None,
+                          retry_budget: float = None, refresh_rollups: bool = True,
+                          rebuild_rollups: bool = False, history_dir: str = None) -> None:
     """
     Main orchestration function for incremental data updates to Supabase.
     
     This function manages the complete data fetching and update process:
-    1. Loads existing data from Supabase to determine incremental update requirements
+    1. Loads per-symbol watermarks from Supabase to determine incremental update requirements
     2. Fetches list of indices (all equity indices or user-specified subset)
     3. For each index, determines the optimal date range to fetch new data
     4. Implements intelligent retry mechanisms with progressive fallback strategies
@@ -284,18 +1752,40 @@ def update_supabase_table(start_date: str, end_date: str, specific_indices: list
         end_date (str): End date in DD-MMM-YYYY format  
         specific_indices (list, optional): List of specific index names to process
                                          If None, processes all available equity indices
+        workers (int): Number of indices fetched concurrently (default 1, sequential)
+        price_only (bool): Fetch OHLC only and leave stored PE/PB/div values untouched
+        stream (bool): Diff and upload each index as soon as it is fetched instead of
+                       after all fetches (bounded memory, uploads overlap fetching)
+        refresh_summary (bool): Update the per-symbol market summary table after syncing
+        rebuild_stats (bool): Discard persisted rolling statistics and bootstrap them again
+        universe (str, optional): 'all' to sync every NSE equity index from get_equity_indices()
+        time_budget (float, optional): Seconds of fetching allowed; indices not started in
+                                       time are deferred to the next run via the cursor
+        retry_budget (float, optional): Seconds the retry pass may spend on failed windows
+                                        (default RETRY_BUDGET); the rest is deferred
+        refresh_rollups (bool): Update the weekly/monthly and downsampled chart rollups
+        rebuild_rollups (bool): Discard the rollup state and rebuild it from full history
+        history_dir (str, optional): Also merge the stored and upserted rows into this
+                                     local history directory (see history_query)
     
     Incremental Update Logic:
-        - Checks existing data for each index to find last recorded date
+        - Checks each index's watermark to find last recorded date
         - Only fetches data from (last_date + 1 day) to end_date
         - Skips indices that are already up to date
         - Prevents duplicate data while enabling efficient daily updates
         
     Error Recovery Strategies:
-        1. Original date range (user-specified start to end)
-        2. Recent 1-year data (365 days back from end_date)
-        3. Recent 6-month data (180 days back from end_date)  
-        4. Recent 3-month data (90 days back from end_date)
+        0. Long ranges are fetched as calendar windows, each retried on its own
+        1. Failures are classified (throttled, network, parse, empty, circuit open)
+        2. Only the windows still missing are queued, starting from each index's watermark
+        3. Queued windows are retried with exponential backoff and jitter, as often as
+           their error kind allows, behind a per-host circuit breaker
+        4. Windows left when retries or the retry budget run out are deferred to the
+           next run via the cursor
+        5. Fetched windows and uploaded write sets are journaled as they complete, so a
+           run resumed after a crash replays them instead of repeating the work
+        6. Windows upstream answers with no rows in EMPTY_GIVE_UP_RUNS runs (a delisted
+           or renamed index) are recorded in GAP_STATE_PATH and not requested again
         
     Progress Tracking:
         - Real-time console output showing processing status
@@ -304,77 +1794,193 @@ def update_supabase_table(start_date: str, end_date: str, specific_indices: list
         - Final summary with comprehensive statistics
         
     Database Operations:
+        - Diff-based write set: only new rows and upstream revisions are upserted
+        - Optional streaming: each index is diffed and uploaded while others are still fetching
         - Batch upsert operations to Supabase
         - Duplicate detection and removal
         - Data validation and type conversion
         - Atomic operations with rollback on failure
     """
-    # Load existing data from Supabase
-    df_existing = get_existing_data_from_supabase()
-
-    if specific_indices:
-        indices = specific_indices
-        print(f"Fetching data for specified indices: {', '.join(indices)}")
-    else:
-        indices = DEFAULT_INDICES
-        print(f"Fetching data for default indices: {', '.join(indices)}")
-    
+    indices = resolve_indices(specific_indices, universe)
     if not indices:
         print("No equity indices found. Exiting without updates.")
         return
 
+    # Plan from per-symbol watermarks instead of downloading existing rows
+    with METRICS.time('stage_seconds', stage='watermarks'):
+        watermarks = get_symbol_watermarks(indices)
+
+    # Carried-over, priority and stale indices go first; the rest waits for the budget
+    scheduler = UniverseScheduler(UNIVERSE_CURSOR_PATH, priority=DEFAULT_INDICES, time_budget=time_budget)
+    if universe == 'all' or time_budget:
+        indices = scheduler.order(indices, watermarks)
+        carried = [name for name in scheduler.carried_over if name in indices]
+        if carried:
+            print(f"Resuming {len(carried)} indices left over from the previous run")
+
+    # Windows that still fail after in-fetch retries are retried once the first pass is done
+    retry_queue = RetryScheduler(base_delay=WINDOW_RETRY_DELAY)
+
+    # Rolling statistics are updated incrementally from the rows fetched below
+    stats_engine = None
+    if refresh_summary:
+        stats_engine = RollingStatsEngine(STATS_STATE_PATH, window_years=STATS_WINDOW_YEARS)
+        if rebuild_stats:
+            print(f"📊 Rebuilding rolling statistics from Supabase")
+        elif not stats_engine.load():
+            print(f"📊 No usable rolling statistics state at {STATS_STATE_PATH}, bootstrapping from Supabase")
+        with METRICS.time('stage_seconds', stage='stats_bootstrap'):
+            prepare_rolling_stats(stats_engine, indices, watermarks)
+
+    # Chart rollups are recomputed for the periods the fetched rows fall into
+    rollups = None
+    if refresh_rollups:
+        rollups = RollupBuilder(ROLLUP_STATE_PATH)
+        if rebuild_rollups:
+            print(f"📈 Rebuilding chart rollups from Supabase")
+            rollups.load()
+            rollups.reset(indices)
+        elif not rollups.load():
+            print(f"📈 No usable rollup state at {ROLLUP_STATE_PATH}, building it from Supabase")
+
+    # Sessions seen in stored and fetched data tell which fetches can return anything
+    calendar = load_trading_calendar()
+    if stats_engine is not None:
+        calendar.observe(stats_engine.observed_days())
+    d_end = datetime.strptime(end_date, '%d-%b-%Y').date()
+
+    # Fetched frames flow into the sink, which owns diffing and uploading
+    keep_written = bool(history_dir)
+    sink = StreamingSink(STREAM_QUEUE_SIZE, keep_written) if stream else BufferedSink(keep_written)
+
+    def collect(df: pd.DataFrame) -> int:
+        if stats_engine is not None:
+            with METRICS.time('stage_seconds', stage='stats_update'):
+                stats_engine.update(df)
+        if rollups is not None:
+            with METRICS.time('stage_seconds', stage='rollups'):
+                rollups.add(df)
+        if not df.empty:
+            calendar.observe(pd.DatetimeIndex(df['date'].unique()), fetched=True)
+        return sink.add(df)
+
     # Track success and failures
     successful_indices = []
     failed_indices = []
     skipped_indices = []
+    deferred_indices = []
+    no_session_indices = []
+    known_empty_indices = []
     total_rows_added = 0
 
-    # Process each index individually
-    for i, idx_name in enumerate(indices, 1):
-        print(f"\n[{i}/{len(indices)}] Processing {idx_name}")
-        
-        try:
-            # Determine the starting date for this index based on existing data
-            if not df_existing.empty and (df_existing['symbol'] == idx_name).any():
-                last_date = df_existing[df_existing['symbol'] == idx_name]['date'].max().date()
-                # Start fetching from the day after the last recorded date
-                fetch_start_date = (last_date + timedelta(days=1)).strftime('%d-%b-%Y')
-            else:
-                fetch_start_date = start_date
+    # Plan the fetch window for each index from its watermark
+    fetch_plan = {}
+    for idx_name in indices:
+        # Determine the starting date for this index based on its watermark
+        last_date = watermarks[idx_name]['last_date'] if idx_name in watermarks else None
+        if last_date is None:
+            fetch_plan[idx_name] = start_date
+        elif calendar.next_session(last_date) > d_end:
+            # No trading session since the last recorded date (weekend, holiday or up to date)
+            skipped_indices.append(idx_name)
+        else:
+            # Start fetching from the day after the last recorded date
+            fetch_plan[idx_name] = (last_date + timedelta(days=1)).strftime('%d-%b-%Y')
 
-            # Skip fetching if start date is after the requested end_date
-            try:
-                d_fetch_start = datetime.strptime(fetch_start_date, '%d-%b-%Y')
-                d_end = datetime.strptime(end_date, '%d-%b-%Y')
-            except ValueError:
-                d_fetch_start = None
-                d_end = None
-            
-            if d_fetch_start is not None and d_end is not None and d_fetch_start > d_end:
-                print(f"  ✓ {idx_name} already up to date (last date: {last_date})")
-                skipped_indices.append(idx_name)
-                continue
+    # Windows that kept coming back empty (delisted or renamed indices) are not requested again
+    known_empty = KnownEmptyWindows(GAP_STATE_PATH)
+    known_empty.load()
+    empty_windows = {}
 
-            # Fetch data for this specific index
-            new_df = fetch_data_for_index(idx_name, fetch_start_date, end_date)
-            
-            if new_df.empty:
-                print(f"  ⚠ No data returned for {idx_name}")
-                failed_indices.append(idx_name)
+    # Windows whose retries the previous run deferred; anything from the fetch start on is refetched anyway
+    for idx_name, windows in scheduler.carried_windows.items():
+        if idx_name not in indices:
+            continue
+        plan_start = datetime.strptime(fetch_plan[idx_name], '%d-%b-%Y') if idx_name in fetch_plan else None
+        for window_start, window_end, kind in windows:
+            if known_empty.covers(idx_name, to_ordinal(window_start), to_ordinal(window_end)):
                 continue
+            if plan_start is not None:
+                if datetime.strptime(window_start, '%d-%b-%Y') >= plan_start:
+                    continue
+                window_end = min(window_end, (plan_start - timedelta(days=1)).strftime('%d-%b-%Y'),
+                                 key=lambda value: datetime.strptime(value, '%d-%b-%Y'))
+            retry_queue.add(idx_name, window_start, window_end, kind, delay=0)
+    if len(retry_queue):
+        print(f"Resuming {len(retry_queue)} missing windows deferred by the previous run")
 
-            # Add the new data
-            df_existing = pd.concat([df_existing, new_df], ignore_index=True)
-            rows_added = len(new_df)
-            total_rows_added += rows_added
-            successful_indices.append(idx_name)
-            print(f"  ✓ Added {rows_added} rows for {idx_name}")
+    def queue_retry(idx_name: str, kind: str) -> None:
+        for window_start, window_end in plan_date_windows(fetch_plan[idx_name], end_date, FETCH_CHUNK):
+            if not known_empty.covers(idx_name, to_ordinal(window_start), to_ordinal(window_end)):
+                retry_queue.add(idx_name, window_start, window_end, kind)
 
-        except Exception as e:
-            print(f"  ✗ Error processing {idx_name}: {e}")
+    # Fetch every planned index, in parallel when workers > 1
+    results = fetch_indices(fetch_plan, end_date, workers=workers, price_only=price_only,
+                            on_result=lambda idx_name, df: collect(df), deadline=scheduler.deadline,
+                            retry_queue=retry_queue, known_empty=known_empty, empty_windows=empty_windows)
+
+    # Report per-index outcomes in input order so output stays deterministic
+    for i, idx_name in enumerate(indices, 1):
+        print(f"\n[{i}/{len(indices)}] Processing {idx_name}")
+
+        if idx_name in skipped_indices:
+            last_date = watermarks[idx_name]['last_date']
+            print(f"  ✓ {idx_name} already up to date (last date: {last_date}, "
+                  f"next session: {calendar.next_session(last_date)})")
+            continue
+
+        if idx_name not in results:
+            print(f"  ⏸ Deferred to the next run (time budget exhausted)")
+            deferred_indices.append(idx_name)
+            continue
+
+        rows_added = results[idx_name]
+        if isinstance(rows_added, Exception):
+            print(f"  ✗ Error processing {idx_name}: {rows_added}")
             failed_indices.append(idx_name)
+            if not isinstance(rows_added, UpstreamFetchError):
+                # Upstream failures queued their failed windows already
+                queue_retry(idx_name, classify_error(rows_added))
+            continue
+
+        if rows_added == 0:
+            expected_sessions = calendar.sessions_between(fetch_plan[idx_name], d_end)
+            if idx_name in watermarks and expected_sessions <= EMPTY_GRACE_SESSIONS:
+                # Nothing published yet for the newest session: expected, not a failure
+                print(f"  ✓ No new session published yet for {idx_name} "
+                      f"({expected_sessions} expected since {fetch_plan[idx_name]})")
+                no_session_indices.append(idx_name)
+                continue
+            if idx_name not in empty_windows and idx_name not in retry_queue.outstanding():
+                print(f"  – No data upstream for {idx_name}: every window is known empty, none requested")
+                known_empty_indices.append(idx_name)
+                continue
+            print(f"  ⚠ No data returned for {idx_name}")
+            # Only the windows that came back empty; failed ones are queued with their error kind
+            given_up = 0
+            for window_start, window_end in empty_windows.get(idx_name, []):
+                if known_empty.record_empty(idx_name, to_ordinal(window_start), to_ordinal(window_end)):
+                    given_up += 1
+                else:
+                    retry_queue.add(idx_name, window_start, window_end, 'empty')
+            if given_up:
+                print(f"    {given_up} window(s) empty in {EMPTY_GIVE_UP_RUNS} runs, not requested again")
+            if idx_name in retry_queue.outstanding():
+                failed_indices.append(idx_name)
+            else:
+                known_empty_indices.append(idx_name)
             continue
 
+        total_rows_added += rows_added
+        successful_indices.append(idx_name)
+        print(f"  ✓ Added {rows_added} rows for {idx_name}")
+
+    for outcome, names in (('successful', successful_indices), ('skipped', skipped_indices),
+                           ('no_new_session', no_session_indices), ('known_empty', known_empty_indices),
+                           ('failed', failed_indices),
+                           ('deferred', deferred_indices)):
+        METRICS.inc('indices_total', len(names), outcome=outcome)
+
     # Print summary
     print(f"\n{'='*60}")
     print(f"PROCESSING SUMMARY:")
@@ -382,7 +1988,13 @@ def update_supabase_table(start_date: str, end_date: str, specific_indices: list
     print(f"Total indices processed: {len(indices)}")
     print(f"Successful: {len(successful_indices)}")
     print(f"Skipped (up to date): {len(skipped_indices)}")
+    if no_session_indices:
+        print(f"No new session published yet: {len(no_session_indices)}")
+    if known_empty_indices:
+        print(f"Known empty upstream (not requested): {len(known_empty_indices)}")
     print(f"Failed: {len(failed_indices)}")
+    if deferred_indices:
+        print(f"Deferred (time budget): {len(deferred_indices)}")
     print(f"Total rows added: {total_rows_added}")
 
     if failed_indices:
@@ -395,87 +2007,132 @@ def update_supabase_table(start_date: str, end_date: str, specific_indices: list
         for idx in successful_indices:
             print(f"  - {idx}")
 
-    # Retry failed indices with more aggressive approach
-    if failed_indices:
-        print(f"\n🔄 AUTOMATICALLY RETRYING {len(failed_indices)} failed indices...")
-        retry_successful = []
-        retry_strategies = [
-            ("with original start date", lambda idx: fetch_data_for_index(idx, start_date, end_date)),
-            ("with recent 1-year data", lambda idx: fetch_data_for_index(idx, (datetime.now() - timedelta(days=365)).strftime('%d-%b-%Y'), end_date)),
-            ("with recent 6-month data", lambda idx: fetch_data_for_index(idx, (datetime.now() - timedelta(days=180)).strftime('%d-%b-%Y'), end_date)),
-            ("with recent 3-month data", lambda idx: fetch_data_for_index(idx, (datetime.now() - timedelta(days=90)).strftime('%d-%b-%Y'), end_date)),
-        ]
-        
-        for strategy_name, fetch_func in retry_strategies:
-            if not failed_indices:  # All recovered
-                break
-                
-            print(f"\n  Strategy: Retrying {strategy_name}")
-            current_failures = failed_indices.copy()
-            
-            for idx_name in current_failures:
-                if idx_name not in failed_indices:  # Already recovered
+    # Retry exactly the windows still missing, with backoff, until the retry budget runs out
+    recovered_indices = []
+    if len(retry_queue):
+        print(f"\n🔄 RETRYING {len(retry_queue)} missing windows across "
+              f"{len(retry_queue.outstanding())} indices...")
+        retry_deadline = time.monotonic() + (RETRY_BUDGET if retry_budget is None else retry_budget)
+        if scheduler.deadline is not None:
+            retry_deadline = min(retry_deadline, scheduler.deadline)
+        retried_rows = {}
+        for task in retry_queue.drain(retry_deadline):
+            label = f"{task.index_name} {task.start} → {task.end}"
+            METRICS.inc('retries_total', kind='scheduled', error=task.kind)
+            try:
+                df = replay_window(task.index_name, task.start, task.end, price_only)
+                if df is None:
+                    df = fetch_data_for_index(task.index_name, task.start, task.end, price_only, raise_errors=True)
+                    if JOURNAL is not None:
+                        JOURNAL.record_fetched(task.index_name, task.start, task.end, price_only, df)
+            except UpstreamFetchError as e:
+                requeued = retry_queue.failed(task, e.kind, e.retry_after)
+                print(f"    ✗ {label}: {e.kind} ({'will retry' if requeued else 'deferred'})")
+                continue
+            if df.empty:
+                if known_empty.record_empty(task.index_name, to_ordinal(task.start), to_ordinal(task.end)):
+                    print(f"    – {label}: no data in {EMPTY_GIVE_UP_RUNS} runs, not requested again")
                     continue
-                    
-                print(f"    Retrying {idx_name} {strategy_name}...")
-                try:
-                    new_df = fetch_func(idx_name)
-                    if not new_df.empty:
-                        df_existing = pd.concat([df_existing, new_df], ignore_index=True)
-                        retry_successful.append(idx_name)
-                        failed_indices.remove(idx_name)
-                        rows_added = len(new_df)
-                        total_rows_added += rows_added
-                        print(f"      ✓ SUCCESS: {rows_added} rows added")
-                    else:
-                        print(f"      ⚠ No data returned")
-                except Exception as e:
-                    print(f"      ✗ Error: {e}")
-            
-            if retry_successful:
-                print(f"    ✅ {len(retry_successful)} indices recovered with this strategy")
-
-        # Final summary of retry results
-        if retry_successful:
-            print(f"\n✅ RETRY SUMMARY: {len(retry_successful)} indices recovered automatically")
-            for idx in retry_successful:
-                print(f"  ✓ {idx}")
-        
-        if failed_indices:
-            print(f"\n❌ STILL FAILED after all retry attempts:")
-            for idx in failed_indices:
-                print(f"  - {idx}")
-            print(f"\nThese indices may have data availability issues.")
-        else:
+                requeued = retry_queue.failed(task, 'empty')
+                print(f"    ⚠ {label}: no data returned ({'will retry' if requeued else 'deferred'})")
+                continue
+            rows_added = collect(df)
+            retried_rows[task.index_name] = retried_rows.get(task.index_name, 0) + rows_added
+            total_rows_added += rows_added
+            print(f"    ✓ {label}: {rows_added} rows added")
+
+        outstanding = retry_queue.outstanding()
+        for idx_name in list(failed_indices):
+            if idx_name not in outstanding and retried_rows.get(idx_name):
+                failed_indices.remove(idx_name)
+                recovered_indices.append(idx_name)
+        METRICS.inc('indices_total', len(recovered_indices), outcome='recovered')
+
+        if recovered_indices:
+            print(f"\n✅ RETRY SUMMARY: {len(recovered_indices)} indices recovered automatically")
+            for idx in recovered_indices:
+                print(f"  ✓ {idx} ({retried_rows[idx]} rows)")
+
+        if outstanding:
+            print(f"\n⏭  STILL MISSING after retries, deferred to the next run:")
+            for idx_name, windows in outstanding.items():
+                for window_start, window_end, kind in windows:
+                    print(f"  - {idx_name} {window_start} → {window_end} ({kind})")
+        elif failed_indices:
+            print(f"\n❌ STILL FAILED: {', '.join(failed_indices)}")
+        elif recovered_indices:
             print(f"\n🎉 ALL INDICES RECOVERED! No manual intervention needed.")
 
-    # Save data to Supabase instead of CSV
-    if not df_existing.empty:
-        print(f"\n💾 SAVING DATA TO SUPABASE...")
-        initial_count = len(df_existing)
-        df_existing.drop_duplicates(subset=['symbol', 'date'], keep='first', inplace=True)
-        df_existing = df_existing.sort_values(['symbol', 'date'])
-        # Format dates for Supabase
-        df_existing['date'] = df_existing['date'].dt.strftime('%Y-%m-%d')
-        
-        # Save to Supabase
-        success = save_data_to_supabase(df_existing)
-        final_count = len(df_existing)
-        duplicates_removed = initial_count - final_count
-        
-        if success:
-            print(f"✅ Data successfully saved to Supabase table '{TABLE_NAME}'")
-            print(f"   Final record count: {final_count}")
-            if duplicates_removed > 0:
-                print(f"   Duplicates removed: {duplicates_removed}")
+    if CIRCUIT_BREAKERS.trips:
+        METRICS.inc('circuit_breaker_trips_total', CIRCUIT_BREAKERS.trips, host=NSE_HOST)
+        print(f"\n⚡ Circuit breaker for {NSE_HOST} opened {CIRCUIT_BREAKERS.trips} time(s) this run")
+
+    # Save only new or revised rows to Supabase (streamed rows are already uploaded)
+    sink.close()
+
+    calendar.save()
+    known_empty.save()
+
+    # Whatever did not finish is picked up first on the next run, with its exact missing windows
+    outstanding = retry_queue.outstanding()
+    pending = list(dict.fromkeys(deferred_indices + failed_indices + list(outstanding)))
+    scheduler.save(pending, outstanding, covered=indices)
+    if pending:
+        print(f"\n⏭  {len(pending)} indices queued for the next run ({UNIVERSE_CURSOR_PATH})")
+
+    # Publish the market-status metrics so the page reads one row per index
+    if stats_engine is not None:
+        with METRICS.time('stage_seconds', stage='summary'):
+            rebuild_stale_stats(stats_engine, watermarks)
+            refresh_market_summary(stats_engine, indices)
+
+    # Chart rollups, from the rows fetched above plus the edges of their periods
+    if rollups is not None:
+        with METRICS.time('stage_seconds', stage='rollups'):
+            refresh_history_rollups(rollups, [s for s in indices if s in watermarks], latest=d_end,
+                                    calendar=calendar)
+
+    # Local copy for research queries, read back from what is now stored
+    if history_dir:
+        with METRICS.time('stage_seconds', stage='export_history'):
+            export_local_history(history_dir, indices, written=sink.written)
+
+    # The run is complete once everything fetched is stored; nothing is left to resume
+    if JOURNAL is not None:
+        if JOURNAL.replayed:
+            print(f"\n📓 {JOURNAL.replayed} windows replayed from the journal instead of refetched")
+        if sink.success:
+            JOURNAL.commit()
         else:
-            print(f"❌ Failed to save data to Supabase")
-    else:
-        print(f"\n⚠ No data to save")
+            print(f"\n📓 Upload incomplete, journal kept for --resume ({JOURNAL_DIR})")
 
     print(f"{'='*60}")
 
 
+def write_run_report(args: argparse.Namespace) -> None:
+    """
+    Print and write the end-of-run reports requested on the command line.
+    
+    Shared by every way a run can end (gap audit, fast path, full sync, error),
+    so --cache-stats, --metrics-file, --prometheus-file and --profile always apply.
+    
+    Args:
+        args (argparse.Namespace): Parsed command-line arguments
+    """
+    if args.cache_stats and RESPONSE_CACHE is not None:
+        RESPONSE_CACHE.print_stats()
+
+    report_connection_pools()
+    METRICS.print_summary()
+    METRICS.write_json(args.metrics_file)
+    print(f"\n📏 Run metrics written to {args.metrics_file}")
+    if args.prometheus_file:
+        METRICS.write_prometheus(args.prometheus_file)
+        print(f"📏 Prometheus metrics written to {args.prometheus_file}")
+    if args.profile:
+        PROFILER.dump(args.profile)
+
+
 def main() -> None:
     """
     Command-line interface and main entry point for NSE Index Data Fetcher.
@@ -489,6 +2146,39 @@ def main() -> None:
         --start YYYY-MM-DD    : Start date for custom date range
         --end YYYY-MM-DD      : End date for custom date range (defaults to today)
         --indices "IDX1,IDX2" : Comma-separated list of specific indices
+        --workers N           : Fetch N indices in parallel
+        --rate R              : Global upstream request rate limit (req/s)
+        --host-concurrency N  : Concurrent requests allowed per upstream host
+        --price-only          : Skip the valuation (PE/PB/div) call
+        --cache-dir DIR       : Local cache of upstream responses
+        --cache-max-mb MB     : Cache size bound (LRU eviction)
+        --cache-ttl MIN       : Freshness of cached windows that include today
+        --no-cache            : Always fetch from NSE
+        --chunk PERIOD        : Backfill window size (year/quarter/month/none)
+        --window-workers N    : Windows of one index fetched in parallel
+        --upload-concurrency N: Upsert batches kept in flight
+        --batch-size N        : Initial upsert batch size (adaptive)
+        --rejects-file PATH   : Where rows rejected by Supabase are recorded
+        --stream              : Upload each index as soon as it is fetched
+        --no-summary          : Skip the market summary refresh
+        --rebuild-stats       : Rebuild the persisted rolling statistics
+        --no-rollups          : Skip the weekly/monthly and downsampled chart rollups
+        --rebuild-rollups     : Rebuild the chart rollups from full history
+        --export-history [DIR]: Keep a memory-mapped local history for history_query
+        --resume              : Replay the journal of an interrupted run instead of refetching
+        --no-journal          : Do not journal fetched windows and uploads
+        --universe all        : Sync every NSE equity index (scheduled, resumable)
+        --time-budget MIN     : Minutes of fetching allowed per run
+        --retry-budget SEC    : Seconds the retry pass may spend on failed windows
+        --breaker-threshold N : Consecutive NSE failures that open the circuit breaker
+        --http2               : Use HTTP/2 for raw Supabase REST calls (needs httpx + h2)
+        --cache-stats         : Print cache statistics at the end of the run
+        --metrics-file PATH   : JSON run metrics report (stage timings, counters, histograms)
+        --prometheus-file PATH: Also write the metrics as a Prometheus textfile
+        --profile [PATH]      : Dump merged cProfile stats of all threads
+        --no-fast-path        : Skip the up-to-date check and always run the full sync
+        --audit-gaps [MODE]   : Find holes in stored history and backfill them (report = list only)
+        --gap-bridge N        : Stored sessions worth refetching to merge two neighbouring gaps
         --start-date          : [Deprecated] Use --start instead
         --end-date            : [Deprecated] Use --end instead
         
@@ -509,6 +2199,10 @@ def main() -> None:
         4. Display configuration summary
         5. Execute data fetching and Supabase update process
     """
+    global UPSTREAM_GATE, RESPONSE_CACHE, FETCH_CHUNK, WINDOW_WORKERS
+    global UPLOAD_IN_FLIGHT, UPLOAD_BATCH_SIZE, REJECTS_PATH, CIRCUIT_BREAKERS
+    global NSE_POOL_SIZE, SUPABASE_POOL_SIZE, USE_HTTP2, JOURNAL
+
     parser = argparse.ArgumentParser(
         description=('NSE Index Data Fetcher with Supabase Integration.\n\n'
                      'Fetches comprehensive NSE equity index data (price + valuation metrics) '
@@ -521,7 +2215,7 @@ def main() -> None:
                      '• Flexible date and index selection options\n\n'
                      'Use --date for single day, --start/--end for custom range, '
                      'or no dates to fetch from 1990 to today.\n'
-                     'Use --indices to specify particular indices, or omit to fetch all equity indices.'),
+                     'Use --indices to specify particular indices, or --universe all to fetch all equity indices.'),
         formatter_class=argparse.RawDescriptionHelpFormatter)
     parser.add_argument('--date', 
                         help='Fetch data for a specific single date (YYYY-MM-DD). '
@@ -532,6 +2226,96 @@ def main() -> None:
     parser.add_argument('--end', 
                         help='End date for custom date range (YYYY-MM-DD). '
                              'Must be used with --start. Cannot be future dated.')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='Number of indices to fetch in parallel (default: 1). '
+                             'Requests stay bounded by --rate and --host-concurrency.')
+    parser.add_argument('--rate', type=float, default=2.0,
+                        help='Maximum upstream requests per second across all workers '
+                             '(default: 2.0, 0 disables the limit).')
+    parser.add_argument('--host-concurrency', type=int, default=2,
+                        help='Maximum concurrent requests per upstream host (default: 2).')
+    parser.add_argument('--price-only', action='store_true',
+                        help='Fetch OHLC prices only and skip the PE/PB/dividend yield call. '
+                             'Stored valuation values are left untouched.')
+    parser.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR,
+                        help='Directory for the local cache of upstream responses '
+                             '(default: src/backend/.cache/nse or $INDEX_CACHE_DIR).')
+    parser.add_argument('--cache-max-mb', type=float, default=256,
+                        help='Maximum cache size in MB; least recently used entries are evicted (default: 256).')
+    parser.add_argument('--cache-ttl', type=float, default=30,
+                        help='Minutes a cached window that includes today stays fresh (default: 30). '
+                             'Windows that had closed when cached never expire.')
+    parser.add_argument('--no-cache', action='store_true',
+                        help='Bypass the local response cache and always hit NSE.')
+    parser.add_argument('--cache-stats', action='store_true',
+                        help='Print cache hit/miss/eviction statistics at the end of the run.')
+    parser.add_argument('--chunk', choices=['year', 'quarter', 'month', 'none'], default='year',
+                        help='Split long date ranges into calendar-aligned windows fetched and '
+                             'retried independently (default: year; none = single request).')
+    parser.add_argument('--window-workers', type=int, default=2,
+                        help='Windows of one index fetched in parallel during backfills (default: 2).')
+    parser.add_argument('--upload-concurrency', type=int, default=3,
+                        help='Upsert batches kept in flight at once (default: 3).')
+    parser.add_argument('--batch-size', type=int, default=500,
+                        help='Initial upsert batch size; adapts to payload size and latency (default: 500).')
+    parser.add_argument('--rejects-file', default=REJECTS_PATH,
+                        help='JSONL file receiving rows Supabase rejects (default: src/backend/.state/upload-rejects.jsonl).')
+    parser.add_argument('--stream', action='store_true',
+                        help='Diff and upload each index as soon as it is fetched, overlapping '
+                             'uploads with the remaining fetches (bounded memory).')
+    parser.add_argument('--no-summary', action='store_true',
+                        help=f'Skip refreshing the {SUMMARY_TABLE} table after syncing.')
+    parser.add_argument('--rebuild-stats', action='store_true',
+                        help='Discard the persisted rolling statistics and rebuild them from Supabase.')
+    parser.add_argument('--no-rollups', action='store_true',
+                        help=f'Skip refreshing the {ROLLUP_TABLE} and {LTTB_TABLE} chart rollups after syncing.')
+    parser.add_argument('--rebuild-rollups', action='store_true',
+                        help='Discard the rollup state and rebuild the chart rollups from full history.')
+    parser.add_argument('--export-history', nargs='?', const=HISTORY_DIR, default=None, metavar='DIR',
+                        help='After syncing, append the stored rows to a memory-mapped local history '
+                             'queried with history_query.py (default: src/backend/.state/history).')
+    parser.add_argument('--resume', action='store_true',
+                        help='Replay the checkpoint journal of an interrupted run: journaled windows are not '
+                             'fetched again and journaled write sets are not uploaded again')
+    parser.add_argument('--no-journal', action='store_true',
+                        help='Do not journal fetched windows and uploaded write sets (no --resume possible)')
+    parser.add_argument('--universe', choices=['default', 'all'], default='default',
+                        help='default: the major indices in DEFAULT_INDICES; all: every NSE equity index. '
+                             'Ignored when --indices is given.')
+    parser.add_argument('--time-budget', type=float, default=None,
+                        help='Minutes of fetching allowed per run. Indices not started in time are '
+                             'deferred to the next run, ahead of everything else.')
+    parser.add_argument('--retry-budget', type=float, default=RETRY_BUDGET,
+                        help='Seconds the end-of-run retry pass may spend on windows that failed, with '
+                             f'backoff between attempts (default: {RETRY_BUDGET:g}). Windows still missing '
+                             'are deferred to the next run.')
+    parser.add_argument('--breaker-threshold', type=int, default=CIRCUIT_BREAKERS.threshold,
+                        help='Consecutive NSE throttling/network failures that open the circuit breaker, '
+                             f'failing requests fast for {CIRCUIT_BREAKERS.cooldown:g}s '
+                             f'(default: {CIRCUIT_BREAKERS.threshold}, 0 disables).')
+    parser.add_argument('--http2', action='store_true',
+                        help='Send raw Supabase REST calls (upserts, watermark probes) over HTTP/2, '
+                             'multiplexed on one connection. Requires httpx and h2; falls back to '
+                             'pooled HTTP/1.1 keep-alive otherwise.')
+    parser.add_argument('--metrics-file', default=METRICS_PATH,
+                        help='JSON file receiving the run metrics report '
+                             '(default: src/backend/.state/run-metrics.json).')
+    parser.add_argument('--prometheus-file', default=None,
+                        help='Also write the run metrics in Prometheus text format to this file '
+                             '(e.g. for the node_exporter textfile collector).')
+    parser.add_argument('--profile', nargs='?', const=os.path.join(STATE_DIR, 'profile.pstats'), default=None,
+                        help='Profile the run (all threads) with cProfile and dump the stats to this file '
+                             '(default: src/backend/.state/profile.pstats).')
+    parser.add_argument('--no-fast-path', action='store_true',
+                        help='Always run the full sync, even when a quick watermark probe shows '
+                             'every index already has data for the latest session.')
+    parser.add_argument('--audit-gaps', nargs='?', const='repair', choices=['repair', 'report'], default=None,
+                        help='Instead of the incremental sync, find missing sessions inside the stored '
+                             'history (from --start, default 1990) and fetch only those ranges. '
+                             '"report" lists the gaps without fetching.')
+    parser.add_argument('--gap-bridge', type=int, default=GAP_BRIDGE_SESSIONS,
+                        help=f'Merge gaps separated by at most this many stored sessions into one request '
+                             f'(default: {GAP_BRIDGE_SESSIONS}).')
     parser.add_argument('--indices', 
                         help='Comma-separated list of specific NSE indices to fetch. '
                              'Example: "NIFTY 50,NIFTY BANK,NIFTY IT". '
@@ -578,6 +2362,41 @@ def main() -> None:
         start_date = args.start_date if args.start_date else '01-Jan-1990'
         end_date = args.end_date if args.end_date else datetime.today().strftime('%d-%b-%Y')
 
+    if args.workers < 1:
+        parser.error('--workers must be at least 1.')
+
+    # Configure the shared upstream throttle
+    UPSTREAM_GATE = UpstreamGate(rate=args.rate, burst=max(args.rate, 1), host_cap=args.host_concurrency)
+
+    # Configure the NSE circuit breaker
+    CIRCUIT_BREAKERS = HostBreakers(threshold=args.breaker_threshold, cooldown=CIRCUIT_BREAKERS.cooldown)
+
+    # Configure chunked range fetching
+    FETCH_CHUNK = args.chunk
+    WINDOW_WORKERS = max(args.window_workers, 1)
+
+    # Configure the upload pipeline
+    UPLOAD_IN_FLIGHT = max(args.upload_concurrency, 1)
+    UPLOAD_BATCH_SIZE = max(args.batch_size, 1)
+    REJECTS_PATH = args.rejects_file
+
+    # Size the keep-alive pools to the concurrency actually used against each service
+    NSE_POOL_SIZE = max(args.host_concurrency, 1) + 1
+    SUPABASE_POOL_SIZE = UPLOAD_IN_FLIGHT + 1
+    USE_HTTP2 = args.http2 and HTTP2_AVAILABLE
+
+    # Configure the local response cache
+    if not args.no_cache:
+        RESPONSE_CACHE = ResponseCache(args.cache_dir,
+                                       max_bytes=int(args.cache_max_mb * 1024 * 1024),
+                                       ttl_seconds=args.cache_ttl * 60)
+
+    # Checkpoint journal of this run, continuing the interrupted one with --resume
+    if args.resume and args.no_journal:
+        parser.error('--resume needs the journal, drop --no-journal.')
+    journal = SyncJournal(JOURNAL_DIR) if not args.no_journal else None
+    interrupted = journal.recover() if args.resume else None
+
     # Parse specific indices if provided
     specific_indices = None
     if args.indices:
@@ -597,15 +2416,90 @@ def main() -> None:
             print(f"     • {idx}")
         if len(specific_indices) > 3:
             print(f"     ... and {len(specific_indices)-3} more")
+    elif args.universe == 'all':
+        print(f"   Target Indices: Full equity universe (stale and priority indices first)")
     else:
         print(f"   Target Indices: Default ({len(DEFAULT_INDICES)} indices)")
+    if args.time_budget:
+        print(f"⏱  Time Budget: {args.time_budget:g} min of fetching (remainder deferred)")
+    print(f"⚡ Fetch Workers: {args.workers} (≤{args.rate:g} req/s, ≤{args.host_concurrency} per host)")
+    if args.price_only:
+        print(f"📈 Series: Price only (valuation call skipped)")
+    print(f"🧩 Range Chunking: {args.chunk} windows ({WINDOW_WORKERS} in parallel per index)")
+    if RESPONSE_CACHE is not None:
+        print(f"🗄  Response Cache: {args.cache_dir} (≤{args.cache_max_mb:g} MB, today's TTL {args.cache_ttl:g} min)")
+    else:
+        print(f"🗄  Response Cache: disabled")
+    print(f"📤 Upload: {UPLOAD_IN_FLIGHT} batches in flight, adaptive from {UPLOAD_BATCH_SIZE} rows"
+          f"{', streaming per index' if args.stream else ''}")
+    print(f"🔌 Connections: keep-alive pools (NSE ≤{NSE_POOL_SIZE}, Supabase ≤{SUPABASE_POOL_SIZE} per host"
+          f"{', HTTP/2' if USE_HTTP2 else ''})"
+          f"{' - HTTP/2 unavailable, install httpx and h2' if args.http2 and not USE_HTTP2 else ''}")
     print(f"💾 Update Strategy: Incremental (fetch only new data since last run)")
-    print(f"🔄 Error Recovery: 4-tier fallback system with automatic retry")
+    if args.no_rollups:
+        print(f"📈 Chart Rollups: disabled")
+    else:
+        print(f"📈 Chart Rollups: weekly/monthly OHLC + {LTTB_POINTS}-point downsample, affected periods only"
+              f"{' (full rebuild)' if args.rebuild_rollups else ''}")
+    if args.export_history:
+        print(f"🗃  Local History: {args.export_history} (memory-mapped, merged after each sync)")
+    if journal is None:
+        print(f"📓 Checkpoint Journal: disabled")
+    elif interrupted:
+        print(f"📓 Checkpoint Journal: resuming the run begun {interrupted.get('at', 'earlier')} "
+              f"({len(journal.windows)} windows, {len(journal.uploads)} write sets journaled)")
+    else:
+        print(f"📓 Checkpoint Journal: {JOURNAL_DIR}{' (no interrupted run to resume)' if args.resume else ''}")
+    print(f"🔄 Error Recovery: missing windows retried with backoff for ≤{args.retry_budget:g}s"
+          f"{f', circuit breaker after {args.breaker_threshold} failures' if args.breaker_threshold > 0 else ''}")
+    print(f"📏 Metrics: {args.metrics_file}"
+          f"{f', Prometheus textfile {args.prometheus_file}' if args.prometheus_file else ''}"
+          f"{f', cProfile → {args.profile}' if args.profile else ''}")
     print(f"{'='*70}")
 
-    # Execute the main data processing
-    update_supabase_table(start_date, end_date, specific_indices)
+    # Every exit below (gap audit, fast path, full sync or an error) ends in the same report
+    PROFILER.enabled = bool(args.profile)
+    try:
+        # Gap audit replaces the incremental sync for this run
+        if args.audit_gaps:
+            PROFILER.wrap(audit_gaps)(start_date, specific_indices, universe=args.universe,
+                                      price_only=args.price_only, repair=args.audit_gaps == 'repair',
+                                      bridge_sessions=max(args.gap_bridge, 0),
+                                      refresh_rollups=not args.no_rollups, refresh_summary=not args.no_summary,
+                                      history_dir=args.export_history)
+            return
+
+        # Exit before loading pandas/nsepython/supabase when the last run already synced everything
+        first_export = args.export_history and not HistoryIndex.exists(args.export_history)
+        if not args.no_fast_path and not args.rebuild_stats and not args.rebuild_rollups and not first_export:
+            if specific_indices:
+                probe_indices = specific_indices
+            elif args.universe == 'all':
+                probe_indices = get_equity_indices()
+            else:
+                probe_indices = DEFAULT_INDICES
+            if PROFILER.wrap(nothing_to_do)(probe_indices, end_date):
+                if interrupted:
+                    # Everything the interrupted run was after is stored by now
+                    journal.commit()
+                return
+
+        if journal is not None:
+            journal.begin({'start_date': start_date, 'end_date': end_date, 'indices': specific_indices,
+                           'universe': args.universe, 'price_only': args.price_only}, resume=bool(interrupted))
+            JOURNAL = journal
 
+        # Execute the main data processing (profiled on every thread with --profile)
+        PROFILER.wrap(update_supabase_table)(start_date, end_date, specific_indices, workers=args.workers,
+                              price_only=args.price_only, stream=args.stream,
+                              refresh_summary=not args.no_summary, rebuild_stats=args.rebuild_stats,
+                              universe=args.universe,
+                              time_budget=args.time_budget * 60 if args.time_budget else None,
+                              retry_budget=max(args.retry_budget, 0),
+                              refresh_rollups=not args.no_rollups, rebuild_rollups=args.rebuild_rollups,
+                              history_dir=args.export_history)
+    finally:
+        write_run_report(args)
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
@@ -0,0 +1,54 @@
+"""
+Deferred imports for heavy dependencies.
+
+pandas, numpy, nsepython and supabase together take a few seconds to import,
+which dominates a run that turns out to have nothing to do. Modules bind them
+with lazy_import() instead of `import`, and the real import happens on first
+attribute access:
+
+    pd = lazy_import('pandas')   # nothing imported yet
+    pd.DataFrame()               # pandas imported here
+
+Modules using this should also enable `from __future__ import annotations` so
+annotations like `pd.DataFrame` are not evaluated at definition time.
+"""
+
+import importlib
+import sys
+import types
+
+
+class LazyModule(types.ModuleType):
+    """Module proxy that imports the real module on first attribute access."""
+
+    def __init__(self, name: str):
+        super().__init__(name)
+        self.__dict__['_module'] = None
+
+    def _load(self):
+        module = self.__dict__['_module']
+        if module is None:
+            # import_module is thread-safe and idempotent, so racing threads get the same module
+            module = importlib.import_module(self.__name__)
+            self.__dict__['_module'] = module
+        return module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __dir__(self):
+        return dir(self._load())
+
+    def __repr__(self) -> str:
+        state = 'loaded' if self.__dict__['_module'] is not None else 'not loaded'
+        return f"<lazy module '{self.__name__}' ({state})>"
+
+
+def lazy_import(name: str):
+    """Return the module if it is already imported, otherwise a LazyModule proxy."""
+    return sys.modules.get(name) or LazyModule(name)
+
+
+def is_loaded(name: str) -> bool:
+    """True if the named module has really been imported."""
+    return name in sys.modules
@@ -0,0 +1,62 @@
+"""
+Per-symbol market summary computed after each sync.
+
+The market-status page used to download every daily row of every index to
+derive a handful of numbers per symbol. These now come from the incremental
+rolling-statistics engine (rolling_stats.py) and are upserted into a small
+summary table, one row per index:
+
+    create table index_summary (
+        symbol        text primary key,
+        as_of         date not null,
+        close         double precision,
+        pe            double precision,
+        change_1d     double precision,
+        change_1w     double precision,
+        ath           double precision,
+        dist_from_ath double precision,
+        median_pe_5y  double precision,
+        updated_at    timestamptz not null default now()
+    );
+    alter table index_summary enable row level security;
+    create policy "public read" on index_summary for select using (true);
+
+Metric definitions match what the page computed in the browser:
+    change_1d      % change of close vs. the previous trading day
+    change_1w      % change of close vs. the last close on or before as_of - 7 days
+                   (falling back to the oldest retained close)
+    ath            highest high (close where high is missing) over all history
+    dist_from_ath  % below the all-time high
+    median_pe_5y   median PE over the five years up to as_of
+"""
+
+from __future__ import annotations
+
+from lazy_imports import lazy_import
+
+pd = lazy_import('pandas')
+
+SUMMARY_TABLE = 'index_summary'
+
+SUMMARY_COLUMNS = ['symbol', 'as_of', 'close', 'pe', 'change_1d', 'change_1w',
+                   'ath', 'dist_from_ath', 'median_pe_5y']
+
+
+def build_summary_frame(snapshots: list) -> pd.DataFrame:
+    """
+    Shape rolling-statistics snapshots into summary table rows.
+
+    Args:
+        snapshots (list): Dicts from RollingStatsEngine.snapshots()
+
+    Returns:
+        pd.DataFrame: SUMMARY_COLUMNS, one row per symbol. Missing changes and
+                      ATH distance default to 0 as on the page; a missing PE
+                      median stays null.
+    """
+    if not snapshots:
+        return pd.DataFrame(columns=SUMMARY_COLUMNS)
+    df = pd.DataFrame(snapshots).rename(columns={'median_pe': 'median_pe_5y'})
+    for col in ['change_1d', 'change_1w', 'dist_from_ath']:
+        df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0.0)
+    return df.reindex(columns=SUMMARY_COLUMNS)
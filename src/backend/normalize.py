@@ -0,0 +1,176 @@
+"""
+Columnar normalization of raw nsepython frames.
+
+index_history / index_pe_pb_div return every cell as a string ('1,234.50',
+'-' for missing) with dates like '03 Jul 1990'. Normalizing them with
+`astype(str).str.replace(...)` and a full `to_datetime` costs a Python
+round-trip per cell, and most of the date strings repeat across indices and
+across the price and valuation series.
+
+The kernel here normalizes one raw frame (one fetched window) and:
+
+    - parses each value column in one pass, with Arrow string kernels when
+      pyarrow is installed (columns that are already numeric are taken as-is,
+      without a string round-trip),
+    - parses each distinct date string once and memoizes it across calls,
+    - returns a frame with a categorical `symbol`.
+
+float32_safe() decides which value columns SeriesStore may keep as float32.
+"""
+
+from __future__ import annotations
+
+import importlib.util
+import threading
+
+from lazy_imports import lazy_import
+
+np = lazy_import('numpy')
+pd = lazy_import('pandas')
+
+RAW_DATE_FORMAT = '%d %b %Y'
+
+# Output column -> raw nsepython column, per series
+PRICE_SCHEMA = {'date': 'HistoricalDate', 'open': 'OPEN', 'high': 'HIGH', 'low': 'LOW', 'close': 'CLOSE'}
+VALUATION_SCHEMA = {'date': 'DATE', 'pe': 'pe', 'pb': 'pb', 'div_yield': 'divYield'}
+
+# Decimal places a float32 column must reproduce exactly to count as safe
+FLOAT32_DECIMALS = 4
+
+# Distinct date strings kept per format before the memo is reset (~250 per year)
+DATE_MEMO_LIMIT = 50_000
+
+# Probe for pyarrow without importing it (it takes ~0.5 s)
+HAS_ARROW = importlib.util.find_spec('pyarrow') is not None
+
+# Plain decimal number once thousands separators are stripped; anything else is missing
+NUMBER_PATTERN = r'^[+-]?(\d+(\.\d*)?|\.\d+)([eE][+-]?\d+)?$'
+
+_date_memo = {}
+_date_memo_lock = threading.Lock()
+
+
+def _is_numeric(values) -> bool:
+    return pd.api.types.is_numeric_dtype(values.dtype) and not pd.api.types.is_bool_dtype(values.dtype)
+
+
+def _parse_text_arrow(column):
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    try:
+        text = pa.array(column, type=pa.string(), from_pandas=True)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        # Mixed object column (e.g. strings and floats): stringify the odd cells
+        text = pa.array(column.astype(str), type=pa.string())
+    text = pc.utf8_trim_whitespace(pc.replace_substring(text, ',', ''))
+    text = pc.if_else(pc.match_substring_regex(text, NUMBER_PATTERN), text, pa.scalar(None, pa.string()))
+    return pc.cast(text, pa.float64()).to_numpy(zero_copy_only=False)
+
+
+def _parse_text_numpy(column):
+    text = np.asarray(column, dtype=object).copy()
+    missing = pd.isna(text)
+    text[missing] = ''
+    text = np.char.replace(text.astype(str), ',', '')
+    return pd.to_numeric(pd.Series(text, copy=False), errors='coerce').to_numpy(dtype=np.float64)
+
+
+def parse_numeric(column):
+    """
+    Parse one raw value column.
+
+    Args:
+        column (pd.Series): Raw cells (strings with thousands separators, or numbers)
+
+    Returns:
+        np.ndarray: float64 values, NaN where missing or unparseable
+    """
+    if _is_numeric(column):
+        return column.to_numpy(dtype=np.float64, na_value=np.nan)
+    return _parse_text_arrow(column) if HAS_ARROW else _parse_text_numpy(column)
+
+
+def parse_dates(column, fmt: str = RAW_DATE_FORMAT):
+    """
+    Parse one raw date column, once per distinct string across calls.
+
+    Args:
+        column (pd.Series): Date strings
+        fmt (str): strptime format of the strings
+
+    Returns:
+        np.ndarray: datetime64[ns] values (NaT where missing)
+
+    Raises:
+        ValueError: If a present date string does not match fmt
+    """
+    codes, uniques = pd.factorize(np.asarray(column, dtype=object))
+    with _date_memo_lock:
+        memo = _date_memo.setdefault(fmt, {})
+        missing = [text for text in uniques if text not in memo]
+        if missing:
+            if len(memo) + len(missing) > DATE_MEMO_LIMIT:
+                memo.clear()
+            parsed = pd.to_datetime(pd.Index(missing, dtype=object), format=fmt)
+            memo.update(zip(missing, parsed.to_numpy(dtype='datetime64[ns]')))
+        lookup = np.array([memo[text] for text in uniques], dtype='datetime64[ns]')
+
+    dates = lookup[np.maximum(codes, 0)] if len(lookup) else np.full(len(codes), np.datetime64('NaT'), dtype='datetime64[ns]')
+    dates[codes < 0] = np.datetime64('NaT')
+    return dates
+
+
+def float32_safe(values, decimals: int = FLOAT32_DECIMALS) -> bool:
+    """
+    True if float64 values survive a round trip through float32 at `decimals` places.
+
+    That is the case when all values have at most `decimals` decimal places and
+    rounding the float32 copy back to `decimals` places restores every value.
+    """
+    finite = values[np.isfinite(values)]
+    if not np.array_equal(np.round(finite, decimals), finite):
+        return False
+    return np.array_equal(np.round(finite.astype(np.float32).astype(np.float64), decimals), finite)
+
+
+def normalize_frame(symbol: str, raw: pd.DataFrame, schema: dict, required: str = None) -> pd.DataFrame:
+    """
+    Normalize a raw frame of one series.
+
+    Args:
+        symbol (str): Index the frame belongs to
+        raw (pd.DataFrame): Raw nsepython frame
+        schema (dict): Output column -> raw column (PRICE_SCHEMA or VALUATION_SCHEMA);
+                       must contain 'date'
+        required (str, optional): Drop rows where this output column is missing
+
+    Returns:
+        pd.DataFrame: Columns [date, symbol, *value columns] in raw order, with a
+                      categorical symbol
+    """
+    value_columns = [col for col in schema if col != 'date']
+    if raw is None or raw.empty:
+        return pd.DataFrame(columns=['date', 'symbol', *value_columns])
+
+    data = {
+        'date': parse_dates(raw[schema['date']]),
+        'symbol': pd.Categorical.from_codes(np.zeros(len(raw), dtype=np.int32), categories=[symbol]),
+    }
+    for col in value_columns:
+        data[col] = parse_numeric(raw[schema[col]]) if schema[col] in raw else np.full(len(raw), np.nan)
+    frame = pd.DataFrame(data)
+
+    if required is not None:
+        frame = frame[frame[required].notna().to_numpy()].reset_index(drop=True)
+    return frame
+
+
+def normalize_price(symbol: str, raw: pd.DataFrame) -> pd.DataFrame:
+    """Normalize a raw index_history frame to [date, symbol, open, high, low, close], dropping rows without a close."""
+    return normalize_frame(symbol, raw, PRICE_SCHEMA, required='close')
+
+
+def normalize_valuation(symbol: str, raw: pd.DataFrame) -> pd.DataFrame:
+    """Normalize a raw index_pe_pb_div frame to [date, symbol, pe, pb, div_yield]."""
+    return normalize_frame(symbol, raw, VALUATION_SCHEMA)
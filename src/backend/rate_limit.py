@@ -0,0 +1,118 @@
+"""
+Request throttling primitives shared by the NSE fetch workers.
+
+A global token bucket bounds the request rate across all worker threads, and
+per-host semaphores cap how many requests are in flight against the same host.
+Together they let the fetcher run indices in parallel without tripping NSE's
+throttling.
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+from urllib.parse import urlparse
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket rate limiter.
+
+    Tokens refill continuously at `rate` per second up to `capacity`. Each request
+    takes one token and blocks until one is available, so short bursts up to
+    `capacity` are allowed while the sustained rate stays at `rate`.
+
+    Args:
+        rate (float): Tokens added per second. A rate <= 0 disables limiting.
+        capacity (float): Maximum burst size
+    """
+
+    def __init__(self, rate: float, capacity: float = 1.0):
+        self.rate = rate
+        self.capacity = max(capacity, 1.0)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens: float = 1.0) -> float:
+        """
+        Block until `tokens` are available and consume them.
+
+        Returns:
+            float: Seconds spent waiting
+        """
+        if self.rate <= 0:
+            return 0.0
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return waited
+                delay = (tokens - self._tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+
+class HostLimiter:
+    """
+    Per-host concurrency caps.
+
+    Each host gets its own semaphore, sized from `caps` or `default_cap`, so one
+    slow host cannot be flooded by every worker at once.
+
+    Args:
+        default_cap (int): Concurrent requests allowed per host unless overridden
+        caps (dict, optional): host -> cap overrides
+    """
+
+    def __init__(self, default_cap: int = 2, caps: dict = None):
+        self.default_cap = max(default_cap, 1)
+        self.caps = dict(caps or {})
+        self._semaphores = {}
+        self._lock = threading.Lock()
+
+    def _semaphore(self, host: str) -> threading.Semaphore:
+        with self._lock:
+            if host not in self._semaphores:
+                self._semaphores[host] = threading.BoundedSemaphore(self.caps.get(host, self.default_cap))
+            return self._semaphores[host]
+
+    @contextmanager
+    def slot(self, host: str):
+        """Hold one concurrency slot for `host` for the duration of the block."""
+        semaphore = self._semaphore(host)
+        semaphore.acquire()
+        try:
+            yield
+        finally:
+            semaphore.release()
+
+
+class UpstreamGate:
+    """
+    Combined gate every upstream request passes through.
+
+    Acquires a per-host slot first and then a rate token, so waiting for the
+    rate limit never holds more than the host's allowed number of slots.
+
+    Args:
+        rate (float): Global requests per second across all hosts (<= 0 disables)
+        burst (float): Token bucket capacity
+        host_cap (int): Default concurrent requests per host
+        host_caps (dict, optional): host -> cap overrides
+    """
+
+    def __init__(self, rate: float = 0.0, burst: float = 1.0, host_cap: int = 2, host_caps: dict = None):
+        self.bucket = TokenBucket(rate, burst)
+        self.hosts = HostLimiter(host_cap, host_caps)
+
+    @contextmanager
+    def request(self, host_or_url: str):
+        """Enter before issuing a request to `host_or_url` and exit once it completes."""
+        host = urlparse(host_or_url).hostname or host_or_url
+        with self.hosts.slot(host):
+            self.bucket.acquire()
+            yield
@@ -0,0 +1,77 @@
+"""
+Vectorized record serialization for Supabase/PostgREST uploads.
+
+Frames are converted column by column: null masks and ISO date formatting are
+computed once per column with NumPy instead of once per cell in Python, and
+the resulting rows are encoded to compact JSON bytes with orjson when it is
+installed (falling back to the standard library encoder).
+"""
+
+from __future__ import annotations
+
+import json
+
+from lazy_imports import lazy_import
+
+np = lazy_import('numpy')
+pd = lazy_import('pandas')
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+JSON_ENCODER = 'orjson' if orjson is not None else 'json'
+
+
+def _column_values(series: pd.Series) -> list:
+    """
+    Convert one column to a list of JSON-ready Python values.
+
+    Datetime columns become 'YYYY-MM-DD' strings, numeric columns become Python
+    floats/ints, and every missing value (NaN/NaT/None) becomes None.
+    """
+    mask = series.isna().to_numpy()
+    if pd.api.types.is_datetime64_any_dtype(series):
+        values = np.datetime_as_string(series.to_numpy(dtype='datetime64[D]'), unit='D').astype(object)
+    else:
+        values = series.to_numpy(dtype=object)
+    if mask.any():
+        values = values.copy()
+        values[mask] = None
+    return values.tolist()
+
+
+def serialize_records(df: pd.DataFrame) -> list:
+    """
+    Convert a DataFrame to a list of JSON-ready record dicts.
+
+    Equivalent to df.to_dict(orient='records') followed by per-cell NaN -> None
+    and date -> 'YYYY-MM-DD' conversion, but done column-wise.
+
+    Args:
+        df (pd.DataFrame): Frame to serialize
+
+    Returns:
+        list: One dict per row
+    """
+    if df.empty:
+        return []
+    columns = [str(col) for col in df.columns]
+    arrays = [_column_values(df[col]) for col in df.columns]
+    return [dict(zip(columns, row)) for row in zip(*arrays)]
+
+
+def encode_json(payload) -> bytes:
+    """
+    Encode a payload to compact JSON bytes using the fastest available encoder.
+
+    Args:
+        payload: JSON-serializable object (typically a list of record dicts)
+
+    Returns:
+        bytes: UTF-8 JSON without insignificant whitespace
+    """
+    if orjson is not None:
+        return orjson.dumps(payload)
+    return json.dumps(payload, separators=(',', ':'), allow_nan=False).encode('utf-8')
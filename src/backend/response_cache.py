@@ -0,0 +1,204 @@
+"""
+On-disk cache of normalized upstream frames for the NSE index fetcher.
+
+Entries are keyed by (index, series, date window) and stored as Parquet when a
+Parquet engine (pyarrow/fastparquet) is installed, falling back to pickle
+otherwise. Windows that had already closed when their entry was written never
+change upstream, so those entries are kept until evicted; an entry written
+while its window still included that day (possibly with partial data, e.g.
+prices before PE/PB are published) is only trusted for a short TTL. The
+directory is bounded by size with least-recently-used eviction.
+
+File timestamps carry the bookkeeping: mtime is the write time (used for the
+TTL) and atime is bumped explicitly on every hit (used for LRU order).
+"""
+
+from __future__ import annotations
+
+import importlib.util
+import os
+import re
+import threading
+import time
+from datetime import datetime
+
+from lazy_imports import lazy_import
+
+pd = lazy_import('pandas')
+
+# Probe for a Parquet engine without importing it (pyarrow alone takes ~0.5 s)
+if any(importlib.util.find_spec(engine) for engine in ('pyarrow', 'fastparquet')):
+    CACHE_FORMAT = 'parquet'
+else:
+    CACHE_FORMAT = 'pickle'
+
+CACHE_SUFFIXES = ('.parquet', '.pkl')
+
+
+def _parse_window_date(value) -> datetime:
+    """Parse a DD-MMM-YYYY (nsepython) or YYYY-MM-DD date."""
+    if isinstance(value, datetime):
+        return value
+    for fmt in ('%d-%b-%Y', '%Y-%m-%d'):
+        try:
+            return datetime.strptime(str(value), fmt)
+        except ValueError:
+            continue
+    return pd.Timestamp(value).to_pydatetime()
+
+
+class ResponseCache:
+    """
+    Size-bounded LRU cache of normalized frames with TTL for open windows.
+
+    Args:
+        cache_dir (str): Directory holding cache files (created on demand)
+        max_bytes (int): Total size the directory is trimmed to after writes
+        ttl_seconds (float): Lifetime of entries written while their window was still open
+    """
+
+    def __init__(self, cache_dir: str, max_bytes: int = 256 * 1024 * 1024, ttl_seconds: float = 1800):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.suffix = '.parquet' if CACHE_FORMAT == 'parquet' else '.pkl'
+        self._lock = threading.Lock()
+        self.counters = {'hits': 0, 'misses': 0, 'expired': 0, 'writes': 0,
+                         'evictions': 0, 'errors': 0, 'bytes_read': 0, 'bytes_written': 0}
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _count(self, name: str, amount: int = 1) -> None:
+        with self._lock:
+            self.counters[name] += amount
+
+    def _path(self, index_name: str, series: str, start_date, end_date) -> str:
+        slug = re.sub(r'[^A-Za-z0-9]+', '_', index_name).strip('_').upper()
+        start = _parse_window_date(start_date).strftime('%Y%m%d')
+        end = _parse_window_date(end_date).strftime('%Y%m%d')
+        return os.path.join(self.cache_dir, f"{slug}__{series}__{start}_{end}{self.suffix}")
+
+    def is_closed(self, end_date, written_at: float = None) -> bool:
+        """
+        True when the window had ended before the day an entry was written
+        (default: now), so the entry holds final upstream data.
+
+        Args:
+            end_date: Window end (DD-MMM-YYYY or YYYY-MM-DD)
+            written_at (float, optional): Entry write time as a Unix timestamp
+        """
+        written = datetime.fromtimestamp(written_at) if written_at is not None else datetime.now()
+        return _parse_window_date(end_date).date() < written.date()
+
+    def get(self, index_name: str, series: str, start_date, end_date):
+        """
+        Return the cached frame for a window, or None on miss/expiry/corruption.
+        """
+        path = self._path(index_name, series, start_date, end_date)
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            self._count('misses')
+            return None
+
+        # Closedness is judged at write time: an entry cached while its window still
+        # included that day may lack late series (e.g. PE/PB) and must expire
+        if not self.is_closed(end_date, stat.st_mtime) and time.time() - stat.st_mtime > self.ttl_seconds:
+            self._count('expired')
+            self._count('misses')
+            return None
+
+        try:
+            df = pd.read_parquet(path) if path.endswith('.parquet') else pd.read_pickle(path)
+        except Exception:
+            self._count('errors')
+            self._count('misses')
+            self._remove(path)
+            return None
+
+        # Record the access for LRU ordering while keeping mtime as write time
+        try:
+            os.utime(path, (time.time(), stat.st_mtime))
+        except OSError:
+            pass
+        self._count('hits')
+        self._count('bytes_read', stat.st_size)
+        return df
+
+    def put(self, index_name: str, series: str, start_date, end_date, df: pd.DataFrame) -> None:
+        """
+        Store a normalized frame for a window. Empty frames are never cached
+        since they cannot be told apart from transient upstream failures.
+        """
+        if df is None or df.empty:
+            return
+        path = self._path(index_name, series, start_date, end_date)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            if self.suffix == '.parquet':
+                df.to_parquet(tmp_path, index=False)
+            else:
+                df.to_pickle(tmp_path)
+            os.replace(tmp_path, path)
+            self._count('writes')
+            self._count('bytes_written', os.path.getsize(path))
+        except Exception as e:
+            self._count('errors')
+            self._remove(tmp_path)
+            print(f"  ⚠ Cache write failed for {index_name} ({series}): {e}")
+            return
+        self.evict()
+
+    def _remove(self, path: str) -> None:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def _entries(self) -> list:
+        entries = []
+        with os.scandir(self.cache_dir) as it:
+            for entry in it:
+                if entry.is_file() and entry.name.endswith(CACHE_SUFFIXES):
+                    stat = entry.stat()
+                    entries.append((stat.st_atime, stat.st_size, entry.path))
+        return entries
+
+    def evict(self) -> int:
+        """
+        Delete least-recently-used entries until the cache fits in max_bytes.
+
+        Returns:
+            int: Number of entries removed
+        """
+        with self._lock:
+            entries = sorted(self._entries())
+            total = sum(size for _, size, _ in entries)
+            removed = 0
+            for _, size, path in entries:
+                if total <= self.max_bytes:
+                    break
+                self._remove(path)
+                total -= size
+                removed += 1
+            self.counters['evictions'] += removed
+            return removed
+
+    def stats(self) -> dict:
+        """Run counters plus current entry count and on-disk size."""
+        entries = self._entries()
+        stats = dict(self.counters)
+        stats['entries'] = len(entries)
+        stats['bytes'] = sum(size for _, size, _ in entries)
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = stats['hits'] / lookups if lookups else 0.0
+        return stats
+
+    def print_stats(self) -> None:
+        """Print a human-readable cache report."""
+        stats = self.stats()
+        print(f"\n🗄  RESPONSE CACHE ({self.cache_dir}, {CACHE_FORMAT}):")
+        print(f"   Hits: {stats['hits']}  Misses: {stats['misses']}  "
+              f"(expired: {stats['expired']})  Hit rate: {stats['hit_rate']:.0%}")
+        print(f"   Writes: {stats['writes']}  Evictions: {stats['evictions']}  Errors: {stats['errors']}")
+        print(f"   Entries: {stats['entries']}  Size: {stats['bytes'] / 1024 / 1024:.1f} MB "
+              f"of {self.max_bytes / 1024 / 1024:.0f} MB")
@@ -0,0 +1,334 @@
+"""
+Retry policy for upstream NSE fetches.
+
+Failures are classified before deciding what to do with them:
+
+    throttled     HTTP 429/503 or a rate-limit message: back off hard
+    network       connection resets, timeouts, 5xx: back off and retry
+    parse         upstream answered with something that is not the expected
+                  payload (typically an HTML block page): retry once
+    empty         the call succeeded but returned no rows: retry once, later
+    circuit_open  the host's circuit breaker is open: wait for it to close
+    other         anything else: retry once
+
+Delays grow exponentially with equal jitter, so concurrent retries spread out
+instead of arriving together. A per-host circuit breaker opens after a run of
+consecutive failures and fails further requests fast until a cooldown has
+passed, then lets a single probe through.
+
+RetryScheduler holds the exact date windows that still need fetching, per
+index, and hands them out in due order. Windows that exhaust their attempts
+(or are still waiting when the retry budget runs out) are reported as
+deferred, so the caller can carry them over to the next run.
+"""
+
+import random
+import re
+import threading
+import time
+from contextlib import contextmanager
+
+# Error kind -> (retries granted to a failed window, multiplier of the base delay)
+RETRY_POLICY = {
+    'throttled': (4, 4.0),
+    'network': (3, 1.0),
+    'parse': (1, 1.0),
+    'empty': (1, 2.0),
+    'circuit_open': (3, 1.0),
+    'other': (1, 1.0),
+}
+
+# Kinds worth retrying immediately (with backoff) inside a fetch, rather than
+# only from the retry pass at the end of the run
+TRANSIENT_KINDS = ('throttled', 'network')
+
+# Kinds that count against a host's circuit breaker (empty answers and parse
+# errors of a single payload say nothing about the host's health)
+BREAKER_KINDS = ('throttled', 'network')
+
+# Upper bound of a single backoff delay in seconds
+MAX_DELAY = 60.0
+
+THROTTLE_STATUS = (429, 503)
+THROTTLE_PATTERN = re.compile(r'\b429\b|too many requests|rate.?limit|throttl', re.IGNORECASE)
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of issuing a request while a host's circuit breaker is open."""
+
+    def __init__(self, host: str, retry_after: float):
+        super().__init__(f"circuit open for {host}, retry in {retry_after:.1f}s")
+        self.host = host
+        self.retry_after = retry_after
+
+
+def classify_error(exc: BaseException) -> str:
+    """
+    Classify an upstream failure into one of the RETRY_POLICY kinds.
+
+    The exception and its chain of causes are inspected, so wrapped errors
+    (e.g. an UpstreamFetchError raised from a requests error) classify by their root.
+    """
+    seen = set()
+    while exc is not None and id(exc) not in seen:
+        seen.add(id(exc))
+        if isinstance(exc, CircuitOpenError):
+            return 'circuit_open'
+        kind = getattr(exc, 'kind', None)
+        if kind in RETRY_POLICY:
+            return kind
+        status = getattr(getattr(exc, 'response', None), 'status_code', None)
+        if status in THROTTLE_STATUS:
+            return 'throttled'
+        if status is not None and status >= 500:
+            return 'network'
+        if THROTTLE_PATTERN.search(str(exc)):
+            return 'throttled'
+        # requests' exceptions derive from OSError, like socket errors and timeouts
+        if isinstance(exc, (OSError, TimeoutError)):
+            return 'network'
+        if isinstance(exc, (ValueError, KeyError, IndexError, TypeError)):
+            return 'parse'
+        exc = exc.__cause__ or exc.__context__
+    return 'other'
+
+
+def backoff_delay(attempt: int, base: float, cap: float = MAX_DELAY, rng=random) -> float:
+    """
+    Exponential backoff with equal jitter.
+
+    Args:
+        attempt (int): Failed attempts so far, starting at 0
+        base (float): Delay of the first retry before jitter
+        cap (float): Largest delay before jitter
+
+    Returns:
+        float: Seconds to wait, uniformly drawn from [d/2, d] with d = min(cap, base * 2**attempt)
+    """
+    ceiling = min(cap, base * 2 ** attempt)
+    return ceiling / 2 + rng.uniform(0, ceiling / 2)
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker for one host.
+
+    Args:
+        threshold (int): Consecutive failures that open the circuit
+        cooldown (float): Seconds the circuit stays open before a probe is allowed
+    """
+
+    def __init__(self, threshold: int = 5, cooldown: float = 30.0):
+        self.threshold = max(threshold, 1)
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+        self.trips = 0
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return 'closed'
+        return 'half_open' if self.probing else 'open'
+
+    def retry_after(self) -> float:
+        """Seconds until the next request is allowed (0 if one is allowed now)."""
+        if self.opened_at is None:
+            return 0.0
+        return max(0.0, self.opened_at + self.cooldown - time.monotonic())
+
+    def allow(self) -> bool:
+        """True if a request may be issued; after the cooldown, admits one probe at a time."""
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            if self.probing or time.monotonic() < self.opened_at + self.cooldown:
+                return False
+            self.probing = True
+            return True
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self.probing = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            if self.probing or (self.opened_at is None and self.failures >= self.threshold):
+                if not self.probing:
+                    self.trips += 1
+                self.opened_at = time.monotonic()
+                self.probing = False
+
+    def release_probe(self) -> None:
+        """Give the probe slot back when the probe ended without a verdict on the host."""
+        with self._lock:
+            self.probing = False
+
+
+class HostBreakers:
+    """
+    One CircuitBreaker per host, created on first use.
+
+    Args:
+        threshold (int): Consecutive failures that open a host's circuit (<= 0 disables)
+        cooldown (float): Seconds a circuit stays open before a probe
+    """
+
+    def __init__(self, threshold: int = 5, cooldown: float = 30.0):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self._breakers = {}
+        self._lock = threading.Lock()
+
+    def breaker(self, host: str) -> CircuitBreaker:
+        with self._lock:
+            if host not in self._breakers:
+                self._breakers[host] = CircuitBreaker(self.threshold, self.cooldown)
+            return self._breakers[host]
+
+    @property
+    def trips(self) -> int:
+        return sum(breaker.trips for breaker in self._breakers.values())
+
+    @contextmanager
+    def guard(self, host: str):
+        """
+        Wrap one request to `host`: fail fast while its circuit is open and
+        record the outcome otherwise.
+
+        Raises:
+            CircuitOpenError: If the host's circuit is open
+        """
+        if self.threshold <= 0:
+            yield
+            return
+        breaker = self.breaker(host)
+        if not breaker.allow():
+            raise CircuitOpenError(host, breaker.retry_after())
+        try:
+            yield
+        except Exception as exc:
+            if classify_error(exc) in BREAKER_KINDS:
+                breaker.record_failure()
+            elif breaker.probing:
+                breaker.release_probe()
+            raise
+        breaker.record_success()
+
+
+class RetryTask:
+    """One date window of one index awaiting a retry."""
+
+    __slots__ = ('index_name', 'start', 'end', 'kind', 'attempts', 'due')
+
+    def __init__(self, index_name: str, start: str, end: str, kind: str, due: float):
+        self.index_name = index_name
+        self.start = start
+        self.end = end
+        self.kind = kind
+        self.attempts = 0
+        self.due = due
+
+    def to_list(self) -> list:
+        return [self.start, self.end, self.kind]
+
+
+class RetryScheduler:
+    """
+    Due-ordered queue of missing windows with per-kind attempt limits and backoff.
+
+    Args:
+        base_delay (float): Delay of a first retry before the kind's multiplier and jitter
+        policy (dict, optional): Overrides RETRY_POLICY
+        rng (random.Random, optional): Jitter source (seeded in tests and benchmarks)
+    """
+
+    def __init__(self, base_delay: float = 2.0, policy: dict = None, rng=None):
+        self.base_delay = base_delay
+        self.policy = dict(RETRY_POLICY, **(policy or {}))
+        self.rng = rng or random.Random()
+        self.tasks = []
+        self.deferred = []
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.tasks)
+
+    def add(self, index_name: str, start: str, end: str, kind: str = 'other', delay: float = None) -> None:
+        """
+        Queue a window for a retry (thread-safe). An identical queued window is not added twice.
+
+        Args:
+            index_name (str): Index the window belongs to
+            start (str): Window start (DD-MMM-YYYY)
+            end (str): Window end (DD-MMM-YYYY)
+            kind (str): Error kind that made the window fail
+            delay (float, optional): Seconds until it is due (default: the kind's first backoff)
+        """
+        if delay is None:
+            delay = self._delay(kind, 0)
+        with self._lock:
+            if any(t.index_name == index_name and t.start == start and t.end == end for t in self.tasks):
+                return
+            self.tasks.append(RetryTask(index_name, start, end, kind, time.monotonic() + delay))
+
+    def _delay(self, kind: str, attempt: int) -> float:
+        _, multiplier = self.policy.get(kind, self.policy['other'])
+        return backoff_delay(attempt, self.base_delay * multiplier, rng=self.rng)
+
+    def drain(self, deadline: float = None):
+        """
+        Yield queued tasks in due order, sleeping until each is due.
+
+        Stops when the queue is empty or the next task would only be due after
+        `deadline` (a time.monotonic() value). Report each yielded task back
+        with failed() or drop it on success.
+        """
+        while True:
+            with self._lock:
+                if not self.tasks:
+                    return
+                task = min(self.tasks, key=lambda t: t.due)
+                if deadline is not None and task.due >= deadline:
+                    return
+                self.tasks.remove(task)
+            wait = task.due - time.monotonic()
+            if wait > 0:
+                time.sleep(wait)
+            yield task
+
+    def failed(self, task: RetryTask, kind: str, retry_after: float = None) -> bool:
+        """
+        Requeue a task that failed again, or defer it once its kind's retries are used up.
+
+        Args:
+            task (RetryTask): Task yielded by drain()
+            kind (str): Error kind of this failure
+            retry_after (float, optional): Earliest retry in seconds (an open circuit's cooldown)
+
+        Returns:
+            bool: True if the task was requeued, False if it was deferred
+        """
+        task.kind = kind
+        task.attempts += 1
+        retries, _ = self.policy.get(kind, self.policy['other'])
+        if task.attempts >= retries:
+            self.deferred.append(task)
+            return False
+        delay = self._delay(kind, task.attempts)
+        task.due = time.monotonic() + max(delay, retry_after or 0.0)
+        with self._lock:
+            self.tasks.append(task)
+        return True
+
+    def outstanding(self) -> dict:
+        """Windows still missing (deferred or never reached): index -> [[start, end, kind], ...]."""
+        windows = {}
+        for task in self.deferred + self.tasks:
+            windows.setdefault(task.index_name, []).append(task.to_list())
+        return windows
@@ -0,0 +1,435 @@
+"""
+Incremental rolling statistics for NSE index history.
+
+Keeps per-symbol running state between sync runs so that daily metrics are
+updated from the new rows only, never by rescanning history:
+
+    - running all-time high (max of high, or close where high is missing)
+    - sliding N-year windows of PE and PB values with order-statistic queries
+      (median, arbitrary quantiles, percentile rank of a value)
+    - a short trailing close series for 1D/1W/1M/1Y returns
+
+Each window keeps its (day, value) entries and its values in two sorted
+containers, so adding a day, expiring the oldest one and revising any day in
+the window cost O(log n) with `sortedcontainers` installed (a bisect-backed
+list, O(n) per insert or removal, is used otherwise). The state is persisted
+as JSON and reloaded on the next run.
+
+Rows for days already applied (upstream revisions, gap-audit backfills) are
+folded in place: they replace or insert values inside the retained close
+series and valuation windows, and can raise the ATH. The one change that
+cannot be applied from the retained state is a revision lowering the day the
+ATH was set on; the symbol is then marked stale so its state is rebuilt from
+stored history.
+"""
+
+import bisect
+import json
+import math
+import os
+from datetime import date, datetime
+
+try:
+    from sortedcontainers import SortedList
+except ImportError:
+    SortedList = None
+
+# Trailing calendar-day horizons for returns ('1d' is the previous trading day)
+RETURN_HORIZONS = {'1w': 7, '1m': 30, '1y': 365}
+
+# Close history retained for returns: the longest horizon plus slack for holidays
+CLOSE_RETENTION_DAYS = max(RETURN_HORIZONS.values()) + 14
+
+STATE_VERSION = 2
+
+
+class _BisectList:
+    """Sorted list fallback with the subset of the SortedList API used here."""
+
+    def __init__(self, values=()):
+        self._values = sorted(values)
+
+    def add(self, value) -> None:
+        bisect.insort(self._values, value)
+
+    def remove(self, value) -> None:
+        i = bisect.bisect_left(self._values, value)
+        if i == len(self._values) or self._values[i] != value:
+            raise ValueError(f"{value} not in list")
+        del self._values[i]
+
+    def bisect_left(self, value) -> int:
+        return bisect.bisect_left(self._values, value)
+
+    def bisect_right(self, value) -> int:
+        return bisect.bisect_right(self._values, value)
+
+    def __getitem__(self, index):
+        return self._values[index]
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+    def __iter__(self):
+        return iter(self._values)
+
+
+def _sorted_list(values=()):
+    return SortedList(values) if SortedList is not None else _BisectList(values)
+
+
+def _is_missing(value) -> bool:
+    return value is None or (isinstance(value, float) and math.isnan(value))
+
+
+def _to_ordinal(value) -> int:
+    if isinstance(value, int):
+        return value
+    if isinstance(value, datetime):
+        return value.date().toordinal()
+    if isinstance(value, date):
+        return value.toordinal()
+    return datetime.strptime(str(value)[:10], '%Y-%m-%d').date().toordinal()
+
+
+class SlidingWindowStats:
+    """
+    Values observed over a trailing window of days, with order statistics.
+
+    Args:
+        span_days (int): Window length; values older than latest - span_days expire
+    """
+
+    def __init__(self, span_days: int):
+        self.span_days = span_days
+        self.entries = _sorted_list()
+        self.values = _sorted_list()
+
+    def push(self, day: int, value: float) -> None:
+        """Add a value observed on `day` (ordinal) and expire values that left the window."""
+        self.entries.add((day, value))
+        self.values.add(value)
+        self.expire(day)
+
+    def expire(self, latest_day: int) -> None:
+        cutoff = latest_day - self.span_days
+        while self.entries and self.entries[0][0] < cutoff:
+            entry = self.entries[0]
+            self.entries.remove(entry)
+            self.values.remove(entry[1])
+
+    def quantile(self, q: float):
+        """Linearly interpolated quantile (q=0.5 is the median), None when empty."""
+        n = len(self.values)
+        if n == 0:
+            return None
+        position = (n - 1) * q
+        lower = int(math.floor(position))
+        upper = min(lower + 1, n - 1)
+        weight = position - lower
+        return self.values[lower] * (1 - weight) + self.values[upper] * weight
+
+    def median(self):
+        return self.quantile(0.5)
+
+    def percentile_of(self, value):
+        """Percent of window values at or below `value`, None when empty."""
+        if not len(self.values) or _is_missing(value):
+            return None
+        return self.values.bisect_right(value) / len(self.values) * 100
+
+    def revise(self, day: int, value, latest_day: int) -> bool:
+        """
+        Replace or insert the value of an already observed day. Missing values
+        (e.g. from a price-only fetch) and days that left the window are ignored.
+
+        Returns:
+            bool: True if the window changed
+        """
+        if _is_missing(value) or day < latest_day - self.span_days:
+            return False
+        i = self.entries.bisect_left((day,))
+        if i < len(self.entries) and self.entries[i][0] == day:
+            current = self.entries[i]
+            if current[1] == value:
+                return False
+            self.entries.remove(current)
+            self.values.remove(current[1])
+        self.entries.add((day, value))
+        self.values.add(value)
+        return True
+
+    def to_list(self) -> list:
+        return [list(entry) for entry in self.entries]
+
+    @classmethod
+    def from_list(cls, span_days: int, entries: list) -> 'SlidingWindowStats':
+        window = cls(span_days)
+        window.entries = _sorted_list((int(day), float(value)) for day, value in entries)
+        window.values = _sorted_list(value for _, value in window.entries)
+        return window
+
+
+class SymbolStats:
+    """
+    Running statistics for one index symbol.
+
+    Args:
+        window_years (int): Length of the PE/PB valuation window
+    """
+
+    def __init__(self, window_years: int = 5):
+        self.window_years = window_years
+        span_days = int(round(365.25 * window_years))
+        self.last_day = None
+        self.ath = None
+        self.ath_day = None
+        self.stale = False
+        self.latest = {}
+        self.pe = SlidingWindowStats(span_days)
+        self.pb = SlidingWindowStats(span_days)
+        self.closes = []
+
+    def apply(self, day: int, high, close, pe=None, pb=None) -> bool:
+        """
+        Fold one daily row into the state. Rows at or before the last applied day
+        are applied as revisions (see revise), so re-feeding unchanged overlapping
+        data is harmless.
+
+        Returns:
+            bool: True if the row changed the state
+        """
+        if _is_missing(close):
+            return False
+        if self.last_day is not None and day <= self.last_day:
+            return self.revise(day, high, close, pe, pb)
+        self.last_day = day
+
+        peak = close if _is_missing(high) else high
+        if self.ath is None or peak > self.ath:
+            self.ath, self.ath_day = peak, day
+
+        self.closes.append((day, close))
+        cutoff = bisect.bisect_left(self.closes, (day - CLOSE_RETENTION_DAYS,))
+        # Keep one close before the cutoff so the longest horizon always has a reference
+        if cutoff > 1:
+            del self.closes[:cutoff - 1]
+
+        if not _is_missing(pe):
+            self.pe.push(day, pe)
+        else:
+            self.pe.expire(day)
+        if not _is_missing(pb):
+            self.pb.push(day, pb)
+        else:
+            self.pb.expire(day)
+
+        self.latest = {'close': close, 'pe': None if _is_missing(pe) else pe,
+                       'pb': None if _is_missing(pb) else pb}
+        return True
+
+    def revise(self, day: int, high, close, pe=None, pb=None) -> bool:
+        """
+        Apply a changed or newly backfilled row for a day at or before the last
+        applied day. Sets `stale` when the row lowers the ATH's own day, which
+        only a rebuild from stored history can resolve.
+
+        Returns:
+            bool: True if the state changed
+        """
+        changed = False
+        peak = close if _is_missing(high) else high
+        if self.ath is None or peak > self.ath:
+            self.ath, self.ath_day = peak, day
+            changed = True
+        elif day == self.ath_day and peak < self.ath:
+            self.stale = True
+
+        # Closes older than the retained series no longer feed any return
+        if self.closes and day >= self.closes[0][0]:
+            i = bisect.bisect_left(self.closes, (day,))
+            if i < len(self.closes) and self.closes[i][0] == day:
+                if self.closes[i][1] != close:
+                    self.closes[i] = (day, close)
+                    changed = True
+            else:
+                self.closes.insert(i, (day, close))
+                changed = True
+
+        changed = self.pe.revise(day, pe, self.last_day) or changed
+        changed = self.pb.revise(day, pb, self.last_day) or changed
+        if day == self.last_day:
+            latest = {'close': close,
+                      'pe': self.latest.get('pe') if _is_missing(pe) else pe,
+                      'pb': self.latest.get('pb') if _is_missing(pb) else pb}
+            changed = changed or latest != self.latest
+            self.latest = latest
+        return changed
+
+    def seed_ath(self, value, day: int = None) -> None:
+        """Raise the running ATH to a value known from history not replayed here."""
+        if not _is_missing(value) and (self.ath is None or value > self.ath):
+            self.ath, self.ath_day = value, day
+
+    def _return_since(self, horizon_days: int):
+        if len(self.closes) < 2:
+            return None
+        latest_day, latest_close = self.closes[-1]
+        i = bisect.bisect_right(self.closes, (latest_day - horizon_days, math.inf)) - 1
+        reference = self.closes[max(i, 0)][1]
+        return (latest_close - reference) / reference * 100 if reference else None
+
+    def snapshot(self) -> dict:
+        """Current metrics for this symbol."""
+        if self.last_day is None:
+            return {}
+        close = self.latest['close']
+        previous = self.closes[-2][1] if len(self.closes) > 1 else None
+        snapshot = {
+            'as_of': date.fromordinal(self.last_day).isoformat(),
+            'close': close,
+            'pe': self.latest['pe'],
+            'pb': self.latest['pb'],
+            'ath': self.ath,
+            'dist_from_ath': (self.ath - close) / self.ath * 100 if self.ath else None,
+            'change_1d': (close - previous) / previous * 100 if previous else None,
+            'median_pe': self.pe.median(),
+            'pe_percentile': self.pe.percentile_of(self.latest['pe']),
+            'median_pb': self.pb.median(),
+            'pb_percentile': self.pb.percentile_of(self.latest['pb']),
+        }
+        for name, horizon_days in RETURN_HORIZONS.items():
+            snapshot[f'change_{name}'] = self._return_since(horizon_days)
+        return snapshot
+
+    def to_dict(self) -> dict:
+        return {
+            'last_day': self.last_day,
+            'ath': self.ath,
+            'ath_day': self.ath_day,
+            'stale': self.stale,
+            'latest': self.latest,
+            'closes': [list(entry) for entry in self.closes],
+            'pe': self.pe.to_list(),
+            'pb': self.pb.to_list(),
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict, window_years: int = 5) -> 'SymbolStats':
+        stats = cls(window_years)
+        stats.last_day = data.get('last_day')
+        stats.ath = data.get('ath')
+        stats.ath_day = data.get('ath_day')
+        stats.stale = bool(data.get('stale'))
+        stats.latest = data.get('latest') or {}
+        stats.closes = [(int(day), float(close)) for day, close in data.get('closes', [])]
+        stats.pe = SlidingWindowStats.from_list(stats.pe.span_days, data.get('pe', []))
+        stats.pb = SlidingWindowStats.from_list(stats.pb.span_days, data.get('pb', []))
+        return stats
+
+
+class RollingStatsEngine:
+    """
+    Persistent per-symbol rolling statistics.
+
+    Args:
+        path (str): JSON file the state is loaded from and saved to
+        window_years (int): Length of the PE/PB valuation window
+    """
+
+    def __init__(self, path: str, window_years: int = 5):
+        self.path = path
+        self.window_years = window_years
+        self.symbols = {}
+
+    def load(self) -> bool:
+        """
+        Load persisted state. A missing, unreadable or incompatible file (other
+        version or window length) leaves the engine empty so it is rebuilt.
+
+        Returns:
+            bool: True if state was loaded
+        """
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return False
+        if data.get('version') != STATE_VERSION or data.get('window_years') != self.window_years:
+            return False
+        self.symbols = {symbol: SymbolStats.from_dict(state, self.window_years)
+                        for symbol, state in data.get('symbols', {}).items()}
+        return True
+
+    def save(self) -> None:
+        """Atomically write the state to disk."""
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        data = {
+            'version': STATE_VERSION,
+            'window_years': self.window_years,
+            'saved_at': datetime.now().isoformat(timespec='seconds'),
+            'symbols': {symbol: stats.to_dict() for symbol, stats in self.symbols.items()},
+        }
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, separators=(',', ':'))
+        os.replace(tmp_path, self.path)
+
+    def reset(self, symbols: list = None) -> None:
+        """Drop state for the given symbols (all when None) so it is rebuilt."""
+        if symbols is None:
+            self.symbols = {}
+        for symbol in symbols or []:
+            self.symbols.pop(symbol, None)
+
+    def last_date(self, symbol: str):
+        """Last applied date for a symbol, or None if it has no state."""
+        stats = self.symbols.get(symbol)
+        return date.fromordinal(stats.last_day) if stats and stats.last_day else None
+
+    def observed_days(self) -> set:
+        """Day ordinals of the closes retained for any symbol (recent trading sessions)."""
+        return {day for stats in self.symbols.values() for day, _ in stats.closes}
+
+    def seed_ath(self, symbol: str, value, day=None) -> None:
+        self.symbols.setdefault(symbol, SymbolStats(self.window_years)).seed_ath(
+            value, _to_ordinal(day) if day is not None else None)
+
+    def stale_symbols(self) -> list:
+        """Symbols whose state a revision invalidated; reset and bootstrap them again."""
+        return sorted(symbol for symbol, stats in self.symbols.items() if stats.stale)
+
+    def update(self, df) -> int:
+        """
+        Apply daily rows (a frame with date, symbol, high, close and optionally
+        pe, pb). Rows are applied per symbol in date order; rows not newer than a
+        symbol's state are applied as revisions.
+
+        Returns:
+            int: Rows that changed the state
+        """
+        if df is None or df.empty:
+            return 0
+        frame = df.sort_values(['symbol', 'date'])
+        columns = {col: (frame[col].to_numpy(dtype=float) if col in frame else None)
+                   for col in ('high', 'close', 'pe', 'pb')}
+        days = [_to_ordinal(value) for value in frame['date'].tolist()]
+        applied = 0
+        for i, symbol in enumerate(frame['symbol'].tolist()):
+            stats = self.symbols.get(symbol)
+            if stats is None:
+                stats = self.symbols[symbol] = SymbolStats(self.window_years)
+            values = [columns[col][i] if columns[col] is not None else None
+                      for col in ('high', 'close', 'pe', 'pb')]
+            applied += stats.apply(days[i], *values)
+        return applied
+
+    def snapshots(self, symbols: list = None) -> list:
+        """Metric snapshots (with 'symbol') for the given symbols, or all symbols."""
+        result = []
+        for symbol in symbols if symbols is not None else sorted(self.symbols):
+            stats = self.symbols.get(symbol)
+            snapshot = stats.snapshot() if stats else {}
+            if snapshot:
+                result.append({'symbol': symbol, **snapshot})
+        return result
@@ -0,0 +1,246 @@
+"""
+Run instrumentation for the index sync.
+
+Collects stage timers, counters and latency histograms from any thread and
+writes them out at the end of a run as a JSON report and, optionally, a
+Prometheus textfile (for node_exporter's textfile collector):
+
+    with METRICS.time('stage_seconds', stage='nse_price'):
+        ...
+    METRICS.inc('http_requests_total', service='nse', call='price')
+
+`Profiler` wraps the functions that run on worker threads so a `--profile`
+run captures every thread, not just the main one, in a single pstats dump.
+"""
+
+import cProfile
+import io
+import json
+import math
+import os
+import pstats
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+# Histogram upper bounds in seconds, covering fast cache hits to slow backfills
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _label_key(labels: dict) -> tuple:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _format_labels(key: tuple) -> str:
+    if not key:
+        return ''
+    pairs = []
+    for k, v in key:
+        v = v.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        pairs.append(f'{k}="{v}"')
+    return '{' + ','.join(pairs) + '}'
+
+
+def _atomic_write(path: str, text: str) -> None:
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+
+class Histogram:
+    """Cumulative-bucket histogram with count, sum, min and max."""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.bounds = tuple(buckets)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.min = math.inf
+        self.max = 0.0
+
+    def observe(self, value: float) -> None:
+        for i, bound in enumerate(self.bounds):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        else:
+            self.counts[-1] += 1
+        self.count += 1
+        self.sum += value
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    def quantile(self, q: float):
+        """Bucket upper bound containing quantile q (max for the overflow bucket)."""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.bounds, self.counts):
+            seen += count
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+    def to_dict(self) -> dict:
+        return {
+            'count': self.count,
+            'sum': round(self.sum, 6),
+            'min': round(self.min, 6) if self.count else None,
+            'max': round(self.max, 6) if self.count else None,
+            'mean': round(self.sum / self.count, 6) if self.count else None,
+            'p50': self.quantile(0.5),
+            'p95': self.quantile(0.95),
+            'buckets': {str(bound): count for bound, count in zip(self.bounds, self.counts)},
+            'overflow': self.counts[-1],
+        }
+
+
+class RunMetrics:
+    """
+    Thread-safe registry of counters and histograms for one run.
+
+    Args:
+        prefix (str): Metric name prefix used in the Prometheus output
+    """
+
+    def __init__(self, prefix: str = 'index_sync'):
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self.counters = {}
+        self.histograms = {}
+        self.started_at = datetime.now(timezone.utc)
+        self._started = time.perf_counter()
+
+    def inc(self, name: str, amount: float = 1, **labels) -> None:
+        key = (name, _label_key(labels))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    def observe(self, name: str, value: float, **labels) -> None:
+        key = (name, _label_key(labels))
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram()
+            histogram.observe(value)
+
+    @contextmanager
+    def time(self, name: str, **labels):
+        """Observe the wall time of the block (also when it raises)."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started, **labels)
+
+    def counter_value(self, name: str, **labels) -> float:
+        return self.counters.get((name, _label_key(labels)), 0)
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            return {
+                'started_at': self.started_at.isoformat(timespec='seconds'),
+                'duration_seconds': round(time.perf_counter() - self._started, 3),
+                'counters': [{'name': name, 'labels': dict(labels), 'value': value}
+                             for (name, labels), value in sorted(self.counters.items())],
+                'histograms': [{'name': name, 'labels': dict(labels), **histogram.to_dict()}
+                               for (name, labels), histogram in sorted(self.histograms.items())],
+            }
+
+    def write_json(self, path: str) -> None:
+        _atomic_write(path, json.dumps(self.to_dict(), indent=2) + '\n')
+
+    def to_prometheus(self) -> str:
+        lines = []
+        with self._lock:
+            typed = set()
+            for (name, labels), value in sorted(self.counters.items()):
+                metric = f"{self.prefix}_{name}"
+                if metric not in typed:
+                    lines.append(f"# TYPE {metric} counter")
+                    typed.add(metric)
+                lines.append(f"{metric}{_format_labels(labels)} {value}")
+            for (name, labels), histogram in sorted(self.histograms.items()):
+                metric = f"{self.prefix}_{name}"
+                if metric not in typed:
+                    lines.append(f"# TYPE {metric} histogram")
+                    typed.add(metric)
+                cumulative = 0
+                for bound, count in zip(histogram.bounds, histogram.counts):
+                    cumulative += count
+                    lines.append(f"{metric}_bucket{_format_labels(labels + (('le', str(bound)),))} {cumulative}")
+                lines.append(f"{metric}_bucket{_format_labels(labels + (('le', '+Inf'),))} {histogram.count}")
+                lines.append(f"{metric}_sum{_format_labels(labels)} {histogram.sum:.6f}")
+                lines.append(f"{metric}_count{_format_labels(labels)} {histogram.count}")
+            metric = f"{self.prefix}_run_duration_seconds"
+            lines.append(f"# TYPE {metric} gauge")
+            lines.append(f"{metric} {time.perf_counter() - self._started:.3f}")
+        return '\n'.join(lines) + '\n'
+
+    def write_prometheus(self, path: str) -> None:
+        _atomic_write(path, self.to_prometheus())
+
+    def print_summary(self, name: str = 'stage_seconds') -> None:
+        """Print the time spent per stage, largest first."""
+        stages = sorted(((dict(labels).get('stage', '-'), h) for (n, labels), h in self.histograms.items()
+                         if n == name), key=lambda item: -item[1].sum)
+        if not stages:
+            return
+        print(f"\n⏱  STAGE TIMINGS (summed across threads):")
+        for stage, histogram in stages:
+            print(f"  {stage:<20} {histogram.sum:9.2f} s  {histogram.count:6d} calls  "
+                  f"p50 {histogram.quantile(0.5) or 0:.3f} s  max {histogram.max:.3f} s")
+
+
+class Profiler:
+    """
+    cProfile across threads: each wrapped call runs under its own profile and all
+    profiles are merged into one pstats dump. Disabled profilers wrap nothing.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self._profiles = []
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def wrap(self, fn):
+        """Return fn profiled on whichever thread calls it (fn itself when disabled)."""
+        if not self.enabled:
+            return fn
+
+        def profiled(*args, **kwargs):
+            # A thread already being profiled must not start a nested profile
+            if getattr(self._local, 'active', False):
+                return fn(*args, **kwargs)
+            profile = cProfile.Profile()
+            self._local.active = True
+            try:
+                return profile.runcall(fn, *args, **kwargs)
+            finally:
+                self._local.active = False
+                with self._lock:
+                    self._profiles.append(profile)
+
+        return profiled
+
+    def dump(self, path: str, top: int = 25) -> None:
+        """Write the merged stats to path and print the top functions by cumulative time."""
+        with self._lock:
+            profiles = list(self._profiles)
+        if not profiles:
+            return
+        stats = pstats.Stats(profiles[0])
+        for profile in profiles[1:]:
+            stats.add(profile)
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        stats.dump_stats(path)
+        report = io.StringIO()
+        stats.stream = report
+        stats.sort_stats('cumulative').print_stats(top)
+        print(f"\n🔬 Profile written to {path} ({len(profiles)} thread profiles merged)")
+        print(report.getvalue())
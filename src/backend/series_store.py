@@ -0,0 +1,268 @@
+"""
+Compact per-symbol time-series store for the rows fetched during a sync.
+
+Buffering fetched frames in a list and concatenating them at the end holds
+every row twice at the peak, and answering "what does symbol X have" from the
+combined frame scans the whole symbol column. The store instead keeps, per
+symbol, one contiguous block:
+
+    days     int32 day numbers (days since 1970-01-01), ascending and unique
+    values   one array per value column; float32 where every value survives
+             the round trip at FLOAT32_DECIMALS places, float64 otherwise
+
+Symbols are interned in a dictionary, so a symbol's block, first and last date
+are O(1) lookups. Blocks keep spare capacity: rows newer than a block's last
+day are appended in place (amortized O(1) per row), anything else is merged
+into that block alone, later rows replacing earlier ones for the same day.
+Frames are materialized per group of symbols, so diffing and uploading never
+need the whole dataset as one frame.
+"""
+
+from __future__ import annotations
+
+from datetime import date
+
+from lazy_imports import lazy_import
+from normalize import FLOAT32_DECIMALS, float32_safe
+
+np = lazy_import('numpy')
+pd = lazy_import('pandas')
+
+# Rows allocated for a new block (capacity then doubles as needed)
+MIN_CAPACITY = 64
+
+_EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+
+class SeriesBlock:
+    """
+    Day-sorted rows of one symbol in contiguous arrays with spare capacity.
+
+    Value columns appear the first time a frame carries them (earlier rows read
+    as NaN), mirroring how pd.concat aligns frames with different columns.
+    """
+
+    __slots__ = ('size', 'days', 'values')
+
+    def __init__(self):
+        self.size = 0
+        self.days = np.empty(0, dtype=np.int32)
+        self.values = {}
+
+    @property
+    def capacity(self) -> int:
+        return len(self.days)
+
+    @property
+    def first_day(self):
+        return int(self.days[0]) if self.size else None
+
+    @property
+    def last_day(self):
+        return int(self.days[self.size - 1]) if self.size else None
+
+    @property
+    def nbytes(self) -> int:
+        return self.days.nbytes + sum(values.nbytes for values in self.values.values())
+
+    def column(self, name: str):
+        """Used part of a value column widened to float64 (exact at FLOAT32_DECIMALS), or None."""
+        values = self.values.get(name)
+        if values is None:
+            return None
+        values = values[:self.size]
+        if values.dtype == np.float32:
+            return np.round(values.astype(np.float64), FLOAT32_DECIMALS)
+        return values.copy()
+
+    def _reallocate(self, capacity: int) -> None:
+        days = np.empty(capacity, dtype=np.int32)
+        days[:self.size] = self.days[:self.size]
+        self.days = days
+        for name, values in self.values.items():
+            grown = np.full(capacity, np.nan, dtype=values.dtype)
+            grown[:self.size] = values[:self.size]
+            self.values[name] = grown
+
+    def _prepare_column(self, name: str, incoming) -> None:
+        """Create or widen a column so it can hold `incoming` without loss."""
+        values = self.values.get(name)
+        if values is not None and values.dtype == np.float64:
+            return
+        narrow = float32_safe(incoming)
+        if values is None:
+            self.values[name] = np.full(self.capacity, np.nan, dtype=np.float32 if narrow else np.float64)
+        elif not narrow:
+            widened = np.full(self.capacity, np.nan, dtype=np.float64)
+            widened[:self.size] = self.column(name)
+            self.values[name] = widened
+
+    def add(self, days, values: dict) -> None:
+        """
+        Add rows of this symbol.
+
+        Args:
+            days (np.ndarray): int32 day numbers, in arrival order
+            values (dict): column -> float64 array aligned with days
+        """
+        n = len(days)
+        if not n:
+            return
+        for name, incoming in values.items():
+            self._prepare_column(name, incoming)
+
+        ordered = n == 1 or bool(np.all(days[1:] > days[:-1]))
+        if ordered and (not self.size or days[0] > self.days[self.size - 1]):
+            if self.size + n > self.capacity:
+                self._reallocate(max(self.size + n, 2 * self.capacity, MIN_CAPACITY))
+            end = self.size + n
+            self.days[self.size:end] = days
+            for name, column in self.values.items():
+                column[self.size:end] = values[name] if name in values else np.nan
+            self.size = end
+            return
+        self._merge(days, values)
+
+    def _merge(self, days, values: dict) -> None:
+        """Merge out-of-order or overlapping rows; the latest row per day wins."""
+        combined = np.concatenate([self.days[:self.size], days])
+        order = np.argsort(combined, kind='stable')
+        sorted_days = combined[order]
+        # Keep the last occurrence of each day (arrival order is preserved by the stable sort)
+        keep = np.append(sorted_days[1:] != sorted_days[:-1], True)
+        positions = order[keep]
+
+        capacity = max(len(positions), MIN_CAPACITY)
+        merged_days = np.empty(capacity, dtype=np.int32)
+        merged_days[:len(positions)] = combined[positions]
+        merged_values = {}
+        for name, column in self.values.items():
+            incoming = values[name] if name in values else np.full(len(days), np.nan)
+            joined = np.concatenate([column[:self.size].astype(np.float64), incoming])
+            merged = np.full(capacity, np.nan, dtype=column.dtype)
+            merged[:len(positions)] = joined[positions]
+            merged_values[name] = merged
+        self.days, self.values, self.size = merged_days, merged_values, len(positions)
+
+
+class SeriesStore:
+    """
+    Symbol dictionary plus one SeriesBlock per symbol.
+
+    Args:
+        columns (list): Value columns kept (others in added frames are ignored)
+    """
+
+    def __init__(self, columns: list):
+        self.columns = list(columns)
+        self.codes = {}
+        self.names = []
+        self.blocks = []
+
+    def __len__(self) -> int:
+        return sum(block.size for block in self.blocks)
+
+    def __contains__(self, symbol: str) -> bool:
+        return symbol in self.codes
+
+    @property
+    def symbols(self) -> list:
+        return list(self.names)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(block.nbytes for block in self.blocks)
+
+    def block(self, symbol: str) -> SeriesBlock:
+        """The symbol's block (created empty on first use)."""
+        code = self.codes.get(symbol)
+        if code is None:
+            code = self.codes[symbol] = len(self.names)
+            self.names.append(symbol)
+            self.blocks.append(SeriesBlock())
+        return self.blocks[code]
+
+    def first_date(self, symbol: str):
+        code = self.codes.get(symbol)
+        day = self.blocks[code].first_day if code is not None else None
+        return date.fromordinal(day + _EPOCH_ORDINAL) if day is not None else None
+
+    def last_date(self, symbol: str):
+        code = self.codes.get(symbol)
+        day = self.blocks[code].last_day if code is not None else None
+        return date.fromordinal(day + _EPOCH_ORDINAL) if day is not None else None
+
+    def add(self, df: pd.DataFrame) -> int:
+        """
+        Add a frame with date, symbol and any of the store's value columns.
+
+        Returns:
+            int: Rows added (rows without a date are skipped)
+        """
+        if df is None or df.empty:
+            return 0
+        dates = pd.DatetimeIndex(df['date'])
+        present = ~dates.isna()
+        days = dates.values.astype('datetime64[D]').astype(np.int64).astype(np.int32)
+        codes, symbols = pd.factorize(df['symbol'])
+        present_columns = [col for col in self.columns if col in df.columns]
+        matrix = df[present_columns].to_numpy(dtype=np.float64, na_value=np.nan)
+        columns = {col: matrix[:, i] for i, col in enumerate(present_columns)}
+
+        # Rows grouped by symbol, keeping arrival order within each symbol
+        order = np.argsort(codes, kind='stable')
+        order = order[present[order]]
+        bounds = np.searchsorted(codes[order], np.arange(len(symbols) + 1))
+        for code, symbol in enumerate(map(str, symbols)):
+            rows = order[bounds[code]:bounds[code + 1]]
+            if len(rows):
+                self.block(symbol).add(days[rows], {col: values[rows] for col, values in columns.items()})
+        return len(order)
+
+    def frame(self, symbols: list = None) -> pd.DataFrame:
+        """
+        Materialize rows as a frame.
+
+        Args:
+            symbols (list, optional): Symbols to include (default: all, in insertion order)
+
+        Returns:
+            pd.DataFrame: [date, symbol, *value columns present] sorted by (symbol, date),
+                          with a categorical symbol
+        """
+        symbols = [s for s in (symbols if symbols is not None else self.names) if s in self.codes]
+        blocks = [self.blocks[self.codes[s]] for s in symbols]
+        columns = [col for col in self.columns if any(col in block.values for block in blocks)]
+        if not blocks:
+            return pd.DataFrame(columns=['date', 'symbol', *columns])
+
+        order = sorted(range(len(symbols)), key=lambda i: symbols[i])
+        symbols, blocks = [symbols[i] for i in order], [blocks[i] for i in order]
+        sizes = [block.size for block in blocks]
+        days = np.concatenate([block.days[:block.size] for block in blocks])
+        data = {
+            'date': days.astype('datetime64[D]').astype('datetime64[ns]'),
+            'symbol': pd.Categorical.from_codes(np.repeat(np.arange(len(symbols), dtype=np.int32), sizes),
+                                                categories=symbols),
+        }
+        for col in columns:
+            data[col] = np.concatenate([
+                block.column(col) if col in block.values else np.full(block.size, np.nan)
+                for block in blocks
+            ])
+        return pd.DataFrame(data)
+
+    def batches(self, max_rows: int):
+        """
+        Yield lists of symbols whose rows add up to at most max_rows (a symbol
+        larger than that forms a batch of its own).
+        """
+        batch, rows = [], 0
+        for symbol, block in zip(self.names, self.blocks):
+            if batch and rows + block.size > max_rows:
+                yield batch
+                batch, rows = [], 0
+            batch.append(symbol)
+            rows += block.size
+        if batch:
+            yield batch
@@ -0,0 +1,224 @@
+"""
+Crash-safe checkpoint journal for the NSE index sync.
+
+Fetched rows used to live only in memory until the upload at the end of the
+run, so a cancelled or timed-out job lost every NSE request it had made. The
+journal records each completed unit of work as it happens:
+
+    begin      the run's parameters (date range, indices, price-only)
+    fetched    one normalized date window of one index; its frame is written
+               to a payload file next to the journal (Parquet when a Parquet
+               engine is installed, pickle otherwise)
+    uploaded   one write set accepted by Supabase, by content hash
+    commit     the run finished
+
+Payloads are written to a temporary file, fsynced and renamed before their
+journal line is appended (and fsynced), so every line that made it to disk
+refers to a complete payload. A torn last line from a crash mid-append is
+dropped on recovery. Resuming replays fetched windows from their payloads
+instead of asking NSE again, and skips write sets already uploaded. Once a run
+commits, the journal is compacted away: payloads are deleted and the journal
+file is emptied.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import threading
+from datetime import datetime
+
+from lazy_imports import lazy_import
+from response_cache import CACHE_FORMAT
+
+pd = lazy_import('pandas')
+
+JOURNAL_FILE = 'journal.jsonl'
+PAYLOAD_SUFFIX = '.parquet' if CACHE_FORMAT == 'parquet' else '.pkl'
+
+
+def write_set_id(df: pd.DataFrame) -> str:
+    """Content hash of a write set, so a resumed run recognizes one it already uploaded."""
+    digest = hashlib.sha1()
+    digest.update(','.join(map(str, df.columns)).encode())
+    digest.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    return digest.hexdigest()[:20]
+
+
+class SyncJournal:
+    """
+    Append-only journal of completed fetch and upload steps of one sync run.
+
+    Args:
+        journal_dir (str): Directory holding journal.jsonl and the fetched payloads
+    """
+
+    def __init__(self, journal_dir: str):
+        self.journal_dir = journal_dir
+        self.path = os.path.join(journal_dir, JOURNAL_FILE)
+        self.lock = threading.Lock()
+        self.run = None
+        self.windows = {}
+        self.uploads = {}
+        self.replayed = 0
+        self.sequence = 0
+
+    @staticmethod
+    def _key(index_name: str, start_date: str, end_date: str, price_only: bool) -> str:
+        return f"{index_name}|{start_date}|{end_date}|{'price' if price_only else 'full'}"
+
+    def _read(self) -> list:
+        """Journal entries up to the first torn or unreadable line."""
+        entries = []
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        entries.append(json.loads(line))
+                    except ValueError:
+                        break
+        except OSError:
+            pass
+        return entries
+
+    def recover(self):
+        """
+        Load the unfinished run left by an interrupted sync.
+
+        Fetched entries whose payload is missing are dropped, and the journal is
+        rewritten with the surviving entries so later appends start on a clean line.
+
+        Returns:
+            dict: The interrupted run's begin record, or None when there is nothing
+                  to resume (no journal, or the last run committed)
+        """
+        entries = self._read()
+        if not entries or entries[0].get('op') != 'begin' or entries[-1].get('op') == 'commit':
+            return None
+        kept = []
+        for entry in entries:
+            if entry.get('op') == 'fetched':
+                if not os.path.exists(os.path.join(self.journal_dir, entry['payload'])):
+                    continue
+                self.windows[entry['key']] = entry
+            elif entry.get('op') == 'uploaded':
+                self.uploads[entry['batch']] = entry
+            kept.append(entry)
+        self.run = entries[0]
+        # Continue payload numbering after every file on disk, journaled or orphaned
+        self.sequence = max((int(name[8:14]) for name in os.listdir(self.journal_dir)
+                             if name.startswith('fetched-') and name[8:14].isdigit()), default=0)
+        self._rewrite(kept)
+        return self.run
+
+    def _rewrite(self, entries: list) -> None:
+        os.makedirs(self.journal_dir, exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            for entry in entries:
+                f.write(json.dumps(entry) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+    def _append(self, entry: dict) -> None:
+        entry['at'] = datetime.now().isoformat(timespec='seconds')
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(entry) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+
+    def begin(self, run: dict, resume: bool = False) -> None:
+        """
+        Start journaling a run.
+
+        Args:
+            run (dict): Run parameters stored in the begin record
+            resume (bool): Keep the entries recovered by recover() and continue them;
+                           otherwise any previous journal is discarded
+        """
+        with self.lock:
+            if resume and self.run is not None:
+                return
+            self._clear()
+            self.run = {'op': 'begin', **run}
+            self._rewrite([])
+            self._append(dict(self.run))
+
+    def fetched(self, index_name: str, start_date: str, end_date: str, price_only: bool):
+        """The frame journaled for this window by the interrupted run, or None."""
+        entry = self.windows.get(self._key(index_name, start_date, end_date, price_only))
+        if entry is None:
+            return None
+        path = os.path.join(self.journal_dir, entry['payload'])
+        try:
+            df = pd.read_parquet(path) if path.endswith('.parquet') else pd.read_pickle(path)
+        except Exception:
+            return None
+        with self.lock:
+            self.replayed += 1
+        return df
+
+    def record_fetched(self, index_name: str, start_date: str, end_date: str, price_only: bool,
+                       df: pd.DataFrame) -> None:
+        """
+        Persist a fetched window's frame, then journal it. Empty frames are not
+        journaled since they cannot be told apart from upstream gaps worth retrying.
+        """
+        key = self._key(index_name, start_date, end_date, price_only)
+        if df is None or df.empty or key in self.windows:
+            return
+        with self.lock:
+            self.sequence += 1
+            payload = f"fetched-{self.sequence:06d}{PAYLOAD_SUFFIX}"
+        entry = {'op': 'fetched', 'key': key, 'index': index_name, 'start': start_date,
+                 'end': end_date, 'rows': len(df), 'payload': payload}
+        try:
+            path = os.path.join(self.journal_dir, payload)
+            tmp_path = f"{path}.tmp"
+            if PAYLOAD_SUFFIX == '.parquet':
+                df.to_parquet(tmp_path, index=False)
+            else:
+                df.to_pickle(tmp_path)
+            with open(tmp_path, 'rb') as f:
+                os.fsync(f.fileno())
+            os.replace(tmp_path, path)
+            with self.lock:
+                self._append(entry)
+                self.windows[key] = entry
+        except Exception as e:
+            # A journal that cannot be written only costs the ability to resume
+            print(f"  ⚠ Journal write failed for {index_name} ({start_date} → {end_date}): {e}")
+
+    def uploaded(self, batch_id: str) -> bool:
+        """Whether the interrupted run already uploaded this write set."""
+        return batch_id in self.uploads
+
+    def record_uploaded(self, batch_id: str, symbols: list, rows: int) -> None:
+        entry = {'op': 'uploaded', 'batch': batch_id, 'symbols': list(symbols), 'rows': rows}
+        try:
+            with self.lock:
+                self._append(entry)
+                self.uploads[batch_id] = entry
+        except OSError as e:
+            print(f"  ⚠ Journal write failed for uploaded write set {batch_id}: {e}")
+
+    def commit(self) -> None:
+        """Mark the run finished and compact the journal (payloads deleted, journal emptied)."""
+        with self.lock:
+            self._append({'op': 'commit'})
+            self._clear()
+            self._rewrite([])
+
+    def _clear(self) -> None:
+        for name in os.listdir(self.journal_dir) if os.path.isdir(self.journal_dir) else []:
+            if name.startswith('fetched-'):
+                try:
+                    os.remove(os.path.join(self.journal_dir, name))
+                except OSError:
+                    pass
+        self.run = None
+        self.windows = {}
+        self.uploads = {}
+        self.sequence = 0
@@ -0,0 +1,6 @@
+"""Shared setup for the backend unit tests: make the backend modules importable."""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
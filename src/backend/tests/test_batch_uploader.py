@@ -0,0 +1,108 @@
+import json
+
+import pytest
+import requests
+
+import batch_uploader
+from batch_uploader import BatchUploader, is_retryable
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(batch_uploader.time, 'sleep', lambda seconds: None)
+
+
+def http_error(status: int) -> requests.HTTPError:
+    response = requests.Response()
+    response.status_code = status
+    return requests.HTTPError(f'{status} error', response=response)
+
+
+def records(count: int) -> list:
+    return [{'symbol': 'NIFTY 50', 'date': f'2024-01-{i + 1:02d}', 'close': 100.0 + i} for i in range(count)]
+
+
+class FakeSink:
+    """Accepts bodies unless they contain a bad date or the sink is down."""
+
+    def __init__(self, bad_dates=(), down: Exception = None):
+        self.bad_dates = set(bad_dates)
+        self.down = down
+        self.saved = []
+        self.calls = 0
+
+    def __call__(self, body: bytes) -> None:
+        self.calls += 1
+        if self.down is not None:
+            raise self.down
+        rows = json.loads(body)
+        if any(row['date'] in self.bad_dates for row in rows):
+            raise http_error(400)
+        self.saved.extend(rows)
+
+
+def test_is_retryable_separates_transient_from_data_errors():
+    assert is_retryable(requests.ConnectionError())
+    assert is_retryable(http_error(429)) and is_retryable(http_error(503))
+    assert not is_retryable(http_error(400)) and not is_retryable(ValueError())
+
+
+def test_clean_upload_sends_every_row():
+    sink = FakeSink()
+    stats = BatchUploader(sink, batch_size=50, min_batch=10).upload(records(25))
+    assert len(sink.saved) == 25
+    assert stats['rows_rejected'] == 0 and stats['rows_failed'] == 0
+
+
+def test_bisection_isolates_bad_rows(tmp_path):
+    rejects = tmp_path / 'rejects.jsonl'
+    sink = FakeSink(bad_dates={'2024-01-05', '2024-01-20'})
+    uploader = BatchUploader(sink, max_in_flight=1, batch_size=31, min_batch=31,
+                             rejects_path=str(rejects))
+    stats = uploader.upload(records(31))
+    assert stats['rows_rejected'] == 2 and stats['rows_failed'] == 0
+    assert len(sink.saved) == 29
+    rejected = [json.loads(line)['record']['date'] for line in rejects.read_text().splitlines()]
+    assert sorted(rejected) == ['2024-01-05', '2024-01-20']
+    # Far fewer requests than one per row
+    assert stats['bisect_requests'] < 31
+
+
+def test_transient_outage_fails_batch_without_rejecting_rows(tmp_path):
+    rejects = tmp_path / 'rejects.jsonl'
+    sink = FakeSink(down=http_error(503))
+    uploader = BatchUploader(sink, max_in_flight=1, batch_size=20, min_batch=20, retries=2,
+                             rejects_path=str(rejects))
+    stats = uploader.upload(records(20))
+    assert stats['rows_failed'] == 20 and stats['rows_rejected'] == 0
+    assert stats['bisect_requests'] == 0 and stats['retries'] == 2
+    assert sink.calls == 3
+    assert not rejects.exists()
+
+
+def test_retries_back_off_with_jitter(monkeypatch):
+    delays = []
+    monkeypatch.setattr(batch_uploader.time, 'sleep', delays.append)
+    uploader = BatchUploader(FakeSink(down=http_error(503)), max_in_flight=1, batch_size=10,
+                             min_batch=10, retries=3, retry_delay=2.0)
+    uploader.upload(records(10))
+    assert len(delays) == 3
+    for attempt, delay in enumerate(delays):
+        ceiling = 2.0 * 2 ** attempt
+        assert ceiling / 2 <= delay <= ceiling
+
+
+def test_outage_during_bisection_fails_the_slice(tmp_path):
+    rejects = tmp_path / 'rejects.jsonl'
+
+    class OutageAfterFirstCall(FakeSink):
+        def __call__(self, body):
+            if self.calls == 1:
+                self.down = requests.ConnectionError('connection reset')
+            super().__call__(body)
+
+    sink = OutageAfterFirstCall(bad_dates={'2024-01-03'})
+    uploader = BatchUploader(sink, max_in_flight=1, batch_size=8, min_batch=8, rejects_path=str(rejects))
+    stats = uploader.upload(records(8))
+    assert stats['rows_rejected'] == 0 and stats['rows_failed'] == 8
+    assert not rejects.exists()
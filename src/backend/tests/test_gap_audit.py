@@ -0,0 +1,118 @@
+from datetime import date
+
+import pytest
+
+from gap_audit import IntervalIndex, KnownEmptyWindows, coalesce_gaps, find_gaps
+from trading_calendar import TradingCalendar
+
+# Holi 2024 fell on Monday 25 March
+HOLIDAY = '2024-03-25'
+
+
+@pytest.fixture
+def calendar() -> TradingCalendar:
+    return TradingCalendar(holidays=[HOLIDAY], covered_years={2024})
+
+
+def sessions(start: str, end: str, calendar: TradingCalendar, missing=()) -> list:
+    missing = {date.fromisoformat(day) for day in missing}
+    return [day for day in calendar.sessions(date.fromisoformat(start), date.fromisoformat(end))
+            if day not in missing]
+
+
+def ordinal(day: str) -> int:
+    return date.fromisoformat(day).toordinal()
+
+
+def test_intervals_span_weekends_and_holidays(calendar):
+    index = IntervalIndex.from_days(sessions('2024-03-18', '2024-03-29', calendar), calendar)
+    assert list(index) == [(ordinal('2024-03-18'), ordinal('2024-03-29'))]
+    assert index.contains(date(2024, 3, 22)) and not index.contains(date(2024, 4, 1))
+
+
+def test_find_gaps_reports_missing_sessions_only(calendar):
+    days = sessions('2024-03-01', '2024-04-30', calendar, missing=['2024-03-22', '2024-03-26', '2024-04-10'])
+    index = IntervalIndex.from_days(days, calendar)
+    # The holiday between 22 and 26 March is not a missing session
+    assert find_gaps(index, calendar) == [
+        (ordinal('2024-03-22'), ordinal('2024-03-26'), 2),
+        (ordinal('2024-04-10'), ordinal('2024-04-10'), 1),
+    ]
+
+
+def test_leading_gap_from_audit_start(calendar):
+    index = IntervalIndex.from_days(sessions('2024-03-04', '2024-03-29', calendar), calendar)
+    assert find_gaps(index, calendar, start='2024-02-26') == [(ordinal('2024-02-26'), ordinal('2024-03-01'), 5)]
+    assert find_gaps(index, calendar) == []
+
+
+@pytest.mark.parametrize('bridge, expected', [
+    (5, [('2024-04-01', '2024-04-09', 2)]),
+    (4, [('2024-04-01', '2024-04-01', 1), ('2024-04-09', '2024-04-09', 1)]),
+])
+def test_coalesce_bridges_up_to_the_configured_present_sessions(calendar, bridge, expected):
+    # Five present sessions (2-5 and 8 April) separate the two holes
+    days = sessions('2024-03-01', '2024-04-30', calendar, missing=['2024-04-01', '2024-04-09'])
+    gaps = find_gaps(IntervalIndex.from_days(days, calendar), calendar)
+    windows = coalesce_gaps(gaps, calendar, bridge_sessions=bridge)
+    assert windows == [(ordinal(start), ordinal(end), missing) for start, end, missing in expected]
+
+
+def test_coalesce_merges_adjacent_holes_with_zero_bridge(calendar):
+    gaps = [(ordinal('2024-04-01'), ordinal('2024-04-01'), 1), (ordinal('2024-04-02'), ordinal('2024-04-03'), 2)]
+    assert coalesce_gaps(gaps, calendar, bridge_sessions=0) == [(ordinal('2024-04-01'), ordinal('2024-04-03'), 3)]
+
+
+def test_known_empty_windows_cover_contained_ranges_and_persist(tmp_path):
+    path = str(tmp_path / 'gaps.json')
+    known = KnownEmptyWindows(path)
+    known.add('NIFTY 50', 100, 200)
+    known.save()
+    loaded = KnownEmptyWindows(path)
+    loaded.load()
+    assert loaded.covers('NIFTY 50', 120, 150) and loaded.covers('NIFTY 50', 100, 200)
+    assert not loaded.covers('NIFTY 50', 90, 150) and not loaded.covers('NIFTY IT', 120, 150)
+
+
+
+def test_days_before_the_holiday_list_every_index_lacks_are_closures(calendar):
+    # 2023 predates the list: Holi (8 March) is missing from all stored history
+    days = sessions('2023-03-01', '2023-03-31', calendar, missing=['2023-03-08'])
+    calendar.observe(days)
+    index = IntervalIndex.from_days(days, calendar)
+    assert find_gaps(index, calendar) == []
+
+
+def test_days_before_the_holiday_list_other_indices_have_are_gaps(calendar):
+    other = sessions('2023-03-01', '2023-03-31', calendar, missing=['2023-03-08'])
+    calendar.observe(other)
+    days = [day for day in other if day not in (date(2023, 3, 14), date(2023, 3, 15))]
+    gaps = find_gaps(IntervalIndex.from_days(days, calendar), calendar)
+    assert gaps == [(ordinal('2023-03-14'), ordinal('2023-03-15'), 2)]
+
+
+def test_hole_across_the_start_of_the_holiday_list(calendar):
+    # Stored history has no 27-29 December 2023 (other indices do) nor 1-2 January 2024
+    other = sessions('2023-12-01', '2024-01-31', calendar)
+    calendar.observe(other)
+    days = [day for day in other if not date(2023, 12, 27) <= day <= date(2024, 1, 2)]
+    gaps = find_gaps(IntervalIndex.from_days(days, calendar), calendar)
+    assert gaps == [(ordinal('2023-12-27'), ordinal('2023-12-29'), 3),
+                    (ordinal('2024-01-01'), ordinal('2024-01-02'), 2)]
+    assert coalesce_gaps(gaps, calendar) == [(ordinal('2023-12-27'), ordinal('2024-01-02'), 5)]
+
+
+def test_record_empty_gives_up_after_the_configured_runs(tmp_path):
+    path = str(tmp_path / 'gaps.json')
+    for run in range(1, 4):
+        known = KnownEmptyWindows(path)
+        known.load()
+        # Answers within one run count once
+        assert known.record_empty('NIFTY GONE', 100, 200, give_up_runs=3) == (run == 3)
+        assert known.record_empty('NIFTY GONE', 100, 200, give_up_runs=3) == (run == 3)
+        known.save()
+    known = KnownEmptyWindows(path)
+    known.load()
+    assert known.covers('NIFTY GONE', 100, 200)
+    assert known.attempts == {}
+    assert not known.covers('NIFTY GONE', 100, 201)
@@ -0,0 +1,79 @@
+import math
+from datetime import date
+
+import pandas as pd
+import pytest
+
+from history_query import HistoryIndex, write_history
+from series_store import SeriesStore
+
+COLUMNS = ['close', 'pe']
+
+
+def store(rows: list) -> SeriesStore:
+    updates = SeriesStore(COLUMNS)
+    df = pd.DataFrame(rows, columns=['date', 'symbol', *COLUMNS])
+    updates.add(df.assign(date=pd.to_datetime(df['date'])))
+    return updates
+
+
+@pytest.fixture
+def history(tmp_path):
+    path = str(tmp_path / 'history')
+    write_history(path, store([
+        ('2024-03-11', 'NIFTY 50', 100.0, 20.0),
+        ('2024-03-12', 'NIFTY 50', 101.0, None),
+        ('2024-03-14', 'NIFTY 50', 103.0, 21.0),
+        ('2024-03-12', 'NIFTY BANK', 500.0, 15.0),
+    ]), columns=COLUMNS)
+    return path
+
+
+def test_asof_boundaries(history):
+    index = HistoryIndex.open(history)
+    assert index.asof('NIFTY 50', '2024-03-10') is None
+    assert index.asof('NIFTY 50', '2024-03-11') == {'date': date(2024, 3, 11), 'close': 100.0, 'pe': 20.0}
+    # The last row on or before the date, unless an exact match is required
+    assert index.asof('NIFTY 50', '2024-03-13', ['close']) == {'date': date(2024, 3, 12), 'close': 101.0}
+    assert index.asof('NIFTY 50', '2024-03-13', exact=True) is None
+    assert index.asof('NIFTY 50', '2024-03-12')['pe'] is None
+    assert index.asof('NIFTY 50', '2030-01-01')['date'] == date(2024, 3, 14)
+    assert index.asof('NIFTY IT', '2024-03-14') is None
+
+
+def test_range_is_inclusive_and_per_symbol(history):
+    index = HistoryIndex.open(history)
+    assert list(index.range('NIFTY 50', '2024-03-12', '2024-03-14').column('close')) == [101.0, 103.0]
+    assert list(index.range('NIFTY 50', '2024-03-13', '2024-03-13').column('close')) == []
+    assert list(index.range('NIFTY 50', end='2024-03-11').column('close')) == [100.0]
+    assert list(index.range('NIFTY BANK').column('close')) == [500.0]
+    assert len(index.range('NIFTY IT')) == 0
+
+
+def test_rewrite_merges_backfills_and_revisions(history):
+    base = HistoryIndex.open(history)
+    stats = write_history(history, store([
+        ('2024-03-13', 'NIFTY 50', 102.0, 20.5),   # backfilled hole
+        ('2024-03-11', 'NIFTY 50', 99.5, 20.0),    # revision
+        ('2024-03-15', 'NIFTY 50', 104.0, 21.5),   # new
+    ]), base=base)
+    assert (stats['appended'], stats['revised'], stats['rows']) == (2, 1, 6)
+
+    index = HistoryIndex.open(history)
+    rows = index.range('NIFTY 50')
+    assert [str(day) for day in rows.dates()] == ['2024-03-11', '2024-03-12', '2024-03-13', '2024-03-14', '2024-03-15']
+    assert list(rows.column('close')) == [99.5, 101.0, 102.0, 103.0, 104.0]
+    assert index.asof('NIFTY BANK', '2024-03-15')['close'] == 500.0
+
+
+def test_generation_switch_keeps_open_readers_consistent(history):
+    reader = HistoryIndex.open(history)
+    write_history(history, store([('2024-03-15', 'NIFTY 50', 104.0, 21.5)]), base=reader)
+
+    current = HistoryIndex.open(history)
+    assert current.generation == reader.generation + 1
+    assert current.last_date('NIFTY 50') == date(2024, 3, 15)
+    # The earlier snapshot still reads its own files
+    assert reader.last_date('NIFTY 50') == date(2024, 3, 14)
+    assert reader.asof('NIFTY 50', '2024-03-15')['close'] == 103.0
+    assert math.isclose(current.percentile('NIFTY 50', 'close', '2024-03-15'), 100.0)
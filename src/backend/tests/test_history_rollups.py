@@ -0,0 +1,80 @@
+from datetime import date
+
+import pandas as pd
+
+from history_rollups import RollupBuilder, lttb, period_end, period_start
+from trading_calendar import TradingCalendar
+
+
+def ordinal(day: str) -> int:
+    return date.fromisoformat(day).toordinal()
+
+
+def frame(symbol: str, days: list, closes: list = None) -> pd.DataFrame:
+    closes = closes or [100.0 + i for i in range(len(days))]
+    return pd.DataFrame({'date': pd.to_datetime(days), 'symbol': symbol,
+                         'open': closes, 'high': [c + 1 for c in closes],
+                         'low': [c - 1 for c in closes], 'close': closes})
+
+
+def test_periods():
+    # Wednesday 16 October 2024
+    day = ordinal('2024-10-16')
+    assert period_start(day, 'week') == ordinal('2024-10-14')
+    assert period_end(day, 'week') == ordinal('2024-10-20')
+    assert period_start(day, 'month') == ordinal('2024-10-01')
+    assert period_end(ordinal('2024-12-31'), 'month') == ordinal('2024-12-31')
+
+
+def test_context_ranges_read_stored_sessions_between_fetched_days(tmp_path):
+    builder = RollupBuilder(str(tmp_path / 'rollups.json'))
+    builder.add(frame('NIFTY 50', ['2024-10-07', '2024-10-16']))
+    ranges = builder.context_ranges()
+    needed = {day for since, until in ranges for day in range(since.toordinal(), until.toordinal() + 1)}
+    # Stored sessions between the two backfilled days belong to the same week or month
+    for day in pd.bdate_range('2024-10-01', '2024-10-31').date:
+        if day not in (date(2024, 10, 7), date(2024, 10, 16)):
+            assert day.toordinal() in needed, day
+    assert all(symbols == ['NIFTY 50'] for symbols in ranges.values())
+
+
+def test_context_ranges_stop_at_latest_and_skip_closures(tmp_path):
+    # Gandhi Jayanti 2024 fell on Wednesday 2 October
+    calendar = TradingCalendar(holidays=['2024-10-02'], covered_years={2024})
+    builder = RollupBuilder(str(tmp_path / 'rollups.json'))
+    builder.add(frame('NIFTY 50', ['2024-10-03', '2024-10-04']))
+    ranges = builder.context_ranges(latest=date(2024, 10, 4), is_session=calendar.is_session)
+    assert ranges == {(date(2024, 9, 30), date(2024, 10, 1)): ['NIFTY 50']}
+
+
+def test_context_ranges_skip_complete_history(tmp_path):
+    builder = RollupBuilder(str(tmp_path / 'rollups.json'))
+    builder.add(frame('NIFTY 50', ['2024-10-07', '2024-10-16']), complete=True)
+    assert builder.context_ranges() == {}
+
+
+def test_context_completes_affected_periods_only(tmp_path):
+    builder = RollupBuilder(str(tmp_path / 'rollups.json'))
+    builder.add(frame('NIFTY 50', ['2024-10-18'], [110.0]))
+    stored = frame('NIFTY 50', ['2024-09-30', '2024-10-14', '2024-10-15', '2024-10-16', '2024-10-17'],
+                   [90.0, 105.0, 106.0, 107.0, 108.0])
+    # 30 September belongs to neither the affected week nor the affected month
+    assert builder.add_context(stored) == 4
+    rows, series = builder.build()
+    week = rows[(rows['resolution'] == 'week')].iloc[0]
+    assert (week['period'], week['as_of'], week['open'], week['close'], week['sessions']) == \
+        ('2024-10-14', '2024-10-18', 105.0, 110.0, 5)
+    assert week['high'] == 111.0 and week['low'] == 104.0
+    month = rows[(rows['resolution'] == 'month')].iloc[0]
+    assert (month['period'], month['open'], month['sessions']) == ('2024-10-01', 105.0, 5)
+    assert series[0]['dates'] == ['2024-10-18'] and series[0]['close'] == [110.0]
+
+
+def test_lttb_keeps_endpoints_and_extremes():
+    x = list(range(100))
+    y = [0.0] * 100
+    y[37] = 50.0
+    kept = lttb(x, y, 10)
+    assert len(kept) == 10 and kept[0] == 0 and kept[-1] == 99
+    assert 37 in kept
+    assert list(lttb(x[:5], y[:5], 10)) == [0, 1, 2, 3, 4]
@@ -0,0 +1,68 @@
+import math
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import normalize
+from normalize import float32_safe, normalize_price, normalize_valuation
+
+
+@pytest.fixture(params=['arrow', 'numpy'])
+def kernel(request, monkeypatch):
+    if request.param == 'arrow':
+        pytest.importorskip('pyarrow')
+        monkeypatch.setattr(normalize, 'HAS_ARROW', True)
+    else:
+        monkeypatch.setattr(normalize, 'HAS_ARROW', False)
+    return request.param
+
+
+def test_price_strings_are_parsed_and_rows_without_close_dropped(kernel):
+    raw = pd.DataFrame({
+        'HistoricalDate': ['11 Mar 2024', '12 Mar 2024', '13 Mar 2024'],
+        'OPEN': ['22,100.50', '-', '22,300'],
+        'HIGH': ['22,200', '22,250.25', '22,400'],
+        'LOW': ['22,000', '22,050', '22,200'],
+        'CLOSE': ['22,150.75', '22,210', '-'],
+    })
+    df = normalize_price('NIFTY 50', raw)
+    assert list(df.columns) == ['date', 'symbol', 'open', 'high', 'low', 'close']
+    assert list(df['date'].dt.strftime('%Y-%m-%d')) == ['2024-03-11', '2024-03-12']
+    assert list(df['symbol'].astype(str)) == ['NIFTY 50', 'NIFTY 50']
+    assert df['open'].iloc[0] == 22100.5 and math.isnan(df['open'].iloc[1])
+    assert list(df['close']) == [22150.75, 22210.0]
+
+
+def test_valuation_accepts_numeric_and_mixed_cells(kernel):
+    raw = pd.DataFrame({
+        'DATE': ['11 Mar 2024', '12 Mar 2024', None],
+        'pe': [22.5, 22.61, 22.7],
+        'pb': pd.Series(['3.9', 4.0, 'n/a'], dtype=object),
+    })
+    df = normalize_valuation('NIFTY 50', raw)
+    assert list(df['pe']) == [22.5, 22.61, 22.7]
+    assert df['pb'].iloc[:2].tolist() == [3.9, 4.0] and math.isnan(df['pb'].iloc[2])
+    # A column upstream did not send is missing, not an error
+    assert df['div_yield'].isna().all()
+    assert pd.isna(df['date'].iloc[2])
+
+
+def test_empty_frame_keeps_the_schema():
+    assert list(normalize_price('NIFTY 50', pd.DataFrame()).columns) == \
+        ['date', 'symbol', 'open', 'high', 'low', 'close']
+    assert normalize_valuation('NIFTY 50', None).empty
+
+
+def test_bad_date_raises():
+    with pytest.raises(ValueError):
+        normalize_valuation('NIFTY 50', pd.DataFrame({'DATE': ['2024-03-11'], 'pe': ['22']}))
+
+
+@pytest.mark.parametrize('values, safe', [
+    ([22150.75, 3.69, np.nan], True),
+    ([1.23456], False),
+    ([12345678.5], False),
+])
+def test_float32_safe(values, safe):
+    assert float32_safe(np.array(values)) is safe
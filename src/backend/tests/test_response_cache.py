@@ -0,0 +1,95 @@
+import os
+import time
+from datetime import date, timedelta
+
+import pandas as pd
+
+from response_cache import ResponseCache
+
+
+def make_cache(tmp_path, **kwargs) -> ResponseCache:
+    return ResponseCache(str(tmp_path / 'cache'), **kwargs)
+
+
+def frame(rows: int = 3) -> pd.DataFrame:
+    return pd.DataFrame({'date': pd.date_range('2024-01-01', periods=rows), 'close': range(rows)})
+
+
+def backdate(cache: ResponseCache, key: tuple, seconds: float) -> None:
+    path = cache._path(*key)
+    written = time.time() - seconds
+    os.utime(path, (written, written))
+
+
+def test_round_trip_counts_hit(tmp_path):
+    cache = make_cache(tmp_path)
+    cache.put('NIFTY 50', 'price', '01-Jan-2024', '31-Jan-2024', frame())
+    cached = cache.get('NIFTY 50', 'price', '01-Jan-2024', '31-Jan-2024')
+    pd.testing.assert_frame_equal(cached, frame(), check_freq=False)
+    assert cache.counters['hits'] == 1
+
+
+def test_empty_frames_are_not_cached(tmp_path):
+    cache = make_cache(tmp_path)
+    cache.put('NIFTY 50', 'price', '01-Jan-2024', '31-Jan-2024', frame(0))
+    assert cache.get('NIFTY 50', 'price', '01-Jan-2024', '31-Jan-2024') is None
+
+
+def test_window_closed_at_write_time_never_expires(tmp_path):
+    cache = make_cache(tmp_path, ttl_seconds=60)
+    key = ('NIFTY 50', 'price', '01-Jan-2024', '31-Jan-2024')
+    cache.put(*key, frame())
+    backdate(cache, key, 30 * 86400)
+    assert cache.get(*key) is not None
+
+
+def test_open_window_expires_after_ttl(tmp_path):
+    cache = make_cache(tmp_path, ttl_seconds=60)
+    today = date.today().strftime('%Y-%m-%d')
+    key = ('NIFTY 50', 'price', '2024-01-01', today)
+    cache.put(*key, frame())
+    assert cache.get(*key) is not None
+    backdate(cache, key, 120)
+    assert cache.get(*key) is None
+    assert cache.counters['expired'] == 1
+
+
+def test_entry_written_before_its_window_closed_keeps_expiring(tmp_path):
+    # Cached yesterday while yesterday's window was still open (possibly without PE/PB)
+    cache = make_cache(tmp_path, ttl_seconds=60)
+    yesterday = (date.today() - timedelta(days=1)).strftime('%Y-%m-%d')
+    key = ('NIFTY 50', 'valuation', '2024-01-01', yesterday)
+    cache.put(*key, frame())
+    backdate(cache, key, 86400 + 120)
+    assert cache.get(*key) is None
+
+
+def test_is_closed_uses_write_time(tmp_path):
+    cache = make_cache(tmp_path)
+    written = time.mktime(date(2024, 2, 1).timetuple())
+    assert cache.is_closed('2024-01-31', written)
+    assert not cache.is_closed('2024-02-01', written)
+
+
+def test_evicts_least_recently_used_entry(tmp_path):
+    cache = make_cache(tmp_path)
+    for month in (1, 2):
+        cache.put('NIFTY 50', 'price', f'2024-0{month}-01', f'2024-0{month}-28', frame(200))
+    first = cache._path('NIFTY 50', 'price', '2024-01-01', '2024-01-28')
+    second = cache._path('NIFTY 50', 'price', '2024-02-01', '2024-02-28')
+    # Make the first entry the least recently used, then leave room for one entry only
+    os.utime(first, (time.time() - 100, os.stat(first).st_mtime))
+    cache.max_bytes = os.path.getsize(second) + 1
+    cache.evict()
+    assert not os.path.exists(first)
+    assert os.path.exists(second)
+
+
+def test_corrupt_entry_is_removed(tmp_path):
+    cache = make_cache(tmp_path)
+    key = ('NIFTY 50', 'price', '01-Jan-2024', '31-Jan-2024')
+    cache.put(*key, frame())
+    with open(cache._path(*key), 'wb') as f:
+        f.write(b'not a frame')
+    assert cache.get(*key) is None
+    assert not os.path.exists(cache._path(*key))
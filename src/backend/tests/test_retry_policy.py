@@ -0,0 +1,160 @@
+import random
+
+import pytest
+import requests
+
+import retry_policy
+from retry_policy import (CircuitBreaker, CircuitOpenError, HostBreakers, RetryScheduler, backoff_delay,
+                          classify_error)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float) -> None:
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch) -> FakeClock:
+    clock = FakeClock()
+    monkeypatch.setattr(retry_policy.time, 'monotonic', clock.monotonic)
+    monkeypatch.setattr(retry_policy.time, 'sleep', clock.sleep)
+    return clock
+
+
+def http_error(status: int) -> requests.HTTPError:
+    response = requests.Response()
+    response.status_code = status
+    return requests.HTTPError(f'{status} error', response=response)
+
+
+class KindError(Exception):
+    def __init__(self, kind):
+        super().__init__(kind)
+        self.kind = kind
+
+
+@pytest.mark.parametrize('exc, kind', [
+    (http_error(429), 'throttled'),
+    (http_error(503), 'throttled'),
+    (http_error(502), 'network'),
+    (Exception('Too Many Requests'), 'throttled'),
+    (requests.ConnectionError('reset'), 'network'),
+    (TimeoutError(), 'network'),
+    (ValueError('Expecting value: line 1 column 1'), 'parse'),
+    (KeyError('data'), 'parse'),
+    (CircuitOpenError('www.nseindia.com', 3.0), 'circuit_open'),
+    (KindError('empty'), 'empty'),
+    (RuntimeError('boom'), 'other'),
+])
+def test_classify_error(exc, kind):
+    assert classify_error(exc) == kind
+
+
+def test_classify_error_follows_the_cause_chain():
+    try:
+        try:
+            raise requests.ConnectionError('reset')
+        except requests.ConnectionError as cause:
+            raise RuntimeError('price call failed') from cause
+    except RuntimeError as exc:
+        assert classify_error(exc) == 'network'
+
+
+def test_backoff_delay_has_equal_jitter_and_a_cap():
+    rng = random.Random(1)
+    for attempt in range(10):
+        ceiling = min(30.0, 2.0 * 2 ** attempt)
+        delay = backoff_delay(attempt, 2.0, cap=30.0, rng=rng)
+        assert ceiling / 2 <= delay <= ceiling
+
+
+def test_breaker_opens_after_threshold_and_probes_after_cooldown(clock):
+    breaker = CircuitBreaker(threshold=3, cooldown=10.0)
+    for _ in range(2):
+        breaker.record_failure()
+    assert breaker.state == 'closed' and breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == 'open' and breaker.trips == 1
+    assert not breaker.allow()
+    assert breaker.retry_after() == pytest.approx(10.0)
+
+    clock.sleep(10.0)
+    assert breaker.allow()
+    assert breaker.state == 'half_open'
+    # Only one probe at a time
+    assert not breaker.allow()
+
+
+def test_failed_probe_reopens_without_counting_a_new_trip(clock):
+    breaker = CircuitBreaker(threshold=1, cooldown=5.0)
+    breaker.record_failure()
+    clock.sleep(5.0)
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == 'open' and breaker.trips == 1
+    assert breaker.retry_after() == pytest.approx(5.0)
+
+
+def test_successful_probe_closes_the_circuit(clock):
+    breaker = CircuitBreaker(threshold=1, cooldown=5.0)
+    breaker.record_failure()
+    clock.sleep(5.0)
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == 'closed' and breaker.failures == 0 and breaker.allow()
+
+
+def test_host_breakers_guard_counts_only_host_failures(clock):
+    breakers = HostBreakers(threshold=2, cooldown=5.0)
+    for _ in range(3):
+        with pytest.raises(ValueError):
+            with breakers.guard('nse'):
+                raise ValueError('unexpected payload')
+    assert breakers.breaker('nse').state == 'closed'
+
+    for _ in range(2):
+        with pytest.raises(requests.ConnectionError):
+            with breakers.guard('nse'):
+                raise requests.ConnectionError('reset')
+    with pytest.raises(CircuitOpenError):
+        with breakers.guard('nse'):
+            pass
+    assert breakers.trips == 1
+    # Other hosts are unaffected
+    with breakers.guard('supabase'):
+        pass
+
+    # A probe that ends without a verdict on the host frees the probe slot
+    clock.sleep(5.0)
+    with pytest.raises(ValueError):
+        with breakers.guard('nse'):
+            raise ValueError('unexpected payload')
+    assert breakers.breaker('nse').state == 'open' and breakers.breaker('nse').allow()
+
+
+def test_retry_scheduler_requeues_until_the_kind_runs_out(clock):
+    queue = RetryScheduler(base_delay=1.0, rng=random.Random(3))
+    queue.add('NIFTY 50', '01-Jan-2024', '31-Dec-2024', 'network')
+    queue.add('NIFTY 50', '01-Jan-2024', '31-Dec-2024', 'network')
+    assert len(queue) == 1
+    attempts = 0
+    for task in queue.drain():
+        attempts += 1
+        queue.failed(task, 'network')
+    assert attempts == retry_policy.RETRY_POLICY['network'][0]
+    assert queue.outstanding() == {'NIFTY 50': [['01-Jan-2024', '31-Dec-2024', 'network']]}
+
+
+def test_retry_scheduler_stops_at_the_deadline(clock):
+    queue = RetryScheduler(base_delay=1.0, rng=random.Random(3))
+    queue.add('NIFTY 50', '01-Jan-2024', '31-Dec-2024', 'throttled', delay=0)
+    queue.add('NIFTY IT', '01-Jan-2024', '31-Dec-2024', 'other', delay=60)
+    drained = [task.index_name for task in queue.drain(deadline=clock.now + 30)]
+    assert drained == ['NIFTY 50']
+    assert set(queue.outstanding()) == {'NIFTY IT'}
@@ -0,0 +1,146 @@
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import rolling_stats
+from rolling_stats import RollingStatsEngine, STATE_VERSION, SlidingWindowStats
+
+
+@pytest.fixture(params=['sortedcontainers', 'bisect'], autouse=True)
+def container(request, monkeypatch):
+    if request.param == 'bisect':
+        monkeypatch.setattr(rolling_stats, 'SortedList', None)
+    return request.param
+
+
+def history(days: int = 400, symbol: str = 'NIFTY 50', seed: int = 3) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    dates = pd.bdate_range('2023-01-02', periods=days)
+    close = 100 + np.cumsum(rng.normal(0, 1, days))
+    return pd.DataFrame({'date': dates, 'symbol': symbol, 'high': close + rng.uniform(0, 2, days),
+                         'close': close, 'pe': rng.uniform(15, 30, days), 'pb': rng.uniform(2, 5, days)})
+
+
+def rebuilt(df: pd.DataFrame, tmp_path) -> list:
+    engine = RollingStatsEngine(str(tmp_path / 'rebuilt.json'))
+    engine.update(df)
+    return engine.snapshots()
+
+
+def assert_snapshots_equal(actual: list, expected: list) -> None:
+    assert len(actual) == len(expected)
+    for got, want in zip(actual, expected):
+        assert got.keys() == want.keys()
+        for key, value in want.items():
+            assert got[key] == pytest.approx(value, nan_ok=True), key
+
+
+def test_incremental_updates_match_rebuild(tmp_path):
+    df = history()
+    engine = RollingStatsEngine(str(tmp_path / 'stats.json'))
+    for start in range(0, len(df), 37):
+        engine.update(df.iloc[start:start + 37])
+    assert_snapshots_equal(engine.snapshots(), rebuilt(df, tmp_path))
+
+
+def test_save_and_load_round_trip(tmp_path):
+    df = history()
+    engine = RollingStatsEngine(str(tmp_path / 'stats.json'))
+    engine.update(df)
+    engine.save()
+    loaded = RollingStatsEngine(str(tmp_path / 'stats.json'))
+    assert loaded.load()
+    assert_snapshots_equal(loaded.snapshots(), engine.snapshots())
+
+
+def test_state_of_another_version_is_not_loaded(tmp_path):
+    path = tmp_path / 'stats.json'
+    path.write_text(json.dumps({'version': STATE_VERSION - 1, 'window_years': 5, 'symbols': {}}))
+    assert not RollingStatsEngine(str(path)).load()
+
+
+def test_revised_rows_match_rebuild(tmp_path):
+    df = history()
+    engine = RollingStatsEngine(str(tmp_path / 'stats.json'))
+    engine.update(df)
+    revised = df.copy()
+    rows = [len(df) - 1, len(df) - 3, len(df) - 200]
+    revised.loc[rows, 'close'] -= 0.5
+    revised.loc[rows, 'pe'] += 1.0
+    revised.loc[rows, 'pb'] += 0.1
+    engine.update(revised.loc[rows])
+    assert engine.stale_symbols() == []
+    assert_snapshots_equal(engine.snapshots(), rebuilt(revised, tmp_path))
+
+
+def test_backfilled_gap_matches_rebuild(tmp_path):
+    df = history()
+    gap = df.index[-40:-35]
+    engine = RollingStatsEngine(str(tmp_path / 'stats.json'))
+    engine.update(df.drop(gap))
+    engine.update(df.loc[gap])
+    assert_snapshots_equal(engine.snapshots(), rebuilt(df, tmp_path))
+
+
+def test_refeeding_unchanged_rows_changes_nothing(tmp_path):
+    df = history()
+    engine = RollingStatsEngine(str(tmp_path / 'stats.json'))
+    engine.update(df)
+    assert engine.update(df.iloc[-30:]) == 0
+
+
+def test_lowering_the_ath_day_marks_symbol_stale(tmp_path):
+    df = history()
+    engine = RollingStatsEngine(str(tmp_path / 'stats.json'))
+    engine.update(df)
+    peak = df['high'].idxmax()
+    revised = df.loc[[peak]].copy()
+    revised['high'] -= 5.0
+    engine.update(revised)
+    assert engine.stale_symbols() == ['NIFTY 50']
+
+    # Raising an ATH is resolved in place
+    engine = RollingStatsEngine(str(tmp_path / 'stats.json'))
+    engine.update(df)
+    revised['high'] = df['high'].max() + 5.0
+    engine.update(revised)
+    assert engine.stale_symbols() == []
+    assert engine.snapshots()[0]['ath'] == pytest.approx(df['high'].max() + 5.0)
+
+
+def test_price_only_refetch_keeps_valuations(tmp_path):
+    df = history()
+    engine = RollingStatsEngine(str(tmp_path / 'stats.json'))
+    engine.update(df)
+    before = engine.snapshots()
+    engine.update(df.iloc[-5:][['date', 'symbol', 'high', 'close']])
+    assert_snapshots_equal(engine.snapshots(), before)
+
+
+def test_seeded_ath_with_date_can_go_stale(tmp_path):
+    df = history(days=30)
+    engine = RollingStatsEngine(str(tmp_path / 'stats.json'))
+    engine.seed_ath('NIFTY 50', 500.0, df['date'].iloc[3].date())
+    engine.update(df)
+    assert engine.snapshots()[0]['ath'] == 500.0
+    revised = df.iloc[[3]].copy()
+    engine.update(revised)
+    assert engine.stale_symbols() == ['NIFTY 50']
+
+
+def test_window_revise_replaces_inserts_and_ignores_expired_days():
+    window = SlidingWindowStats(span_days=10)
+    for day, value in ((100, 5.0), (102, 7.0), (104, 9.0)):
+        window.push(day, value)
+    assert window.revise(102, 8.0, latest_day=104)
+    assert window.revise(103, 1.0, latest_day=104)
+    assert not window.revise(103, 1.0, latest_day=104)
+    assert not window.revise(90, 3.0, latest_day=104)
+    assert not window.revise(101, float('nan'), latest_day=104)
+    assert window.to_list() == [[100, 5.0], [102, 8.0], [103, 1.0], [104, 9.0]]
+    assert window.median() == pytest.approx(6.5)
+    window.push(112, 2.0)
+    assert window.to_list() == [[102, 8.0], [103, 1.0], [104, 9.0], [112, 2.0]]
+    assert list(window.values) == [1.0, 2.0, 8.0, 9.0]
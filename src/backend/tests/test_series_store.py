@@ -0,0 +1,62 @@
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+from series_store import MIN_CAPACITY, SeriesStore
+
+COLUMNS = ['close', 'pe']
+
+
+def frame(symbol: str, days: list, closes: list, pe: list = None) -> pd.DataFrame:
+    data = {'date': pd.to_datetime(days), 'symbol': symbol, 'close': closes}
+    if pe is not None:
+        data['pe'] = pe
+    return pd.DataFrame(data)
+
+
+def test_appends_in_place_and_tracks_bounds():
+    store = SeriesStore(COLUMNS)
+    store.add(frame('NIFTY 50', ['2024-03-11', '2024-03-12'], [100.0, 101.0], [20.0, 20.1]))
+    block = store.block('NIFTY 50')
+    days = block.days
+    store.add(frame('NIFTY 50', ['2024-03-13'], [102.0], [20.2]))
+    # Newer rows go into the spare capacity of the same arrays
+    assert block.days is days and block.capacity == MIN_CAPACITY
+    assert len(store) == 3 and 'NIFTY 50' in store and 'NIFTY IT' not in store
+    assert store.first_date('NIFTY 50') == date(2024, 3, 11)
+    assert store.last_date('NIFTY 50') == date(2024, 3, 13)
+    assert store.last_date('NIFTY IT') is None
+
+
+def test_out_of_order_rows_merge_and_later_rows_win():
+    store = SeriesStore(COLUMNS)
+    store.add(frame('NIFTY 50', ['2024-03-11', '2024-03-13'], [100.0, 102.0], [20.0, 20.2]))
+    store.add(frame('NIFTY 50', ['2024-03-12', '2024-03-13'], [101.0, 102.5], [20.1, 20.3]))
+    df = store.frame()
+    assert list(df['date'].dt.strftime('%Y-%m-%d')) == ['2024-03-11', '2024-03-12', '2024-03-13']
+    assert list(df['close']) == [100.0, 101.0, 102.5]
+
+
+def test_columns_appear_late_and_widen_when_float32_is_lossy():
+    store = SeriesStore(COLUMNS)
+    store.add(frame('NIFTY 50', ['2024-03-11'], [100.25]))
+    store.add(frame('NIFTY 50', ['2024-03-12'], [12345678.5], [20.1]))
+    block = store.block('NIFTY 50')
+    assert block.values['close'].dtype == np.float64
+    assert block.values['pe'].dtype == np.float32
+    df = store.frame()
+    assert list(df['close']) == [100.25, 12345678.5]
+    # Rows added before the column existed read as missing; float32 values read back exactly
+    assert np.isnan(df['pe'].iloc[0]) and df['pe'].iloc[1] == 20.1
+
+
+def test_frame_sorts_symbols_and_batches_respect_the_row_limit():
+    store = SeriesStore(COLUMNS)
+    store.add(frame('NIFTY IT', ['2024-03-11', '2024-03-12'], [300.0, 301.0]))
+    store.add(frame('NIFTY 50', ['2024-03-11'], [100.0]))
+    store.add(frame('NIFTY BANK', ['2024-03-11', '2024-03-12', '2024-03-13'], [500.0, 501.0, 502.0]))
+    df = store.frame(['NIFTY IT', 'NIFTY 50', 'NIFTY AUTO'])
+    assert list(df['symbol'].astype(str)) == ['NIFTY 50', 'NIFTY IT', 'NIFTY IT']
+    assert list(store.batches(3)) == [['NIFTY IT', 'NIFTY 50'], ['NIFTY BANK']]
+    assert list(store.batches(2)) == [['NIFTY IT'], ['NIFTY 50'], ['NIFTY BANK']]
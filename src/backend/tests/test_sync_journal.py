@@ -0,0 +1,97 @@
+import os
+
+import pandas as pd
+
+from sync_journal import JOURNAL_FILE, SyncJournal, write_set_id
+
+RUN = {'start': '2024-01-01', 'end': '2024-01-31', 'indices': ['NIFTY 50'], 'price_only': False}
+
+
+def frame(rows: int = 3, offset: float = 0.0) -> pd.DataFrame:
+    return pd.DataFrame({'symbol': 'NIFTY 50', 'date': pd.date_range('2024-01-01', periods=rows),
+                         'close': [100.0 + offset + i for i in range(rows)]})
+
+
+def interrupted_journal(tmp_path) -> SyncJournal:
+    journal = SyncJournal(str(tmp_path))
+    journal.begin(RUN)
+    journal.record_fetched('NIFTY 50', '2024-01-01', '2024-01-31', False, frame())
+    journal.record_uploaded('abc', ['NIFTY 50'], 3)
+    return journal
+
+
+def payloads(tmp_path) -> list:
+    return sorted(name for name in os.listdir(tmp_path) if name.startswith('fetched-'))
+
+
+def test_resume_replays_fetched_windows_and_uploads(tmp_path):
+    interrupted_journal(tmp_path)
+    journal = SyncJournal(str(tmp_path))
+    run = journal.recover()
+    assert run['start'] == RUN['start'] and run['indices'] == RUN['indices']
+    pd.testing.assert_frame_equal(journal.fetched('NIFTY 50', '2024-01-01', '2024-01-31', False), frame())
+    assert journal.fetched('NIFTY 50', '2024-01-01', '2024-01-31', True) is None
+    assert journal.uploaded('abc') and not journal.uploaded('def')
+    assert journal.replayed == 1
+
+
+def test_torn_last_line_is_dropped(tmp_path):
+    interrupted_journal(tmp_path)
+    with open(tmp_path / JOURNAL_FILE, 'a', encoding='utf-8') as f:
+        f.write('{"op": "uploaded", "bat')
+    journal = SyncJournal(str(tmp_path))
+    assert journal.recover() is not None
+    assert journal.uploaded('abc')
+    # The journal was rewritten, so the next append starts on a clean line
+    journal.record_uploaded('def', ['NIFTY 50'], 1)
+    resumed = SyncJournal(str(tmp_path))
+    resumed.recover()
+    assert resumed.uploaded('abc') and resumed.uploaded('def')
+
+
+def test_entry_with_missing_payload_is_dropped(tmp_path):
+    interrupted_journal(tmp_path)
+    for name in payloads(tmp_path):
+        os.remove(tmp_path / name)
+    journal = SyncJournal(str(tmp_path))
+    journal.recover()
+    assert journal.fetched('NIFTY 50', '2024-01-01', '2024-01-31', False) is None
+
+
+def test_payload_numbering_continues_after_orphans(tmp_path):
+    interrupted_journal(tmp_path)
+    # A payload renamed into place whose journal line never made it to disk
+    (tmp_path / 'fetched-000007.pkl').write_bytes(b'orphan')
+    journal = SyncJournal(str(tmp_path))
+    journal.recover()
+    journal.record_fetched('NIFTY 50', '2024-02-01', '2024-02-29', False, frame(offset=10))
+    assert journal.windows['NIFTY 50|2024-02-01|2024-02-29|full']['payload'].startswith('fetched-000008')
+    pd.testing.assert_frame_equal(journal.fetched('NIFTY 50', '2024-01-01', '2024-01-31', False), frame())
+
+
+def test_empty_frames_are_not_journaled(tmp_path):
+    journal = SyncJournal(str(tmp_path))
+    journal.begin(RUN)
+    journal.record_fetched('NIFTY 50', '2024-01-01', '2024-01-31', False, frame(0))
+    assert journal.windows == {} and payloads(tmp_path) == []
+
+
+def test_commit_compacts_and_leaves_nothing_to_resume(tmp_path):
+    journal = interrupted_journal(tmp_path)
+    journal.commit()
+    assert payloads(tmp_path) == []
+    assert os.path.getsize(tmp_path / JOURNAL_FILE) == 0
+    assert SyncJournal(str(tmp_path)).recover() is None
+
+
+def test_fresh_begin_discards_previous_run(tmp_path):
+    interrupted_journal(tmp_path)
+    journal = SyncJournal(str(tmp_path))
+    journal.recover()
+    journal.begin(RUN, resume=False)
+    assert payloads(tmp_path) == [] and not journal.uploaded('abc')
+
+
+def test_write_set_id_follows_content():
+    assert write_set_id(frame()) == write_set_id(frame())
+    assert write_set_id(frame()) != write_set_id(frame(offset=1))
@@ -0,0 +1,89 @@
+import json
+from datetime import date
+
+import pandas as pd
+
+from trading_calendar import TradingCalendar, load_holidays
+
+# Republic Day 2024 fell on a Friday
+HOLIDAY = '2024-01-26'
+
+
+def weekdays(start: str, end: str) -> list:
+    return [day.date() for day in pd.bdate_range(start, end)]
+
+
+def test_listed_holidays_are_not_sessions():
+    calendar = TradingCalendar(holidays=[HOLIDAY])
+    assert not calendar.is_session(date(2024, 1, 26))
+    assert not calendar.is_session(date(2024, 1, 27))
+    assert calendar.next_session(date(2024, 1, 25)) == date(2024, 1, 29)
+    assert calendar.latest_session(date(2024, 1, 28)) == date(2024, 1, 25)
+    assert calendar.sessions_between(date(2024, 1, 22), date(2024, 1, 31)) == 7
+
+
+def test_observed_weekend_session_wins():
+    calendar = TradingCalendar(holidays=[])
+    calendar.observe([date(2024, 1, 20)])
+    assert calendar.is_session(date(2024, 1, 20))
+
+
+def test_shared_hole_in_stored_data_is_not_learned():
+    # Two missing weekdays in stored data (an outage) must stay sessions to repair
+    calendar = TradingCalendar(holidays=[])
+    days = [day for day in weekdays('2024-03-01', '2024-03-29') if day.day not in (12, 13)]
+    calendar.observe(days)
+    assert calendar.is_session(date(2024, 3, 12)) and calendar.is_session(date(2024, 3, 13))
+
+
+def test_fetched_frame_confirms_short_closure():
+    calendar = TradingCalendar(holidays=[])
+    days = [day for day in weekdays('2024-03-01', '2024-03-29') if day != date(2024, 3, 25)]
+    calendar.observe(days, fetched=True)
+    assert not calendar.is_session(date(2024, 3, 25))
+    assert calendar.closures
+
+
+def test_empty_response_confirms_only_short_ranges():
+    calendar = TradingCalendar(holidays=[])
+    assert calendar.confirm_closed('2024-04-11', '2024-04-11') == 1
+    assert not calendar.is_session(date(2024, 4, 11))
+    assert calendar.confirm_closed('2024-05-01', '2024-05-31') == 0
+    assert calendar.is_session(date(2024, 5, 15))
+
+
+def test_closures_persist(tmp_path):
+    path = str(tmp_path / 'calendar.json')
+    calendar = TradingCalendar(path, holidays=[])
+    calendar.observe([date(2024, 4, 10)])
+    calendar.confirm_closed('2024-04-11', '2024-04-11')
+    calendar.save()
+    loaded = TradingCalendar(path, holidays=[])
+    assert loaded.load()
+    assert not loaded.is_session(date(2024, 4, 11))
+    assert date(2024, 4, 10) in loaded.sessions(date(2024, 4, 8), date(2024, 4, 12))
+
+
+def test_load_holidays_reports_covered_years(tmp_path):
+    path = tmp_path / 'holidays.json'
+    path.write_text(json.dumps({'years': {'2024': [HOLIDAY]}}))
+    days, years = load_holidays(str(path), extra='2031-01-01, ')
+    assert days == [HOLIDAY, '2031-01-01']
+    assert years == {2024, 2031}
+    calendar = TradingCalendar(holidays=days, covered_years=years)
+    assert calendar.covers(2024) and not calendar.covers(2025)
+
+
+def test_missing_holiday_file_covers_nothing(tmp_path):
+    assert load_holidays(str(tmp_path / 'absent.json'), extra='') == ([], set())
+
+
+def test_listed_from_and_observed_between():
+    calendar = TradingCalendar(holidays=[HOLIDAY], covered_years={2024, 2025})
+    assert calendar.listed_from == date(2024, 1, 1).toordinal()
+    assert TradingCalendar(holidays=[], covered_years=set()).listed_from is None
+    calendar.observe([date(2023, 5, 2), date(2023, 5, 4), date(2023, 5, 8)])
+    assert calendar.observed_between(date(2023, 5, 3), date(2023, 5, 8)) == \
+        [date(2023, 5, 4).toordinal(), date(2023, 5, 8).toordinal()]
+    calendar.observe([date(2023, 5, 5)])
+    assert len(calendar.observed_between('2023-05-01', '2023-05-31')) == 4
@@ -0,0 +1,68 @@
+import json
+from datetime import date
+
+from universe_scheduler import UniverseScheduler
+
+
+def load_cursor(path) -> dict:
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def test_order_puts_carried_then_priority_then_stalest(tmp_path):
+    cursor = tmp_path / 'cursor.json'
+    UniverseScheduler(str(cursor)).save(['NIFTY IT'])
+    scheduler = UniverseScheduler(str(cursor), priority=['NIFTY 50'])
+    watermarks = {'NIFTY BANK': {'last_date': date(2024, 1, 10)},
+                  'NIFTY AUTO': {'last_date': date(2024, 1, 5)},
+                  'NIFTY 50': {'last_date': date(2024, 1, 1)}}
+    order = scheduler.order(['NIFTY BANK', 'NIFTY AUTO', 'NIFTY 50', 'NIFTY IT', 'NIFTY NEW'], watermarks)
+    assert order == ['NIFTY IT', 'NIFTY 50', 'NIFTY NEW', 'NIFTY AUTO', 'NIFTY BANK']
+
+
+def test_save_round_trips_pending_and_windows(tmp_path):
+    cursor = tmp_path / 'state' / 'cursor.json'
+    windows = {'NIFTY 50': [['2024-01-01', '2024-01-31', 'valuation']]}
+    UniverseScheduler(str(cursor)).save(['NIFTY 50'], windows)
+    scheduler = UniverseScheduler(str(cursor))
+    assert scheduler.carried_over == ['NIFTY 50']
+    assert scheduler.carried_windows == windows
+
+
+def test_narrow_run_keeps_backlog_of_indices_it_did_not_cover(tmp_path):
+    cursor = tmp_path / 'cursor.json'
+    UniverseScheduler(str(cursor)).save(
+        ['NIFTY 50', 'NIFTY IT', 'NIFTY AUTO'],
+        {'NIFTY IT': [['2024-01-01', '2024-01-31', 'price']],
+         'NIFTY 50': [['2024-02-01', '2024-02-29', 'price']]})
+
+    # A run over NIFTY 50 only finishes it; the universe backlog must survive
+    UniverseScheduler(str(cursor)).save([], {}, covered=['NIFTY 50'])
+    data = load_cursor(cursor)
+    assert data['pending'] == ['NIFTY IT', 'NIFTY AUTO']
+    assert data['windows'] == {'NIFTY IT': [['2024-01-01', '2024-01-31', 'price']]}
+
+
+def test_covered_indices_are_replaced_not_merged(tmp_path):
+    cursor = tmp_path / 'cursor.json'
+    UniverseScheduler(str(cursor)).save(['NIFTY IT'], {'NIFTY IT': [['2024-01-01', '2024-01-31', 'price']]})
+    UniverseScheduler(str(cursor)).save(['NIFTY IT'], {'NIFTY IT': [['2024-03-01', '2024-03-31', 'valuation']]},
+                                        covered=['NIFTY IT'])
+    data = load_cursor(cursor)
+    assert data['pending'] == ['NIFTY IT']
+    assert data['windows'] == {'NIFTY IT': [['2024-03-01', '2024-03-31', 'valuation']]}
+
+
+def test_save_without_covered_replaces_cursor(tmp_path):
+    cursor = tmp_path / 'cursor.json'
+    UniverseScheduler(str(cursor)).save(['NIFTY IT'])
+    UniverseScheduler(str(cursor)).save([])
+    assert UniverseScheduler(str(cursor)).carried_over == []
+
+
+def test_unreadable_cursor_starts_empty(tmp_path):
+    cursor = tmp_path / 'cursor.json'
+    cursor.write_text('{not json')
+    scheduler = UniverseScheduler(str(cursor), time_budget=60)
+    assert scheduler.carried_over == [] and scheduler.carried_windows == {}
+    assert scheduler.deadline == scheduler.started + 60
@@ -0,0 +1,60 @@
+import importlib.util
+import os
+
+import pandas as pd
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture(scope='module')
+def fetcher():
+    # index-price.py is hyphenated, so it is loaded from its path
+    spec = importlib.util.spec_from_file_location('index_price', os.path.join(BACKEND_DIR, 'index-price.py'))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def rows(*records) -> pd.DataFrame:
+    df = pd.DataFrame(records, columns=['date', 'symbol', 'close', 'pe'])
+    return df.assign(date=pd.to_datetime(df['date']))
+
+
+def test_fingerprints_ignore_representation(fetcher):
+    fetched = rows(('2024-03-11', 'NIFTY 50', 22150.75, 22.5))
+    # Stored rows come back as strings or with float noise beyond FINGERPRINT_DECIMALS
+    stored = rows(('2024-03-11', 'NIFTY 50', '22150.75', 22.500000001))
+    assert (fetcher.compute_row_fingerprints(fetched, ['close', 'pe']).tolist()
+            == fetcher.compute_row_fingerprints(stored, ['close', 'pe']).tolist())
+    revised = rows(('2024-03-11', 'NIFTY 50', 22150.8, 22.5))
+    assert (fetcher.compute_row_fingerprints(fetched, ['close', 'pe']).tolist()
+            != fetcher.compute_row_fingerprints(revised, ['close', 'pe']).tolist())
+
+
+def test_write_set_skips_unchanged_and_sends_revised_and_new_rows(fetcher):
+    stored = rows(('2024-03-11', 'NIFTY 50', 22150.75, 22.5),
+                  ('2024-03-12', 'NIFTY 50', 22200.0, 22.6))
+    fetched = rows(('2024-03-11', 'NIFTY 50', 22150.75, 22.5),    # unchanged
+                   ('2024-03-12', 'NIFTY 50', 22210.0, 22.6),     # revised upstream
+                   ('2024-03-13', 'NIFTY 50', 22300.0, 22.7))     # new
+    write, counts = fetcher.build_write_set(fetched, stored)
+    assert counts == {'inserted': 1, 'revised': 1, 'unchanged': 1}
+    assert list(write['date'].dt.strftime('%Y-%m-%d')) == ['2024-03-12', '2024-03-13']
+    assert list(write['close']) == [22210.0, 22300.0]
+    assert not any(col.startswith('_') for col in write.columns)
+
+
+def test_write_set_compares_fetched_columns_only(fetcher):
+    # A price-only run must not count the stored valuation as a revision
+    stored = rows(('2024-03-11', 'NIFTY 50', 22150.75, 22.5))
+    fetched = rows(('2024-03-11', 'NIFTY 50', 22150.75, None)).drop(columns=['pe'])
+    write, counts = fetcher.build_write_set(fetched, stored)
+    assert write.empty and counts['unchanged'] == 1
+
+
+def test_write_set_keeps_the_last_fetch_of_a_key(fetcher):
+    fetched = rows(('2024-03-11', 'NIFTY 50', 22100.0, 22.5),
+                   ('2024-03-11', 'NIFTY 50', 22150.75, 22.5))
+    write, counts = fetcher.build_write_set(fetched, rows())
+    assert counts['inserted'] == 1 and list(write['close']) == [22150.75]
@@ -0,0 +1,286 @@
+"""
+NSE trading calendar built from observed trading dates and a holiday list.
+
+A day is a trading session when rows were observed for it, or when it is a
+weekday that is neither a listed exchange holiday nor a confirmed closure.
+
+Observed dates always win, so special sessions (e.g. Muhurat trading on a
+weekend) are picked up from the data. Holidays come from nse_holidays.json
+(or the file named by $NSE_HOLIDAYS_FILE) plus any dates in $NSE_HOLIDAYS;
+a year without entries there is reported by covers() so callers can warn.
+The list starts in a recent year (listed_from); auditing older stored history
+relies on the observed sessions alone (see gap_audit).
+
+Holidays missing from the list are only learned from upstream, never from
+holes in stored data alone (a short outage shared by every index looks the
+same as a holiday there): a run of at most MAX_LEARNED_CLOSURE unobserved
+weekdays is confirmed closed when a fetched frame has rows on both sides of
+it but none inside, or when a request for exactly those days came back empty.
+The calendar is materialized into dense per-day arrays, making "next session
+after X", "latest session on or before X" and "sessions between X and Y" O(1)
+lookups. Observed sessions and confirmed closures are persisted as JSON
+between runs.
+"""
+
+import bisect
+import json
+import os
+from datetime import date, datetime
+
+STATE_VERSION = 1
+
+# NSE equity segment trading holidays by year (weekday closures only)
+HOLIDAYS_PATH = os.getenv("NSE_HOLIDAYS_FILE") or os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                                               'nse_holidays.json')
+
+# Days materialized past today (or past the latest query) when the arrays are built
+HORIZON_DAYS = 400
+
+# Longest run of unobserved weekdays upstream can confirm as a closure
+MAX_LEARNED_CLOSURE = 3
+
+# Slack kept at both ends of the arrays so next/previous lookups never run off them
+EDGE_DAYS = 14
+
+
+def to_ordinal(value) -> int:
+    """Day ordinal of a date, datetime, pandas Timestamp, ordinal int or ISO/DD-MMM-YYYY string."""
+    if isinstance(value, int):
+        return value
+    if isinstance(value, (date, datetime)):
+        return value.toordinal()
+    text = str(value)
+    try:
+        return datetime.strptime(text, '%d-%b-%Y').toordinal()
+    except ValueError:
+        return date.fromisoformat(text[:10]).toordinal()
+
+
+def load_holidays(path: str = None, extra: str = None) -> tuple:
+    """
+    Read the exchange holiday list.
+
+    Args:
+        path (str, optional): JSON file {"years": {"YYYY": ["YYYY-MM-DD", ...]}}
+                              (default HOLIDAYS_PATH)
+        extra (str, optional): Comma-separated extra holiday dates (default $NSE_HOLIDAYS)
+
+    Returns:
+        tuple: (list of holiday dates, set of years the list covers). A missing or
+               unreadable file yields no holidays and no covered years.
+    """
+    days, years = [], set()
+    try:
+        with open(path or HOLIDAYS_PATH, encoding='utf-8') as f:
+            listed = json.load(f).get('years', {})
+    except (OSError, ValueError):
+        listed = {}
+    for year, dates in listed.items():
+        years.add(int(year))
+        days.extend(dates)
+    for day in (os.getenv("NSE_HOLIDAYS", "") if extra is None else extra).split(','):
+        if day.strip():
+            days.append(day.strip())
+            years.add(date.fromordinal(to_ordinal(day.strip())).year)
+    return days, years
+
+
+class TradingCalendar:
+    """
+    Trading sessions with O(1) navigation.
+
+    Args:
+        path (str, optional): JSON file the observed sessions are loaded from and saved to
+        holidays (list, optional): Exchange holidays (default: load_holidays())
+        covered_years (set, optional): Years `holidays` lists completely (default: the
+                                       years in load_holidays(), or those of `holidays`)
+    """
+
+    def __init__(self, path: str = None, holidays: list = None, covered_years: set = None):
+        self.path = path
+        if holidays is None:
+            holidays, listed_years = load_holidays()
+        else:
+            listed_years = {date.fromordinal(to_ordinal(day)).year for day in holidays}
+        self.holidays = {to_ordinal(day) for day in holidays}
+        self.covered_years = set(listed_years if covered_years is None else covered_years)
+        self.closures = set()
+        self.observed = set()
+        self._observed_sorted = None
+        self._base = None
+        self._is_session = None
+        self._next = None
+        self._prev = None
+        self._count = None
+
+    def load(self) -> bool:
+        """Load persisted observed sessions; returns True if state was loaded."""
+        if not self.path:
+            return False
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return False
+        if data.get('version') != STATE_VERSION:
+            return False
+        self.observed = {int(day) for day in data.get('sessions', [])}
+        self.closures = {int(day) for day in data.get('closures', [])}
+        self._observed_sorted = None
+        self._base = None
+        return True
+
+    def save(self) -> None:
+        """Atomically write the observed sessions to disk."""
+        if not self.path:
+            return
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'version': STATE_VERSION,
+                       'saved_at': datetime.now().isoformat(timespec='seconds'),
+                       'sessions': sorted(self.observed),
+                       'closures': sorted(self.closures)}, f, separators=(',', ':'))
+        os.replace(tmp_path, self.path)
+
+    def add_holidays(self, days) -> None:
+        self.holidays.update(to_ordinal(day) for day in days)
+        self._base = None
+
+    def covers(self, year: int) -> bool:
+        """True when the holiday list has entries for `year`."""
+        return year in self.covered_years
+
+    @property
+    def listed_from(self):
+        """Ordinal of the first day of the earliest year the holiday list covers (None without a list)."""
+        return date(min(self.covered_years), 1, 1).toordinal() if self.covered_years else None
+
+    def observed_between(self, start, end) -> list:
+        """Observed session ordinals in [start, end], ascending."""
+        if self._observed_sorted is None:
+            self._observed_sorted = sorted(self.observed)
+        days = self._observed_sorted
+        return days[bisect.bisect_left(days, to_ordinal(start)):bisect.bisect_right(days, to_ordinal(end))]
+
+    def observe(self, days, fetched: bool = False) -> int:
+        """
+        Record dates on which rows were observed.
+
+        Args:
+            days (iterable): Trading dates (any type accepted by to_ordinal)
+            fetched (bool): The dates are one upstream response for one index, so
+                            short runs of weekdays missing between them are
+                            confirmed closures
+
+        Returns:
+            int: Sessions not seen before
+        """
+        days = {to_ordinal(day) for day in days}
+        new = days - self.observed
+        if new:
+            self.observed |= new
+            self._observed_sorted = None
+            self._base = None
+        if fetched:
+            ordered = sorted(days)
+            for before, after in zip(ordered, ordered[1:]):
+                self._confirm(range(before + 1, after))
+        return len(new)
+
+    def confirm_closed(self, start, end) -> int:
+        """
+        Record that upstream returned no rows for a request covering exactly [start, end].
+
+        Returns:
+            int: Days newly confirmed as closures (none when the range holds more
+                 than MAX_LEARNED_CLOSURE candidate weekdays: that is missing data)
+        """
+        return self._confirm(range(to_ordinal(start), to_ordinal(end) + 1))
+
+    def _confirm(self, days: range) -> int:
+        candidates = [day for day in days if self._rule_session(day) and day not in self.observed]
+        if not candidates or len(candidates) > MAX_LEARNED_CLOSURE:
+            return 0
+        new = set(candidates) - self.closures
+        if new:
+            self.closures |= new
+            self._base = None
+        return len(new)
+
+    def _rule_session(self, day: int) -> bool:
+        # date.fromordinal(day).weekday() without allocating: ordinal 1 (0001-01-01) is a Monday
+        return (day - 1) % 7 < 5 and day not in self.holidays
+
+    def _build(self, lo: int, hi: int) -> None:
+        """Materialize session flags, next/previous session and running counts over [lo, hi]."""
+        size = hi - lo + 1
+        flags = bytearray(size)
+        for i in range(size):
+            day = lo + i
+            flags[i] = day in self.observed or (self._rule_session(day) and day not in self.closures)
+
+        counts = [0] * (size + 1)
+        for i in range(size):
+            counts[i + 1] = counts[i] + flags[i]
+        # _next[i]: first session strictly after lo + i; _prev[i]: last session on or before lo + i
+        nxt = [None] * size
+        following = None
+        for i in range(size - 1, -1, -1):
+            nxt[i] = following
+            if flags[i]:
+                following = lo + i
+        prev = [None] * size
+        latest = None
+        for i in range(size):
+            if flags[i]:
+                latest = lo + i
+            prev[i] = latest
+
+        self._base, self._is_session, self._count = lo, flags, counts
+        self._next, self._prev = nxt, prev
+
+    def _ensure(self, *days: int) -> None:
+        lo = min(days)
+        hi = max(days)
+        if (self._base is not None and self._base + EDGE_DAYS <= lo
+                and hi + EDGE_DAYS < self._base + len(self._is_session)):
+            return
+        if self.observed:
+            lo = min(lo, min(self.observed))
+        self._build(lo - EDGE_DAYS, max(hi, date.today().toordinal()) + HORIZON_DAYS)
+
+    def is_session(self, day) -> bool:
+        day = to_ordinal(day)
+        self._ensure(day)
+        return bool(self._is_session[day - self._base])
+
+    def next_session(self, day) -> date:
+        """First trading session strictly after `day`."""
+        day = to_ordinal(day)
+        self._ensure(day)
+        return date.fromordinal(self._next[day - self._base])
+
+    def latest_session(self, day) -> date:
+        """Last trading session on or before `day` (None if none is known)."""
+        day = to_ordinal(day)
+        self._ensure(day)
+        found = self._prev[day - self._base]
+        return date.fromordinal(found) if found is not None else None
+
+    def sessions_between(self, start, end) -> int:
+        """Number of trading sessions in [start, end] (0 when start > end)."""
+        start, end = to_ordinal(start), to_ordinal(end)
+        if start > end:
+            return 0
+        self._ensure(start, end)
+        return self._count[end - self._base + 1] - self._count[start - self._base]
+
+    def sessions(self, start, end) -> list:
+        """Trading session dates in [start, end]."""
+        start, end = to_ordinal(start), to_ordinal(end)
+        if start > end:
+            return []
+        self._ensure(start, end)
+        return [date.fromordinal(day) for day in range(start, end + 1)
+                if self._is_session[day - self._base]]
@@ -0,0 +1,104 @@
+"""
+Scheduling for full equity-universe syncs.
+
+With 100+ indices a single cron run may not finish everything, so the
+scheduler decides what to fetch first and remembers what was left over:
+
+    1. indices carried over from the previous run's cursor (unfinished or failed)
+    2. priority indices (the ones the site displays)
+    3. the stalest indices (never synced first, then oldest last date)
+
+Whatever a run does not finish within its time budget is written back to the
+cursor file and picked up first on the next cron tick, together with the exact
+date windows whose retries were deferred.
+"""
+
+import json
+import os
+import time
+from datetime import datetime
+
+
+class UniverseScheduler:
+    """
+    Orders a universe of indices and persists the unfinished remainder.
+
+    Args:
+        cursor_path (str): JSON file holding the carried-over indices
+        priority (list, optional): High-value indices scheduled ahead of the rest
+        time_budget (float, optional): Seconds of fetching allowed per run (None = unlimited)
+    """
+
+    def __init__(self, cursor_path: str, priority: list = None, time_budget: float = None):
+        self.cursor_path = cursor_path
+        self.priority = list(priority or [])
+        self.time_budget = time_budget
+        self.started = time.monotonic()
+        self.carried_over, self.carried_windows = self._load()
+
+    def _load(self) -> tuple:
+        try:
+            with open(self.cursor_path, encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return [], {}
+        return list(data.get('pending', [])), dict(data.get('windows', {}))
+
+    @property
+    def deadline(self):
+        """Monotonic time after which no new index should be started, or None."""
+        return self.started + self.time_budget if self.time_budget else None
+
+    def order(self, indices: list, watermarks: dict) -> list:
+        """
+        Return `indices` in scheduling order.
+
+        Args:
+            indices (list): Index names to schedule
+            watermarks (dict): symbol -> {'last_date': date, ...} for synced indices
+
+        Returns:
+            list: Same indices, highest priority first
+        """
+        carried = {name: i for i, name in enumerate(self.carried_over)}
+        priority = {name: i for i, name in enumerate(self.priority)}
+
+        def key(name):
+            last_date = watermarks.get(name, {}).get('last_date')
+            staleness = last_date.toordinal() if last_date else 0
+            return (
+                carried.get(name, len(carried)),
+                priority.get(name, len(priority)),
+                staleness,
+                name,
+            )
+
+        return sorted(indices, key=key)
+
+    def save(self, pending: list, windows: dict = None, covered: list = None) -> None:
+        """
+        Persist the indices left for the next run (an empty list clears the cursor).
+
+        Args:
+            pending (list): Index names to schedule first next time
+            windows (dict, optional): index -> [[start, end, kind], ...] date windows
+                                      still missing after this run's retries
+            covered (list, optional): Indices this run worked on. Carried-over entries
+                                      of other indices are kept, so a narrower run (a few
+                                      --indices, the default cron set) does not drop a
+                                      universe run's backlog. None replaces the cursor.
+        """
+        windows = dict(windows or {})
+        if covered is not None:
+            covered = set(covered)
+            pending = list(pending) + [name for name in self.carried_over
+                                       if name not in covered and name not in pending]
+            for name, carried in self.carried_windows.items():
+                if name not in covered:
+                    windows.setdefault(name, carried)
+        os.makedirs(os.path.dirname(os.path.abspath(self.cursor_path)), exist_ok=True)
+        tmp_path = f"{self.cursor_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'saved_at': datetime.now().isoformat(timespec='seconds'),
+                       'pending': list(pending), 'windows': windows}, f, indent=2)
+        os.replace(tmp_path, self.cursor_path)